@@ -0,0 +1,270 @@
+"""
+Histórico de segmentaciones: una "foto" de los segmentos por cada ejecución.
+
+resultados_segmentacion.csv se sobrescribe en cada ejecución; este almacén
+guarda además, por ejecución, el segmento de cada cliente en un array
+compacto (int8) para poder ver cómo se mueven los clientes entre segmentos.
+
+Todas las fotos se alinean con un registro único de clientes (CustomerID en
+orden de alta, solo se añaden al final): la posición i de cualquier foto es
+siempre el mismo cliente, y -1 indica que no estaba en esa ejecución. Así,
+comparar dos fotos es recorrer dos arrays en paralelo, sin joins por ID; los
+arrays se abren con memmap y se recorren por bloques, de modo que ni con
+millones de clientes y decenas de fotos se carga todo en memoria.
+
+Estructura del directorio:
+    clientes.npy          CustomerID en orden de alta (int64)
+    indice.json           metadatos de cada foto (fecha, conteos, centroides)
+    etiquetas_0001.npy    segmento de cada cliente registrado (int8, -1 = ausente)
+
+Uso:
+    python almacen_segmentos.py registrar resultados_segmentacion.csv --fecha 2011-12-10
+    python almacen_segmentos.py comparar            # las dos últimas fotos
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from rfm import COLUMNAS_RFM
+from reentrenamiento import segmentos_iniciales
+from segmentacion import NOMBRES_SEGMENTOS, SEGMENTO_INACTIVOS
+
+RUTA_ALMACEN = "historial_segmentos"
+
+# Clientes por bloque al recorrer las fotos (acota la memoria intermedia)
+TAMANO_BLOQUE = 1_000_000
+
+AUSENTE = -1
+
+
+def _escribir_atomico(ruta, escribir):
+    ruta_tmp = f"{ruta}.tmp"
+    with open(ruta_tmp, "wb") as f:
+        escribir(f)
+    os.replace(ruta_tmp, ruta)
+
+
+class AlmacenSegmentos:
+    """Fotos de segmentos alineadas por un registro de clientes común"""
+
+    def __init__(self, directorio=RUTA_ALMACEN):
+        self.directorio = directorio
+        ruta_indice = os.path.join(directorio, "indice.json")
+        if os.path.exists(ruta_indice):
+            with open(ruta_indice, encoding="utf-8") as f:
+                self.fotos = json.load(f)["fotos"]
+        else:
+            self.fotos = []
+
+    def __len__(self):
+        return len(self.fotos)
+
+    def _ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def foto(self, id_foto):
+        """Metadatos de una foto por su id"""
+        for foto in self.fotos:
+            if foto["id"] == id_foto:
+                return foto
+        raise KeyError(id_foto)
+
+    def clientes(self):
+        """Registro de CustomerID (memmap de solo lectura)"""
+        ruta = self._ruta("clientes.npy")
+        if not os.path.exists(ruta):
+            return np.empty(0, dtype=np.int64)
+        return np.load(ruta, mmap_mode="r")
+
+    def etiquetas(self, id_foto):
+        """Segmento por posición del registro en una foto (memmap de solo lectura)"""
+        return np.load(self._ruta(self.foto(id_foto)["archivo"]), mmap_mode="r")
+
+    def registrar(self, rfm, fecha=None, version_modelo=None):
+        """
+        Guardar una foto de una tabla RFM con Cluster (index = CustomerID).
+        Devuelve los metadatos de la foto.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        fecha = pd.Timestamp(fecha) if fecha is not None else pd.Timestamp.now()
+        ids = np.asarray(rfm.index, dtype=np.int64)
+        clusters = rfm["Cluster"].to_numpy()
+        if len(clusters) and (clusters.min() < 0 or clusters.max() > np.iinfo(np.int8).max):
+            raise ValueError("Los clusters deben estar entre 0 y 127")
+
+        # Posición de cada cliente en el registro; los nuevos se añaden al final
+        registro = np.asarray(self.clientes())
+        posiciones = np.full(len(ids), -1, dtype=np.int64)
+        if len(registro):
+            orden = np.argsort(registro, kind="stable")
+            lugar = np.minimum(np.searchsorted(registro[orden], ids), len(registro) - 1)
+            conocidos = registro[orden[lugar]] == ids
+            posiciones[conocidos] = orden[lugar[conocidos]]
+        altas = posiciones < 0
+        nuevos = np.unique(ids[altas])
+        posiciones[altas] = len(registro) + np.searchsorted(nuevos, ids[altas])
+        registro = np.concatenate([registro, nuevos])
+
+        etiquetas = np.full(len(registro), AUSENTE, dtype=np.int8)
+        etiquetas[posiciones] = clusters
+
+        id_foto = max((foto["id"] for foto in self.fotos), default=0) + 1
+        columnas = [c for c in COLUMNAS_RFM if c in rfm.columns]
+        valores = rfm[columnas].astype(np.float64)
+        medias = valores.groupby(clusters).mean()
+        foto = {
+            "id": id_foto,
+            "fecha": fecha.isoformat(),
+            "archivo": f"etiquetas_{id_foto:04d}.npy",
+            "longitud": int(len(registro)),
+            "n_clientes": int(len(ids)),
+            "version_modelo": version_modelo,
+            "conteos": {str(c): int(n) for c, n in zip(*np.unique(clusters, return_counts=True))},
+            "medias": {str(c): fila.round(4).tolist() for c, fila in medias.iterrows()},
+            "desviaciones": valores.std(ddof=0).round(6).tolist(),
+            "columnas": columnas,
+        }
+
+        # El índice se escribe el último: una foto a medias nunca aparece listada
+        _escribir_atomico(self._ruta(foto["archivo"]), lambda f: np.save(f, etiquetas))
+        _escribir_atomico(self._ruta("clientes.npy"), lambda f: np.save(f, registro))
+        fotos = self.fotos + [foto]
+        _escribir_atomico(
+            self._ruta("indice.json"),
+            lambda f: f.write(json.dumps({"fotos": fotos}, indent=1, ensure_ascii=False).encode("utf-8")),
+        )
+        self.fotos = fotos
+        return foto
+
+    def transiciones(self, id_anterior, id_posterior, tamano_bloque=TAMANO_BLOQUE):
+        """
+        Matriz de clientes (segmento anterior x segmento posterior), con
+        AUSENTE para los que no estaban en una de las dos fotos.
+        """
+        anterior = self.etiquetas(id_anterior)
+        posterior = self.etiquetas(id_posterior)
+        n = max(len(anterior), len(posterior))
+        clusters = sorted({int(c) for foto in (self.foto(id_anterior), self.foto(id_posterior))
+                           for c in foto["conteos"]})
+        valores = [AUSENTE] + clusters
+        ancho = max(valores) + 2  # etiquetas -1..max -> 0..max+1
+
+        conteos = np.zeros(ancho * ancho, dtype=np.int64)
+        for inicio in range(0, n, tamano_bloque):
+            fin = min(inicio + tamano_bloque, n)
+            a = self._bloque(anterior, inicio, fin)
+            b = self._bloque(posterior, inicio, fin)
+            conteos += np.bincount((a + 1) * ancho + (b + 1), minlength=ancho * ancho)
+
+        matriz = conteos.reshape(ancho, ancho)[np.ix_([v + 1 for v in valores], [v + 1 for v in valores])]
+        tabla = pd.DataFrame(matriz, index=pd.Index(valores, name="Anterior"),
+                             columns=pd.Index(valores, name="Posterior"))
+        return tabla.loc[tabla.sum(axis=1) > 0, tabla.sum(axis=0) > 0]
+
+    @staticmethod
+    def _bloque(etiquetas, inicio, fin):
+        """Etiquetas [inicio, fin) como int64; las posiciones posteriores a la foto son AUSENTE"""
+        bloque = np.full(fin - inicio, AUSENTE, dtype=np.int64)
+        disponibles = max(0, min(fin, len(etiquetas)) - inicio)
+        bloque[:disponibles] = etiquetas[inicio:inicio + disponibles]
+        return bloque
+
+    def segmento_inactivos(self, id_foto):
+        """
+        Segmento de los Inactivos en una foto según el perfil RFM de sus
+        medias (misma regla que al nombrar los centroides); si la foto no
+        tiene los cuatro segmentos, el de NOMBRES_SEGMENTOS.
+        """
+        foto = self.foto(id_foto)
+        segmentos = sorted(int(c) for c in foto["medias"])
+        medias = np.array([foto["medias"][str(c)] for c in segmentos], dtype=np.float64)
+        if len(segmentos) != len(NOMBRES_SEGMENTOS):
+            return SEGMENTO_INACTIVOS
+        perfil = segmentos_iniciales(medias, foto["columnas"])
+        return segmentos[int(np.flatnonzero(perfil == SEGMENTO_INACTIVOS)[0])]
+
+    def pasan_a_inactivos(self, id_anterior, id_posterior, segmento_inactivos=None):
+        """Clientes que estaban en otro segmento y pasan a Inactivos, por segmento de origen"""
+        if segmento_inactivos is None:
+            segmento_inactivos = self.segmento_inactivos(id_posterior)
+        tabla = self.transiciones(id_anterior, id_posterior)
+        if segmento_inactivos not in tabla.columns:
+            return pd.Series(dtype=np.int64, name="Pasan a Inactivos")
+        origen = tabla[segmento_inactivos].drop([AUSENTE, segmento_inactivos], errors="ignore")
+        return origen.rename("Pasan a Inactivos")
+
+    def deriva_centroides(self, id_anterior, id_posterior):
+        """
+        Media de cada variable por segmento en las dos fotos y la distancia
+        entre centroides en desviaciones estándar de la foto anterior.
+        """
+        anterior, posterior = self.foto(id_anterior), self.foto(id_posterior)
+        columnas = anterior["columnas"]
+        medias_a = pd.DataFrame(anterior["medias"], index=columnas).T
+        medias_b = pd.DataFrame(posterior["medias"], index=posterior["columnas"]).T[columnas]
+        comunes = medias_a.index.intersection(medias_b.index)
+        medias_a, medias_b = medias_a.loc[comunes], medias_b.loc[comunes]
+
+        escalas = np.asarray(anterior["desviaciones"], dtype=np.float64)
+        escalas[escalas == 0] = 1.0
+        distancia = np.sqrt((((medias_b - medias_a) / escalas) ** 2).sum(axis=1))
+
+        tabla = pd.concat({"Anterior": medias_a, "Posterior": medias_b}, axis=1)
+        tabla[("Deriva", "Distancia (σ)")] = distancia
+        tabla.index = pd.Index(comunes.astype(int), name="Cluster")
+        return tabla.sort_index()
+
+    def evolucion(self):
+        """Clientes por segmento en cada foto (solo metadatos, sin leer etiquetas)"""
+        filas = {
+            pd.Timestamp(foto["fecha"]): {int(c): n for c, n in foto["conteos"].items()}
+            for foto in self.fotos
+        }
+        tabla = pd.DataFrame.from_dict(filas, orient="index").fillna(0).astype(np.int64)
+        return tabla.reindex(sorted(tabla.columns), axis=1).sort_index()
+
+
+def nombre_segmento(cluster):
+    if cluster == AUSENTE:
+        return "Sin registro"
+    return NOMBRES_SEGMENTOS.get(cluster, f"Segmento {cluster}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Histórico de segmentaciones")
+    parser.add_argument("--almacen", default=RUTA_ALMACEN)
+    sub = parser.add_subparsers(dest="accion", required=True)
+
+    registrar = sub.add_parser("registrar", help="Guardar una foto de una tabla RFM con Cluster")
+    registrar.add_argument("resultados", help="CSV con CustomerID, RFM y Cluster")
+    registrar.add_argument("--fecha", default=None, help="Fecha de la foto (por defecto, ahora)")
+    registrar.add_argument("--version-modelo", default=None)
+
+    comparar = sub.add_parser("comparar", help="Transiciones y deriva entre dos fotos")
+    comparar.add_argument("--anterior", type=int, default=None, help="Id de foto (por defecto la penúltima)")
+    comparar.add_argument("--posterior", type=int, default=None, help="Id de foto (por defecto la última)")
+    args = parser.parse_args()
+
+    almacen = AlmacenSegmentos(args.almacen)
+    if args.accion == "registrar":
+        foto = almacen.registrar(pd.read_csv(args.resultados, index_col=0), args.fecha, args.version_modelo)
+        print(f"✅ Foto {foto['id']} ({foto['fecha']}): {foto['n_clientes']:,} clientes")
+        return
+
+    if len(almacen) < 2:
+        parser.error("Hacen falta al menos dos fotos para comparar")
+    anterior = args.anterior or almacen.fotos[-2]["id"]
+    posterior = args.posterior or almacen.fotos[-1]["id"]
+    print(f"Transiciones foto {anterior} -> foto {posterior} ({AUSENTE} = sin registro):")
+    print(almacen.transiciones(anterior, posterior).to_string())
+    print("\nPasan a Inactivos por segmento de origen:")
+    print(almacen.pasan_a_inactivos(anterior, posterior).to_string())
+    print("\nDeriva de centroides:")
+    print(almacen.deriva_centroides(anterior, posterior).round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,32 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
 import os
-from sklearn.preprocessing import StandardScaler
+
+from almacen_segmentos import AUSENTE, RUTA_ALMACEN, AlmacenSegmentos, nombre_segmento
+from busqueda import IndiceClientes
+from cache_datos import huella_contenido
+from esquemas import reporte_memoria, tipar_rfm
+from instrumentacion import Cronometro, PerfilEjecucion, tiempos_activados
+from miembros_segmentos import FORMATOS, TAMANO_PAGINA, MiembrosSegmentos
+from graficos import (CacheGraficos, grafico_comparacion_segmentos,
+                      grafico_distribucion_rfm, grafico_evolucion_segmentos,
+                      grafico_segmentos)
+from rankings import RUTA_RANKINGS, TODOS, RankingsRFM
+from recarga import Recargable
+from reentrenamiento import alinear_segmentos, entrenar_kmeans
+from resumenes import (RUTA_BUNDLE, ResumenSegmentos, histogramas_globales,
+                       metricas_generales)
+from rfm import COLUMNAS_RFM, calcular_rfm
+from rfm_historico import SIN_COMPRAS, HistorialRFM
+from segmentacion import (NOMBRES_SEGMENTOS, RUTA_ARTEFACTO, RUTA_RESULTADOS,
+                          asignar_segmentos, cargar_artefacto)
+from similares import (K_SIMILARES, RUTA_INDICE_SIMILARES, IndiceSimilares,
+                       construir_indice, version_rfm)
+from transacciones import RUTA_EXCEL, cargar_transacciones
+
+# Tiempos por etapa de esta ejecución (el perfil cProfile de RFM_PERFIL empieza con la página)
+cronometro = Cronometro()
 
 # Configuración de la página
 st.set_page_config(
@@ -189,12 +210,15 @@ st.markdown("**Proyecto de Minería de Datos – Grupo 4**")
 st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
 
 # Cargar modelo y datos
-@st.cache_resource
-def cargar_modelo():
+RUTA_MODELO = "modelo_kmeans.pkl"
+
+def leer_modelo():
     try:
         # Para Streamlit Cloud, usa rutas relativas
-        modelo_path = "modelo_kmeans.pkl"
+        modelo_path = RUTA_MODELO
         if os.path.exists(modelo_path):
+            # joblib y scikit-learn solo se importan si hace falta el modelo
+            import joblib
             modelo = joblib.load(modelo_path)
             return modelo
         else:
@@ -204,18 +228,22 @@ def cargar_modelo():
         st.warning(f"Modelo no disponible: {e}")
         return None
 
-@st.cache_data
-def cargar_datos_originales():
+def leer_artefacto_segmentacion():
+    """Scaler + centroides exportados por el notebook (sin scikit-learn)"""
+    try:
+        if os.path.exists(RUTA_ARTEFACTO):
+            return cargar_artefacto(RUTA_ARTEFACTO)
+    except Exception as e:
+        st.warning(f"Artefacto de segmentación no disponible: {e}")
+    return None
+
+def leer_datos_originales():
     try:
         # Para Streamlit Cloud, usa rutas relativas
-        ruta_excel = "Online Retail.xlsx"
+        ruta_excel = RUTA_EXCEL
         if os.path.exists(ruta_excel):
-            df = pd.read_excel(ruta_excel)
-            
-            # Limpieza básica
-            df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], errors="coerce")
-            df = df.dropna(subset=["CustomerID"])
-            df = df[df["Quantity"] > 0]
+            # Limpieza básica + caché columnar (evita re-leer el Excel en cada arranque)
+            df = cargar_transacciones(ruta_excel)
             
             return df
         else:
@@ -242,22 +270,22 @@ def crear_datos_ejemplo():
     df = pd.DataFrame(datos)
     df.set_index('CustomerID', inplace=True)
     
-    # Aplicar clustering básico
-    from sklearn.cluster import KMeans
+    # Aplicar clustering básico (segmentos nombrados por el perfil de cada clúster)
+    from sklearn.preprocessing import StandardScaler
     scaler = StandardScaler()
     datos_escalados = scaler.fit_transform(df)
-    kmeans = KMeans(n_clusters=4, random_state=42)
-    df['Cluster'] = kmeans.fit_predict(datos_escalados)
+    kmeans, segmentos = entrenar_kmeans(datos_escalados, 4, scaler)
+    df['Cluster'] = segmentos[kmeans.labels_]
     
     return df
 
-@st.cache_data
-def cargar_resultados_rfm():
+def leer_resultados_rfm():
     try:
         # Para Streamlit Cloud, usa rutas relativas
-        csv_path = "resultados_segmentacion.csv"
+        csv_path = RUTA_RESULTADOS
         if os.path.exists(csv_path):
-            rfm = pd.read_csv(csv_path, index_col=0)
+            # CustomerID int32, Cluster int8, etc. (ver esquemas.py)
+            rfm = tipar_rfm(pd.read_csv(csv_path, index_col=0))
             return rfm
     except:
         pass
@@ -269,621 +297,1032 @@ def cargar_resultados_rfm():
     
     # Si ya tiene cluster, usar directamente
     if 'Cluster' in df.columns:
-        return df
+        return tipar_rfm(df)
+    
+    # Transacciones: calcular RFM de forma vectorizada
+    if 'InvoiceNo' in df.columns:
+        df = calcular_rfm(df)
+    
+    # Si no, calcular clustering con el artefacto entrenado (scaler + centroides fijos)
+    artefacto = cargar_artefacto_segmentacion()
+    if artefacto is not None:
+        df['Cluster'] = asignar_segmentos(artefacto, df)
+        return tipar_rfm(df)
     
-    # Si no, calcular clustering
     modelo = cargar_modelo()
     if modelo is not None:
+        # Escalar datos para el modelo
+        from sklearn.preprocessing import StandardScaler
+        scaler = StandardScaler()
+        rfm_scaled = scaler.fit_transform(df[COLUMNAS_RFM])
         try:
-            # Escalar datos para el modelo
-            scaler = StandardScaler()
-            rfm_scaled = scaler.fit_transform(df[['Recency', 'Frequency', 'Monetary']])
-            df['Cluster'] = modelo.predict(rfm_scaled)
+            # Etiquetas del K-Means -> segmentos, con la misma regla de perfil que el artefacto
+            segmentos = alinear_segmentos(modelo.cluster_centers_, scaler)
+            df['Cluster'] = segmentos[modelo.predict(rfm_scaled)]
         except Exception as e:
             st.warning(f"No se pudo aplicar el modelo de clustering: {e}")
-            # Clustering básico como fallback
-            from sklearn.cluster import KMeans
-            kmeans = KMeans(n_clusters=4, random_state=42)
-            df['Cluster'] = kmeans.fit_predict(rfm_scaled)
+            # Clustering básico como fallback (segmentos nombrados por el perfil de cada clúster)
+            kmeans, segmentos = entrenar_kmeans(rfm_scaled, 4, scaler)
+            df['Cluster'] = segmentos[kmeans.labels_]
     
-    return df
+    return tipar_rfm(df)
 
-# Sidebar para navegación
-st.sidebar.title("Panel de Navegación")
-st.sidebar.markdown("---")
-opcion = st.sidebar.radio(
-    "Selecciona una sección:",
-    ["Dashboard General", "Análisis de Segmentos", "Buscar Cliente", "Recomendaciones Estratégicas"]
-)
+def total_unidades_transacciones(df):
+    """Unidades vendidas, o None si no hay transacciones (datos de ejemplo)"""
+    if df is None or 'Quantity' not in df.columns:
+        return None
+    return df['Quantity'].sum()
 
-# Cargar recursos
-with st.spinner('Cargando datos...'):
-    modelo = cargar_modelo()
-    df_original = cargar_datos_originales()
-    rfm_data = cargar_resultados_rfm()
+def leer_resumen_segmentos():
+    """Estadísticas por segmento: del bundle del notebook o calculadas al vuelo"""
+    # El bundle solo vale mientras el CSV de resultados sea el mismo que lo generó
+    try:
+        if os.path.exists(RUTA_BUNDLE) and os.path.exists(RUTA_RESULTADOS):
+            resumen = ResumenSegmentos.cargar(RUTA_BUNDLE, huella_contenido(RUTA_RESULTADOS))
+            if resumen is not None:
+                return resumen
+    except Exception as e:
+        st.warning(f"Bundle del dashboard no disponible: {e}")
+    
+    # Sin las transacciones: las unidades vendidas solo las necesita el Dashboard General
+    rfm = cargar_resultados_rfm()
+    if rfm is None or 'Cluster' not in rfm.columns:
+        return None
+    return ResumenSegmentos(rfm)
 
-if rfm_data is None:
-    st.error("No se pudieron cargar los datos.")
-    st.stop()
+def leer_metricas_generales():
+    """Tarjetas del Dashboard General (las transacciones solo se leen sin bundle)"""
+    resumen = cargar_resumen_segmentos()
+    if resumen is not None and resumen.es_bundle:
+        return resumen.metricas
+    rfm = resumen.rfm if resumen is not None else cargar_resultados_rfm()
+    if rfm is None:
+        return None
+    return metricas_generales(rfm, total_unidades_transacciones(cargar_datos_originales()))
 
-# --- SECCIÓN 1: DASHBOARD GENERAL ---
-if opcion == "Dashboard General":
-    st.markdown('<h2 class="sub-header">Dashboard General RFM</h2>', unsafe_allow_html=True)
-    
-    # Métricas principales
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        total_clientes = len(rfm_data)
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Total Clientes", f"{total_clientes:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        if 'Quantity' in df_original.columns:
-            total_ventas = df_original['Quantity'].sum()
-        else:
-            total_ventas = rfm_data['Frequency'].sum() * 10  # Estimación para datos de ejemplo
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Total Transacciones", f"{total_ventas:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col3:
-        if 'Monetary' in rfm_data.columns:
-            ingresos_totales = rfm_data['Monetary'].sum()
-        else:
-            ingresos_totales = total_ventas * 50  # Estimación para datos de ejemplo
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Ingresos Totales", f"${ingresos_totales:,.2f}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col4:
-        if 'Frequency' in rfm_data.columns:
-            transacciones_totales = rfm_data['Frequency'].sum()
-        else:
-            transacciones_totales = total_clientes * 5  # Estimación para datos de ejemplo
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Total Pedidos", f"{transacciones_totales:,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+def leer_version_datos():
+    """Huella del contenido de la tabla RFM cargada (clave de las cachés)"""
+    resumen = cargar_resumen_segmentos()
+    if resumen is not None:
+        return resumen.version
+    rfm = cargar_resultados_rfm()
+    if rfm is None:
+        return None
+    return format(int(pd.util.hash_pandas_object(rfm).sum()), "x")
+
+@st.cache_resource
+def cargar_cache_graficos():
+    """Imágenes PNG ya renderizadas, compartidas entre sesiones"""
+    return CacheGraficos()
+
+def leer_indice_clientes():
+    """
+    (tabla, índice ordenado de CustomerID) para la búsqueda por prefijo. Las
+    posiciones del índice solo valen en la tabla con la que se construyó, así
+    que se recargan juntas.
+    """
+    rfm = cargar_resultados_rfm()
+    if rfm is None:
+        return None, None
+    return rfm, IndiceClientes(rfm.index)
+
+def leer_miembros_segmentos():
+    """Orden de los clientes de cada segmento por cada variable (tabla paginada)"""
+    rfm = cargar_resultados_rfm()
+    if rfm is None or 'Cluster' not in rfm.columns:
+        return None
+    return MiembrosSegmentos(rfm)
+
+def leer_rankings():
+    """Mayores/menores K por variable y segmento: los guardados si son de este CSV, si no se calculan"""
+    huella = huella_contenido(RUTA_RESULTADOS) if os.path.exists(RUTA_RESULTADOS) else None
+    try:
+        if huella is not None and os.path.exists(RUTA_RANKINGS):
+            rankings = RankingsRFM.cargar(RUTA_RANKINGS, huella)
+            if rankings is not None:
+                return rankings
+    except Exception as e:
+        st.warning(f"Rankings guardados no disponibles: {e}")
     
-    # Distribución de clusters
-    col_left, col_right = st.columns([1, 1])
+    rfm = cargar_resultados_rfm()
+    if rfm is None or 'Cluster' not in rfm.columns:
+        return None
+    rankings = RankingsRFM(rfm)
+    if huella is not None:
+        try:
+            rankings.guardar(RUTA_RANKINGS, huella)
+        except OSError:
+            pass  # Sin permisos de escritura: se recalculan en el próximo arranque
+    return rankings
+
+def leer_historial_rfm():
+    """Compras por cliente ordenadas por fecha (RFM a fechas pasadas)"""
+    df = cargar_datos_originales()
+    if df is None or 'InvoiceNo' not in df.columns:
+        return None
+    return HistorialRFM(df)
+
+@st.cache_resource(max_entries=16)
+def resumen_a_fecha(_historial, _artefacto, version, fecha):
+    """Estadísticas por segmento con el RFM a una fecha (una entrada por versión y fecha)"""
+    rfm = _historial.rfm_a_fecha(fecha, _artefacto)
+    if len(rfm) == 0:
+        return None
+    return ResumenSegmentos(tipar_rfm(rfm))
+
+def leer_almacen_segmentos():
+    """Histórico de fotos de segmentos (solo el índice; las etiquetas se abren con memmap)"""
+    return AlmacenSegmentos(RUTA_ALMACEN)
+
+@st.cache_resource(max_entries=32)
+def comparar_fotos(_almacen, clave, id_anterior, id_posterior):
+    """Transiciones, pasos a Inactivos y deriva entre dos fotos (las fotos no cambian)"""
+    return (_almacen.transiciones(id_anterior, id_posterior),
+            _almacen.pasan_a_inactivos(id_anterior, id_posterior),
+            _almacen.deriva_centroides(id_anterior, id_posterior))
+
+def leer_indice_similares():
+    """
+    (tabla, KD-tree del RFM escalado): el guardado si es de estos datos y
+    modelo, si no se construye. Las posiciones de los vecinos son filas de esa tabla.
+    """
+    rfm = cargar_resultados_rfm()
+    if rfm is None:
+        return None, None
+    artefacto = cargar_artefacto_segmentacion()
+    version_datos = version_rfm(rfm)
+    version_modelo = artefacto["version_modelo"] if artefacto is not None else None
+    try:
+        if os.path.exists(RUTA_INDICE_SIMILARES):
+            indice = IndiceSimilares.cargar(RUTA_INDICE_SIMILARES, version_datos, version_modelo)
+            if indice is not None and indice.meta.get("version_modelo") == version_modelo:
+                return rfm, indice
+    except Exception as e:
+        st.warning(f"Índice de clientes similares no disponible: {e}")
     
-    with col_left:
-        st.markdown('<h3 class="sub-header">Distribución de Segmentos</h3>', unsafe_allow_html=True)
-        
-        if 'Cluster' in rfm_data.columns:
-            cluster_counts = rfm_data['Cluster'].value_counts().sort_index()
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
-            bars = ax.bar([f'Segmento {i}' for i in cluster_counts.index], 
-                         cluster_counts.values, 
-                         color=colors[:len(cluster_counts)])
-            
-            ax.set_ylabel('Número de Clientes', fontweight='bold', color='#2c3e50')
-            ax.set_xlabel('Segmentos', fontweight='bold', color='#2c3e50')
-            ax.set_title('Distribución de Clientes por Segmento RFM', fontsize=14, fontweight='bold', color='#2c3e50')
-            ax.tick_params(colors='#2c3e50')
-            plt.xticks(rotation=45)
-            
-            # Agregar valores en las barras
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height,
-                       f'{int(height)}\n({height/total_clientes*100:.1f}%)', 
-                       ha='center', va='bottom', fontweight='bold', fontsize=9, color='#2c3e50')
-            
-            # Configurar color del gráfico
-            ax.set_facecolor('#f8f9fa')
-            fig.patch.set_facecolor('#f8f9fa')
-            plt.tight_layout()
-            st.pyplot(fig)
+    indice = construir_indice(rfm, artefacto, version_datos)
+    try:
+        indice.guardar(RUTA_INDICE_SIMILARES)
+    except OSError:
+        pass  # Sin permisos de escritura: se reconstruye en el próximo arranque
+    return rfm, indice
+
+@st.cache_resource
+def recursos_recargables():
+    """
+    Loaders compartidos por todas las sesiones. Cada uno se identifica por la
+    huella de sus archivos y de sus dependencias: si el proceso nocturno
+    reemplaza un archivo, la versión nueva se carga en segundo plano y se
+    sigue sirviendo la anterior hasta que esté lista (sin reiniciar el servidor).
+    """
+    modelo = Recargable(leer_modelo, rutas=[RUTA_MODELO])
+    artefacto = Recargable(leer_artefacto_segmentacion, rutas=[RUTA_ARTEFACTO])
+    originales = Recargable(leer_datos_originales, rutas=[RUTA_EXCEL])
+    resultados = Recargable(leer_resultados_rfm, rutas=[RUTA_RESULTADOS],
+                            dependencias=[originales, artefacto, modelo])
+    resumen = Recargable(leer_resumen_segmentos, rutas=[RUTA_BUNDLE],
+                         dependencias=[resultados])
+    return {
+        "modelo": modelo,
+        "artefacto": artefacto,
+        "originales": originales,
+        "resultados": resultados,
+        "resumen": resumen,
+        "metricas": Recargable(leer_metricas_generales, dependencias=[resumen, resultados, originales]),
+        "version_datos": Recargable(leer_version_datos, dependencias=[resumen, resultados]),
+        "indice_clientes": Recargable(leer_indice_clientes, dependencias=[resultados]),
+        "miembros": Recargable(leer_miembros_segmentos, dependencias=[resultados]),
+        "rankings": Recargable(leer_rankings, dependencias=[resultados]),
+        "similares": Recargable(leer_indice_similares, dependencias=[resultados, artefacto]),
+        "historial": Recargable(leer_historial_rfm, dependencias=[originales]),
+        "almacen": Recargable(leer_almacen_segmentos, rutas=[os.path.join(RUTA_ALMACEN, "indice.json")]),
+    }
+
+def cargar_modelo():
+    return recursos_recargables()["modelo"].obtener()
+
+def cargar_artefacto_segmentacion():
+    return recursos_recargables()["artefacto"].obtener()
+
+def cargar_datos_originales():
+    return recursos_recargables()["originales"].obtener()
+
+def cargar_resultados_rfm():
+    return recursos_recargables()["resultados"].obtener()
+
+def cargar_resumen_segmentos():
+    return recursos_recargables()["resumen"].obtener()
+
+def cargar_metricas_generales():
+    return recursos_recargables()["metricas"].obtener()
+
+def cargar_version_datos():
+    return recursos_recargables()["version_datos"].obtener()
+
+def cargar_indice_clientes():
+    return recursos_recargables()["indice_clientes"].obtener()
+
+def cargar_indice_similares():
+    return recursos_recargables()["similares"].obtener()
+
+def cargar_miembros_segmentos():
+    return recursos_recargables()["miembros"].obtener()
+
+def cargar_rankings():
+    return recursos_recargables()["rankings"].obtener()
+
+def cargar_historial_rfm():
+    return recursos_recargables()["historial"].obtener()
+
+def cargar_almacen_segmentos():
+    return recursos_recargables()["almacen"].obtener()
+
+class PaginaDetenida(Exception):
+    """Fin anticipado de la página (en lugar de st.stop(), que impide guardar el perfil y los tiempos)"""
+
+def mostrar_grafico(clave, construir_figura):
+    """Gráfico desde la caché de imágenes (solo se dibuja si no está)"""
+    with cronometro.medir(f"Gráfico: {clave[-1]}"):
+        st.image(cache_graficos.obtener(clave, construir_figura))
+
+# El cuerpo de la página va en un try: las salidas anticipadas (PaginaDetenida) y
+# los errores también guardan el perfil y muestran los tiempos
+perfil = PerfilEjecucion.desde_entorno()
+opcion = None
+try:
+    # Sidebar para navegación
+    st.sidebar.title("Panel de Navegación")
+    st.sidebar.markdown("---")
+    opcion = st.sidebar.radio(
+        "Selecciona una sección:",
+        ["Dashboard General", "Análisis de Segmentos", "Buscar Cliente", "RFM a una Fecha",
+         "Migración de Segmentos", "Recomendaciones Estratégicas"]
+    )
+
+    # Cargar recursos (el modelo y las transacciones solo cuando una sección los necesita)
+    with st.spinner('Cargando datos...'):
+        resumen = cronometro.llamar("Carga: resumen de segmentos", cargar_resumen_segmentos)
+        # Con el bundle, la tabla de clientes solo hace falta para buscar un cliente
+        if resumen is None or not resumen.es_bundle or opcion == "Buscar Cliente":
+            rfm_data = cronometro.llamar("Carga: resultados RFM", cargar_resultados_rfm)
         else:
-            st.info("No hay datos de segmentación disponibles.")
-    
-    with col_right:
-        st.markdown('<h3 class="sub-header">Resumen RFM por Segmento</h3>', unsafe_allow_html=True)
-        
-        if 'Cluster' in rfm_data.columns:
-            resumen_clusters = rfm_data.groupby('Cluster').agg({
-                'Recency': 'mean',
-                'Frequency': 'mean', 
-                'Monetary': 'mean'
-            }).round(2)
-            
-            # Formatear para mejor visualización
-            resumen_display = resumen_clusters.rename(columns={
-                'Recency': 'Recencia (días)',
-                'Frequency': 'Frecuencia',
-                'Monetary': 'Valor Monetario ($)'
-            })
-            
-            st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
-            st.dataframe(
-                resumen_display.style.format({
-                    'Valor Monetario ($)': '${:,.2f}',
-                    'Recencia (días)': '{:.1f}',
-                    'Frecuencia': '{:.1f}'
-                }).background_gradient(cmap='Blues'), 
-                use_container_width=True
-            )
+            rfm_data = None
+        version_datos = cronometro.llamar("Carga: versión de datos", cargar_version_datos)
+        cache_graficos = cargar_cache_graficos()
+
+    if resumen is None and rfm_data is None:
+        st.error("No se pudieron cargar los datos.")
+        raise PaginaDetenida
+
+    cronometro.iniciar(f"Sección: {opcion}")
+
+    # --- SECCIÓN 1: DASHBOARD GENERAL ---
+    if opcion == "Dashboard General":
+        st.markdown('<h2 class="sub-header">Dashboard General RFM</h2>', unsafe_allow_html=True)
+
+        # Métricas principales (precalculadas en el bundle cuando existe)
+        with st.spinner('Cargando métricas...'):
+            metricas = cronometro.llamar("Carga: métricas generales", cargar_metricas_generales)
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            total_clientes = metricas['total_clientes']
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Total Clientes", f"{total_clientes:,}")
             st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            # Mostrar estadísticas generales si no hay clusters
-            st.markdown('<div class="info-box">', unsafe_allow_html=True)
-            st.markdown("**Estadísticas RFM Generales:**")
-            if 'Recency' in rfm_data.columns:
-                st.write(f"- **Recencia promedio:** {rfm_data['Recency'].mean():.1f} días")
-            if 'Frequency' in rfm_data.columns:
-                st.write(f"- **Frecuencia promedio:** {rfm_data['Frequency'].mean():.1f} transacciones")
-            if 'Monetary' in rfm_data.columns:
-                st.write(f"- **Valor monetario promedio:** ${rfm_data['Monetary'].mean():.2f}")
+
+        with col2:
+            total_ventas = metricas['total_unidades']
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Total Transacciones", f"{total_ventas:,}")
             st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Gráficos de distribución RFM
-    st.markdown('<h3 class="sub-header">Distribución de Variables RFM</h3>', unsafe_allow_html=True)
-    
-    fig, axes = plt.subplots(1, 3, figsize=(15, 4))
-    
-    # Recency
-    if 'Recency' in rfm_data.columns:
-        axes[0].hist(rfm_data['Recency'], bins=30, alpha=0.7, color='#3498db', edgecolor='black')
-        axes[0].set_title('Distribución de Recencia', fontweight='bold', color='#2c3e50')
-        axes[0].set_xlabel('Días desde última compra', color='#2c3e50')
-        axes[0].set_ylabel('Frecuencia', color='#2c3e50')
-        axes[0].tick_params(colors='#2c3e50')
-        axes[0].grid(True, alpha=0.3)
-        axes[0].set_facecolor('#f8f9fa')
-    
-    # Frequency
-    if 'Frequency' in rfm_data.columns:
-        axes[1].hist(rfm_data['Frequency'], bins=30, alpha=0.7, color='#2ecc71', edgecolor='black')
-        axes[1].set_title('Distribución de Frecuencia', fontweight='bold', color='#2c3e50')
-        axes[1].set_xlabel('Número de transacciones', color='#2c3e50')
-        axes[1].set_ylabel('Frecuencia', color='#2c3e50')
-        axes[1].tick_params(colors='#2c3e50')
-        axes[1].grid(True, alpha=0.3)
-        axes[1].set_facecolor('#f8f9fa')
-    
-    # Monetary
-    if 'Monetary' in rfm_data.columns:
-        monetary_filtered = rfm_data[rfm_data['Monetary'] < rfm_data['Monetary'].quantile(0.95)]['Monetary']
-        axes[2].hist(monetary_filtered, bins=30, alpha=0.7, color='#e74c3c', edgecolor='black')
-        axes[2].set_title('Distribución de Valor Monetario (95% percentil)', fontweight='bold', color='#2c3e50')
-        axes[2].set_xlabel('Valor total ($)', color='#2c3e50')
-        axes[2].set_ylabel('Frecuencia', color='#2c3e50')
-        axes[2].tick_params(colors='#2c3e50')
-        axes[2].grid(True, alpha=0.3)
-        axes[2].set_facecolor('#f8f9fa')
-    
-    fig.patch.set_facecolor('#f8f9fa')
-    plt.tight_layout()
-    st.pyplot(fig)
 
-# --- SECCIÓN 2: ANÁLISIS DE SEGMENTOS ---
-elif opcion == "Análisis de Segmentos":
-    st.markdown('<h2 class="sub-header">Análisis Detallado por Segmento</h2>', unsafe_allow_html=True)
-    
-    if 'Cluster' not in rfm_data.columns:
-        st.warning("No se encontraron datos de segmentación.")
-        st.stop()
-    
-    # Selector de segmento
-    segmentos_disponibles = sorted(rfm_data['Cluster'].unique())
-    segmento_seleccionado = st.selectbox(
-        "Selecciona un segmento para analizar:",
-        segmentos_disponibles
-    )
-    
-    # Datos del segmento seleccionado
-    segmento_data = rfm_data[rfm_data['Cluster'] == segmento_seleccionado]
-    
-    # Métricas del segmento
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Clientes en Segmento", f"{len(segmento_data):,}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        if 'Recency' in segmento_data.columns:
-            recencia_promedio = segmento_data['Recency'].mean()
-        else:
-            recencia_promedio = 0
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Recencia Promedio", f"{recencia_promedio:.1f} días")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col3:
-        if 'Frequency' in segmento_data.columns:
-            frecuencia_promedio = segmento_data['Frequency'].mean()
-        else:
-            frecuencia_promedio = 0
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Frecuencia Promedio", f"{frecuencia_promedio:.1f}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col4:
-        if 'Monetary' in segmento_data.columns:
-            valor_promedio = segmento_data['Monetary'].mean()
-        else:
-            valor_promedio = 0
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Valor Promedio", f"${valor_promedio:.2f}")
-        st.markdown('</div>', unsafe_allow_html=True)
-    
-    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-    
-    # Visualizaciones comparativas
-    if 'Recency' in rfm_data.columns and 'Monetary' in rfm_data.columns:
-        col_viz1, col_viz2 = st.columns(2)
-        
-        with col_viz1:
-            st.markdown('<h3 class="sub-header">Comparación de Recencia</h3>', unsafe_allow_html=True)
-            fig, ax = plt.subplots(figsize=(10, 5))
-            
-            for cluster in segmentos_disponibles:
-                data_cluster = rfm_data[rfm_data['Cluster'] == cluster]['Recency']
-                color = '#e74c3c' if cluster == segmento_seleccionado else '#bdc3c7'
-                alpha = 0.8 if cluster == segmento_seleccionado else 0.4
-                label = f'Segmento {cluster}' if cluster == segmento_seleccionado else f'Seg {cluster}'
-                ax.hist(data_cluster, bins=15, alpha=alpha, label=label, color=color)
-            
-            ax.set_xlabel('Recencia (días)', color='#2c3e50')
-            ax.set_ylabel('Frecuencia', color='#2c3e50')
-            ax.set_title('Distribución de Recencia por Segmento', fontweight='bold', color='#2c3e50')
-            ax.tick_params(colors='#2c3e50')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            ax.set_facecolor('#f8f9fa')
-            fig.patch.set_facecolor('#f8f9fa')
-            plt.tight_layout()
-            st.pyplot(fig)
-        
-        with col_viz2:
-            st.markdown('<h3 class="sub-header">Comparación de Valor Monetario</h3>', unsafe_allow_html=True)
-            fig, ax = plt.subplots(figsize=(10, 5))
-            
-            for cluster in segmentos_disponibles:
-                data_cluster = rfm_data[rfm_data['Cluster'] == cluster]['Monetary']
-                # Filtrar outliers para mejor visualización
-                data_cluster = data_cluster[data_cluster < data_cluster.quantile(0.95)]
-                color = '#27ae60' if cluster == segmento_seleccionado else '#bdc3c7'
-                alpha = 0.8 if cluster == segmento_seleccionado else 0.4
-                label = f'Segmento {cluster}' if cluster == segmento_seleccionado else f'Seg {cluster}'
-                ax.hist(data_cluster, bins=15, alpha=alpha, label=label, color=color)
-            
-            ax.set_xlabel('Valor Monetario ($)', color='#2c3e50')
-            ax.set_ylabel('Frecuencia', color='#2c3e50')
-            ax.set_title('Distribución de Valor por Segmento', fontweight='bold', color='#2c3e50')
-            ax.tick_params(colors='#2c3e50')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            ax.set_facecolor('#f8f9fa')
-            fig.patch.set_facecolor('#f8f9fa')
-            plt.tight_layout()
-            st.pyplot(fig)
-    
-    # Top clientes del segmento
-    st.markdown('<h3 class="sub-header">Top 10 Clientes del Segmento</h3>', unsafe_allow_html=True)
-    
-    if 'Monetary' in segmento_data.columns:
-        top_clientes = segmento_data.nlargest(10, 'Monetary')[['Recency', 'Frequency', 'Monetary']]
-        top_clientes_display = top_clientes.copy()
-        top_clientes_display.index.name = 'CustomerID'
-        
-        st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
-        st.dataframe(
-            top_clientes_display.style.format({
-                'Monetary': '${:,.2f}',
-                'Recency': '{:.0f} días',
-                'Frequency': '{:.0f}'
-            }),
-            use_container_width=True
+        with col3:
+            ingresos_totales = metricas['ingresos_totales']
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Ingresos Totales", f"${ingresos_totales:,.2f}")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        with col4:
+            transacciones_totales = metricas['total_pedidos']
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Total Pedidos", f"{transacciones_totales:,}")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+
+        # Distribución de clusters
+        col_left, col_right = st.columns([1, 1])
+
+        with col_left:
+            st.markdown('<h3 class="sub-header">Distribución de Segmentos</h3>', unsafe_allow_html=True)
+
+            if resumen is not None:
+                cluster_counts = resumen.conteos
+
+                mostrar_grafico(
+                    (version_datos, "Dashboard General", None, "segmentos"),
+                    lambda: grafico_segmentos(cluster_counts, total_clientes)
+                )
+            else:
+                st.info("No hay datos de segmentación disponibles.")
+
+        with col_right:
+            st.markdown('<h3 class="sub-header">Resumen RFM por Segmento</h3>', unsafe_allow_html=True)
+
+            if resumen is not None:
+                resumen_clusters = resumen.medias[['Recency', 'Frequency', 'Monetary']].round(2)
+
+                # Formatear para mejor visualización
+                resumen_display = resumen_clusters.rename(columns={
+                    'Recency': 'Recencia (días)',
+                    'Frequency': 'Frecuencia',
+                    'Monetary': 'Valor Monetario ($)'
+                })
+
+                st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
+                with cronometro.medir("Tabla: resumen RFM por segmento"):
+                    st.dataframe(
+                        resumen_display.style.format({
+                            'Valor Monetario ($)': '${:,.2f}',
+                            'Recencia (días)': '{:.1f}',
+                            'Frecuencia': '{:.1f}'
+                        }).background_gradient(cmap='Blues'), 
+                        use_container_width=True
+                    )
+                st.markdown('</div>', unsafe_allow_html=True)
+            else:
+                # Mostrar estadísticas generales si no hay clusters
+                st.markdown('<div class="info-box">', unsafe_allow_html=True)
+                st.markdown("**Estadísticas RFM Generales:**")
+                if 'Recency' in rfm_data.columns:
+                    st.write(f"- **Recencia promedio:** {rfm_data['Recency'].mean():.1f} días")
+                if 'Frequency' in rfm_data.columns:
+                    st.write(f"- **Frecuencia promedio:** {rfm_data['Frequency'].mean():.1f} transacciones")
+                if 'Monetary' in rfm_data.columns:
+                    st.write(f"- **Valor monetario promedio:** ${rfm_data['Monetary'].mean():.2f}")
+                st.markdown('</div>', unsafe_allow_html=True)
+
+        # Gráficos de distribución RFM
+        st.markdown('<h3 class="sub-header">Distribución de Variables RFM</h3>', unsafe_allow_html=True)
+
+        mostrar_grafico(
+            (version_datos, "Dashboard General", None, "distribucion_rfm"),
+            lambda: grafico_distribucion_rfm(
+                resumen.histogramas_globales if resumen is not None else histogramas_globales(rfm_data)
+            )
         )
-        st.markdown('</div>', unsafe_allow_html=True)
 
-# --- SECCIÓN 3: BUSCAR CLIENTE ---
-elif opcion == "Buscar Cliente":
-    st.markdown('<h2 class="sub-header">Análisis de Cliente Específico</h2>', unsafe_allow_html=True)
-    
-    # Selector de cliente
-    cliente_ids = rfm_data.index.astype(str).tolist()
-    cliente_seleccionado = st.selectbox("Selecciona un CustomerID:", cliente_ids)
-    
-    if cliente_seleccionado:
-        try:
-            cliente_data = rfm_data.loc[float(cliente_seleccionado)]
-            
-            # Mostrar información del cliente
+    # --- SECCIÓN 2: ANÁLISIS DE SEGMENTOS ---
+    elif opcion == "Análisis de Segmentos":
+        st.markdown('<h2 class="sub-header">Análisis Detallado por Segmento</h2>', unsafe_allow_html=True)
+
+        if resumen is None:
+            st.warning("No se encontraron datos de segmentación.")
+            raise PaginaDetenida
+
+        # Selector de segmento
+        segmentos_disponibles = resumen.clusters.tolist()
+        segmento_seleccionado = st.selectbox(
+            "Selecciona un segmento para analizar:",
+            segmentos_disponibles
+        )
+
+        # Métricas del segmento
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Clientes en Segmento", f"{resumen.conteos.loc[segmento_seleccionado]:,}")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        with col2:
+            if 'Recency' in resumen.columnas:
+                recencia_promedio = resumen.medias.loc[segmento_seleccionado, 'Recency']
+            else:
+                recencia_promedio = 0
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Recencia Promedio", f"{recencia_promedio:.1f} días")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        with col3:
+            if 'Frequency' in resumen.columnas:
+                frecuencia_promedio = resumen.medias.loc[segmento_seleccionado, 'Frequency']
+            else:
+                frecuencia_promedio = 0
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Frecuencia Promedio", f"{frecuencia_promedio:.1f}")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        with col4:
+            if 'Monetary' in resumen.columnas:
+                valor_promedio = resumen.medias.loc[segmento_seleccionado, 'Monetary']
+            else:
+                valor_promedio = 0
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            st.metric("Valor Promedio", f"${valor_promedio:.2f}")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+
+        # Visualizaciones comparativas
+        if 'Recency' in resumen.columnas and 'Monetary' in resumen.columnas:
+            col_viz1, col_viz2 = st.columns(2)
+
+            with col_viz1:
+                st.markdown('<h3 class="sub-header">Comparación de Recencia</h3>', unsafe_allow_html=True)
+                mostrar_grafico(
+                    (version_datos, "Análisis de Segmentos", segmento_seleccionado, "recencia"),
+                    lambda: grafico_comparacion_segmentos(
+                        resumen, 'Recency', segmento_seleccionado, '#e74c3c',
+                        'Recencia (días)', 'Distribución de Recencia por Segmento'
+                    )
+                )
+
+            with col_viz2:
+                st.markdown('<h3 class="sub-header">Comparación de Valor Monetario</h3>', unsafe_allow_html=True)
+                mostrar_grafico(
+                    (version_datos, "Análisis de Segmentos", segmento_seleccionado, "monetario"),
+                    lambda: grafico_comparacion_segmentos(
+                        resumen, 'Monetary', segmento_seleccionado, '#27ae60',
+                        'Valor Monetario ($)', 'Distribución de Valor por Segmento'
+                    )
+                )
+
+        # Rankings precalculados: cambiar de variable, sentido o K no recorre la tabla de clientes
+        st.markdown('<h3 class="sub-header">Ranking de Clientes</h3>', unsafe_allow_html=True)
+        rankings = cronometro.llamar("Carga: rankings", cargar_rankings)
+
+        if rankings is not None and rankings.columnas:
             col1, col2, col3, col4 = st.columns(4)
-            
             with col1:
-                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                st.metric("CustomerID", cliente_seleccionado)
-                st.markdown('</div>', unsafe_allow_html=True)
-            
+                columna_ranking = st.selectbox("Variable:", rankings.columnas, index=len(rankings.columnas) - 1)
             with col2:
-                if 'Recency' in cliente_data:
-                    recencia = cliente_data['Recency']
-                else:
-                    recencia = 0
-                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                st.metric("Recencia", f"{recencia:.0f} días")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
+                mayores = st.radio("Mostrar:", ["Mayores", "Menores"], horizontal=True) == "Mayores"
             with col3:
-                if 'Frequency' in cliente_data:
-                    frecuencia = cliente_data['Frequency']
+                # Los rankings guardados pueden tener menos de 10 clientes (rankings.py --k)
+                minimo = min(5, rankings.k)
+                if minimo < rankings.k:
+                    k_ranking = st.slider("Clientes:", minimo, rankings.k, min(10, rankings.k))
                 else:
-                    frecuencia = 0
-                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                st.metric("Frecuencia", f"{frecuencia:.0f}")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
+                    k_ranking = rankings.k
             with col4:
-                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                if 'Cluster' in cliente_data:
-                    st.metric("Segmento", f"Segmento {cliente_data['Cluster']}")
-                else:
-                    st.metric("Segmento", "No asignado")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-            
-            # Valor monetario
-            col_valor, col_comparativa = st.columns([1, 2])
-            
-            with col_valor:
-                if 'Monetary' in cliente_data:
-                    valor_monetario = cliente_data['Monetary']
-                else:
-                    valor_monetario = 0
-                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                st.metric("Valor Monetario Total", f"${valor_monetario:,.2f}")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Comparación con el segmento
-            if 'Cluster' in cliente_data and 'Recency' in cliente_data and 'Frequency' in cliente_data and 'Monetary' in cliente_data:
-                segmento_cliente = cliente_data['Cluster']
-                segmento_promedio = rfm_data[rfm_data['Cluster'] == segmento_cliente].mean()
-                
-                with col_comparativa:
-                    st.markdown('<h3 class="sub-header">Comparación con su Segmento</h3>', unsafe_allow_html=True)
-                    
-                    comparacion = pd.DataFrame({
-                        'Este Cliente': [
-                            cliente_data['Recency'],
-                            cliente_data['Frequency'], 
-                            cliente_data['Monetary']
-                        ],
-                        'Promedio del Segmento': [
-                            segmento_promedio['Recency'],
-                            segmento_promedio['Frequency'],
-                            segmento_promedio['Monetary']
-                        ]
-                    }, index=['Recencia (días)', 'Frecuencia', 'Valor Monetario ($)'])
-                    
-                    # Calcular diferencias porcentuales
-                    comparacion['Diferencia %'] = (
-                        (comparacion['Este Cliente'] - comparacion['Promedio del Segmento']) / 
-                        comparacion['Promedio del Segmento'] * 100
-                    ).round(1)
-                    
-                    st.markdown('<div class="comparison-table">', unsafe_allow_html=True)
-                    st.dataframe(comparacion.style.format({
-                        'Este Cliente': '{:.2f}',
-                        'Promedio del Segmento': '{:.2f}',
-                        'Diferencia %': '{:.1f}%'
-                    }), use_container_width=True)
+                ambito = st.radio("Ámbito:", ["Este segmento", "Todos los clientes"], horizontal=True)
+            grupo_ranking = segmento_seleccionado if ambito == "Este segmento" else TODOS
+            top_clientes_display = rankings.ranking(grupo_ranking, columna_ranking, k_ranking, mayores)
+
+            st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
+            with cronometro.medir("Tabla: ranking de clientes"):
+                st.dataframe(
+                    top_clientes_display.style.format({
+                        'Monetary': '${:,.2f}',
+                        'Recency': '{:.0f} días',
+                        'Frequency': '{:.0f}'
+                    }),
+                    use_container_width=True
+                )
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        # Todos los clientes del segmento: una página cada vez (la tabla completa bloquea el navegador)
+        st.markdown('<h3 class="sub-header">Clientes del Segmento</h3>', unsafe_allow_html=True)
+        if st.toggle("Ver todos los clientes del segmento"):
+            with st.spinner('Preparando clientes del segmento...'):
+                miembros = cronometro.llamar("Carga: clientes por segmento", cargar_miembros_segmentos)
+            if miembros is None:
+                st.info("No hay tabla de clientes disponible.")
+            else:
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    columna_orden = st.selectbox("Ordenar por:", miembros.columnas_orden,
+                                                 index=len(miembros.columnas_orden) - 1)
+                with col2:
+                    descendente = st.radio("Orden:", ["Descendente", "Ascendente"], horizontal=True) == "Descendente"
+                with col3:
+                    tamano_pagina = st.selectbox("Clientes por página:", [25, TAMANO_PAGINA, 100, 250], index=1)
+                with col4:
+                    total_paginas = miembros.n_paginas(segmento_seleccionado, tamano_pagina)
+                    numero_pagina = st.number_input(f"Página (de {total_paginas:,}):", 1, total_paginas, 1)
+
+                with cronometro.medir("Tabla: clientes del segmento"):
+                    pagina = miembros.pagina(segmento_seleccionado, columna_orden, numero_pagina,
+                                             tamano_pagina, descendente)
+                    st.dataframe(pagina, use_container_width=True)
+                desde = (numero_pagina - 1) * tamano_pagina
+                st.caption(f"Clientes {desde + 1:,}–{desde + len(pagina):,} de "
+                           f"{miembros.tamano(segmento_seleccionado):,}")
+
+                # El archivo se genera por bloques solo al pulsar el botón
+                formato = st.radio("Formato de descarga:", list(FORMATOS), horizontal=True)
+                extension, mime = FORMATOS[formato]
+                st.download_button(
+                    f"Descargar segmento completo ({formato})",
+                    data=lambda: miembros.archivo_exportacion(segmento_seleccionado, columna_orden,
+                                                              descendente, formato),
+                    file_name=f"segmento_{segmento_seleccionado}_{columna_orden}.{extension}",
+                    mime=mime,
+                )
+
+    # --- SECCIÓN 3: BUSCAR CLIENTE ---
+    elif opcion == "Buscar Cliente":
+        st.markdown('<h2 class="sub-header">Análisis de Cliente Específico</h2>', unsafe_allow_html=True)
+
+        # Selector de cliente: búsqueda por prefijo sobre el índice ordenado
+        if rfm_data is None:
+            st.error("No se pudieron cargar los datos de clientes.")
+            raise PaginaDetenida
+
+        # La tabla y el índice vienen juntos: una recarga nunca mezcla posiciones de dos versiones
+        tabla_clientes, indice_clientes = cronometro.llamar("Carga: índice de clientes", cargar_indice_clientes)
+        texto_busqueda = st.text_input("Buscar CustomerID (escribe el inicio del ID):")
+        cliente_ids = indice_clientes.buscar_prefijo(texto_busqueda, limite=20)
+        if texto_busqueda and not cliente_ids:
+            st.info("Ningún CustomerID empieza por ese texto.")
+        cliente_seleccionado = st.selectbox("Selecciona un CustomerID:", cliente_ids)
+
+        if cliente_seleccionado is not None:
+            try:
+                posicion = indice_clientes.posicion(cliente_seleccionado)
+                if posicion is None:
+                    raise KeyError(cliente_seleccionado)
+                cliente_data = tabla_clientes.iloc[posicion]
+
+                # Mostrar información del cliente
+                col1, col2, col3, col4 = st.columns(4)
+
+                with col1:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("CustomerID", cliente_seleccionado)
                     st.markdown('</div>', unsafe_allow_html=True)
-        
-        except KeyError:
-            st.error("Cliente no encontrado en los datos.")
 
-# --- SECCIÓN 4: RECOMENDACIONES ESTRATÉGICAS ---
-elif opcion == "Recomendaciones Estratégicas":
-    st.markdown('<h2 class="sub-header">Recomendaciones por Segmento</h2>', unsafe_allow_html=True)
-    
-    recomendaciones = {
-        0: {
-            "nombre": "Clientes Inactivos",
-            "descripcion": "Alta recencia, baja frecuencia y valor monetario. Clientes que no han realizado compras recientemente.",
-            "caracteristicas": ["No compran hace mucho tiempo", "Bajo historial de compras", "Bajo valor total"],
-            "estrategias": [
-                "Campañas de reactivación con descuentos especiales",
-                "Encuestas de satisfacción para entender su partida", 
-                "Programas de recuperación con beneficios exclusivos",
-                "Email marketing con ofertas personalizadas"
-            ],
-            "objetivos": ["Recuperar al 20% de clientes", "Incrementar frecuencia de compra"]
-        },
-        1: {
-            "nombre": "Clientes Leales", 
-            "descripcion": "Recencia media, frecuencia constante y valor moderado. Base estable de la empresa.",
-            "caracteristicas": ["Clientes regulares", "Fidelidad comprobada", "Valor constante"],
-            "estrategias": [
-                "Programas de fidelización con puntos canjeables",
-                "Acceso anticipado a nuevos productos y promociones",
-                "Comunicación personalizada y reconocimiento especial",
-                "Ofertas de cross-selling basadas en historial"
-            ],
-            "objetivos": ["Mantener tasa de retención >80%", "Incrementar valor promedio en 15%"]
-        },
-        2: {
-            "nombre": "Clientes Nuevos/Potenciales",
-            "descripcion": "Recencia baja, frecuencia en crecimiento, valor variable. Oportunidad de crecimiento.", 
-            "caracteristicas": ["Clientes recientes", "En proceso de fidelización", "Potencial de crecimiento"],
-            "estrategias": [
-                "Programas de onboarding y bienvenida",
-                "Tutoriales y guías de uso de productos",
-                "Ofertas de seguimiento para segunda compra", 
-                "Contenido educativo sobre beneficios de la marca"
-            ],
-            "objetivos": ["Convertir 40% en clientes leales", "Duplicar frecuencia en 6 meses"]
-        },
-        3: {
-            "nombre": "Clientes de Alto Valor",
-            "descripcion": "Baja recencia, alta frecuencia y valor monetario elevado. Clientes más valiosos.",
-            "caracteristicas": ["Clientes más valiosos", "Frecuentes y recientes", "Alto gasto total"],
-            "estrategias": [
-                "Atención personalizada y dedicada (account manager)",
-                "Ofertas exclusivas y productos premium",
-                "Eventos especiales e invitaciones privadas", 
-                "Programas VIP con beneficios superiores"
-            ],
-            "objetivos": ["Retención del 95%", "Incrementar valor en 25% anual"]
-        }
-    }
-    
-    # Selector de segmento para recomendaciones
-    if 'Cluster' in rfm_data.columns:
-        segmentos_disponibles = sorted(rfm_data['Cluster'].unique())
-        segmento_recomendaciones = st.selectbox(
-            "Selecciona un segmento para ver recomendaciones:",
-            options=segmentos_disponibles,
-            format_func=lambda x: f"Segmento {x}: {recomendaciones.get(x, {}).get('nombre', 'Desconocido')}"
-        )
-    else:
-        st.warning("No hay segmentos disponibles para mostrar recomendaciones.")
-        st.stop()
-    
-    if segmento_recomendaciones in recomendaciones:
-        info = recomendaciones[segmento_recomendaciones]
-        
-        # Header del segmento
-        st.markdown(f"""
-        <div class="cluster-info">
-            <h3>{info["nombre"]}</h3>
-            <p>{info["descripcion"]}</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        col_info, col_metrics = st.columns([2, 1])
-        
-        with col_info:
-            st.markdown("**Características Principales**")
-            for caracteristica in info['caracteristicas']:
-                st.markdown(f"""
-                <div class="feature-box">
-                    <p class="box-content">• {caracteristica}</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown("**Estrategias Recomendadas**")
-            for estrategia in info['estrategias']:
-                st.markdown(f"""
-                <div class="strategy-box">
-                    <p class="box-content">• {estrategia}</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown("**Métricas Objetivo**")
-            for objetivo in info['objetivos']:
-                st.markdown(f"""
-                <div class="info-box">
-                    <p class="box-content">• {objetivo}</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        with col_metrics:
-            # Estadísticas rápidas del segmento
-            if 'Cluster' in rfm_data.columns:
-                segmento_stats = rfm_data[rfm_data['Cluster'] == segmento_recomendaciones]
-                
-                st.markdown("**Estadísticas del Segmento**")
-                
-                # Métricas en cards especiales
+                with col2:
+                    if 'Recency' in cliente_data:
+                        recencia = cliente_data['Recency']
+                    else:
+                        recencia = 0
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Recencia", f"{recencia:.0f} días")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                with col3:
+                    if 'Frequency' in cliente_data:
+                        frecuencia = cliente_data['Frequency']
+                    else:
+                        frecuencia = 0
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Frecuencia", f"{frecuencia:.0f}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                with col4:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    if 'Cluster' in cliente_data:
+                        st.metric("Segmento", f"Segmento {cliente_data['Cluster']}")
+                    else:
+                        st.metric("Segmento", "No asignado")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+
+                # Valor monetario
+                col_valor, col_comparativa = st.columns([1, 2])
+
+                with col_valor:
+                    if 'Monetary' in cliente_data:
+                        valor_monetario = cliente_data['Monetary']
+                    else:
+                        valor_monetario = 0
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Valor Monetario Total", f"${valor_monetario:,.2f}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                # Comparación con el segmento
+                if 'Cluster' in cliente_data and 'Recency' in cliente_data and 'Frequency' in cliente_data and 'Monetary' in cliente_data:
+                    segmento_cliente = int(cliente_data['Cluster'])
+                    segmento_promedio = resumen.medias.loc[segmento_cliente]
+
+                    with col_comparativa:
+                        st.markdown('<h3 class="sub-header">Comparación con su Segmento</h3>', unsafe_allow_html=True)
+
+                        comparacion = pd.DataFrame({
+                            'Este Cliente': [
+                                cliente_data['Recency'],
+                                cliente_data['Frequency'], 
+                                cliente_data['Monetary']
+                            ],
+                            'Promedio del Segmento': [
+                                segmento_promedio['Recency'],
+                                segmento_promedio['Frequency'],
+                                segmento_promedio['Monetary']
+                            ]
+                        }, index=['Recencia (días)', 'Frecuencia', 'Valor Monetario ($)'])
+
+                        # Calcular diferencias porcentuales
+                        comparacion['Diferencia %'] = (
+                            (comparacion['Este Cliente'] - comparacion['Promedio del Segmento']) / 
+                            comparacion['Promedio del Segmento'] * 100
+                        ).round(1)
+
+                        st.markdown('<div class="comparison-table">', unsafe_allow_html=True)
+                        st.dataframe(comparacion.style.format({
+                            'Este Cliente': '{:.2f}',
+                            'Promedio del Segmento': '{:.2f}',
+                            'Diferencia %': '{:.1f}%'
+                        }), use_container_width=True)
+                        st.markdown('</div>', unsafe_allow_html=True)
+
+                # Clientes más parecidos en el espacio RFM escalado del modelo
+                st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+                st.markdown('<h3 class="sub-header">Clientes Similares</h3>', unsafe_allow_html=True)
+                k_similares = st.slider("Número de clientes similares:", 1, 20, K_SIMILARES)
+                with st.spinner('Preparando índice de similitud...'):
+                    tabla_similares, indice_similares = cronometro.llamar("Carga: índice de similares",
+                                                                          cargar_indice_similares)
+                # Solo si el índice se construyó con la misma carga de la tabla (mismas filas y orden)
+                if indice_similares is not None and tabla_similares is tabla_clientes:
+                    with cronometro.medir("Consulta: clientes similares"):
+                        vecinos, distancias = indice_similares.vecinos_de(posicion, k_similares)
+                    similares = tabla_clientes.iloc[vecinos].copy()
+                    similares.insert(0, 'Distancia', distancias.round(3))
+                    st.dataframe(similares, use_container_width=True)
+                elif indice_similares is not None:
+                    st.info("El índice de similares se está actualizando con los datos nuevos.")
+
+            except KeyError:
+                st.error("Cliente no encontrado en los datos.")
+
+    # --- SECCIÓN 4: RFM A UNA FECHA ---
+    elif opcion == "RFM a una Fecha":
+        st.markdown('<h2 class="sub-header">RFM y Segmentos a una Fecha Pasada</h2>', unsafe_allow_html=True)
+
+        with st.spinner('Preparando historial de compras...'):
+            historial = cronometro.llamar("Carga: historial de compras", cargar_historial_rfm)
+        artefacto = cargar_artefacto_segmentacion()
+        if historial is None or len(historial) == 0:
+            st.info("Para calcular el RFM a otras fechas se necesita el log de transacciones (Online Retail.xlsx).")
+        elif artefacto is None:
+            st.info("Para asignar segmentos a otras fechas se necesita el artefacto de segmentación (modelo_segmentacion.npz).")
+        else:
+            # Fechas de referencia: el RFM usa las compras anteriores a cada fecha
+            fecha_minima = historial.fecha_minima.date() + pd.Timedelta(days=1)
+            fecha_maxima = (historial.fecha_maxima + pd.Timedelta(days=1)).date()
+            col1, col2 = st.columns(2)
+            with col1:
+                fecha = st.date_input("Fecha de referencia:", fecha_maxima,
+                                      min_value=fecha_minima, max_value=fecha_maxima)
+            with col2:
+                fecha_comparar = st.date_input("Comparar con:", max(fecha_minima, fecha_maxima - pd.Timedelta(days=90)),
+                                               min_value=fecha_minima, max_value=fecha_maxima)
+
+            version_historial = (historial.version, artefacto["version_modelo"])
+            with cronometro.medir("Consulta: RFM a fecha"):
+                resumen_fecha = resumen_a_fecha(historial, artefacto, version_historial, pd.Timestamp(fecha))
+                resumen_comparar = resumen_a_fecha(historial, artefacto, version_historial, pd.Timestamp(fecha_comparar))
+
+            if resumen_fecha is None:
+                st.info("Ningún cliente había comprado antes de esa fecha.")
+            else:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Clientes a la fecha", f"{resumen_fecha.total_clientes:,}",
+                              delta=(resumen_fecha.total_clientes - resumen_comparar.total_clientes
+                                     if resumen_comparar is not None else None))
+                    st.markdown('</div>', unsafe_allow_html=True)
+                with col2:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Ingresos acumulados", f"${resumen_fecha.metricas['ingresos_totales']:,.0f}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                with col3:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Recencia promedio", f"{resumen_fecha.medias_globales['Recency']:.1f} días")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                # Tamaño y perfil medio de cada segmento en las dos fechas
+                st.markdown('<h3 class="sub-header">Segmentos en cada fecha</h3>', unsafe_allow_html=True)
+                tablas = {}
+                for etiqueta, resumen_x in ((f"{fecha}", resumen_fecha), (f"{fecha_comparar}", resumen_comparar)):
+                    if resumen_x is None:
+                        continue
+                    tabla = resumen_x.medias.round(1)
+                    tabla.insert(0, 'Clientes', resumen_x.conteos)
+                    tablas[etiqueta] = tabla
+                comparativa = pd.concat(tablas, axis=1)
+                comparativa.index = [f"Segmento {c}" for c in comparativa.index]
+                st.dataframe(comparativa, use_container_width=True)
+
+                # Migración entre segmentos de una fecha a otra
+                if resumen_comparar is not None and fecha_comparar != fecha:
+                    anterior, posterior = sorted([pd.Timestamp(fecha_comparar), pd.Timestamp(fecha)])
+                    with cronometro.medir("Consulta: transiciones"):
+                        _, transiciones = historial.comparar_fechas(anterior, posterior, artefacto)
+                    etiquetas = lambda c: "Sin compras" if c == SIN_COMPRAS else f"Segmento {c}"
+                    transiciones.index = [f"{etiquetas(c)} ({anterior:%Y-%m-%d})" for c in transiciones.index]
+                    transiciones.columns = [f"{etiquetas(c)} ({posterior:%Y-%m-%d})" for c in transiciones.columns]
+                    st.markdown('<h3 class="sub-header">Migración entre segmentos</h3>', unsafe_allow_html=True)
+                    st.dataframe(transiciones, use_container_width=True)
+
+    # --- SECCIÓN 5: MIGRACIÓN DE SEGMENTOS ---
+    elif opcion == "Migración de Segmentos":
+        st.markdown('<h2 class="sub-header">Migración de Clientes entre Segmentos</h2>', unsafe_allow_html=True)
+
+        almacen = cronometro.llamar("Carga: histórico de segmentos", cargar_almacen_segmentos)
+        if len(almacen) == 0:
+            st.info("Todavía no hay fotos de segmentos. Se guarda una en cada ejecución del notebook (paso 9) "
+                    "o con `python almacen_segmentos.py registrar resultados_segmentacion.csv`.")
+        else:
+            # Tamaño de cada segmento a lo largo de las ejecuciones (solo metadatos)
+            ultima_foto = almacen.fotos[-1]
+            mostrar_grafico(
+                ((len(almacen), ultima_foto["id"], ultima_foto["fecha"]), "Migración de Segmentos", None, "evolucion"),
+                lambda: grafico_evolucion_segmentos(almacen.evolucion(), NOMBRES_SEGMENTOS)
+            )
+
+            if len(almacen) < 2:
+                st.info("Hace falta al menos una segunda foto para comparar ejecuciones.")
+            else:
+                etiquetas_fotos = {
+                    foto["id"]: f"Foto {foto['id']} · {pd.Timestamp(foto['fecha']):%Y-%m-%d} ({foto['n_clientes']:,} clientes)"
+                    for foto in almacen.fotos
+                }
+                ids_fotos = list(etiquetas_fotos)
                 col1, col2 = st.columns(2)
-                
                 with col1:
+                    id_anterior = st.selectbox("Foto anterior:", ids_fotos, index=len(ids_fotos) - 2,
+                                               format_func=etiquetas_fotos.get)
+                with col2:
+                    id_posterior = st.selectbox("Foto posterior:", ids_fotos, index=len(ids_fotos) - 1,
+                                                format_func=etiquetas_fotos.get)
+
+                foto_anterior, foto_posterior = almacen.foto(id_anterior), almacen.foto(id_posterior)
+                clave = (foto_anterior["fecha"], foto_anterior["longitud"], foto_posterior["fecha"], foto_posterior["longitud"])
+                with cronometro.medir("Consulta: comparación de fotos"):
+                    transiciones, a_inactivos, deriva = comparar_fotos(almacen, clave, id_anterior, id_posterior)
+
+                # Resumen de movimientos
+                presentes = transiciones.drop(index=AUSENTE, columns=AUSENTE, errors="ignore")
+                permanecen = sum(presentes.at[c, c] for c in presentes.index if c in presentes.columns)
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Clientes (foto posterior)", f"{foto_posterior['n_clientes']:,}",
+                              delta=foto_posterior['n_clientes'] - foto_anterior['n_clientes'])
+                    st.markdown('</div>', unsafe_allow_html=True)
+                with col2:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    nuevos = int(transiciones.loc[AUSENTE].sum()) if AUSENTE in transiciones.index else 0
+                    st.metric("Clientes nuevos", f"{nuevos:,}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                with col3:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Permanecen en su segmento",
+                              f"{permanecen / max(int(presentes.to_numpy().sum()), 1) * 100:.1f}%")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                with col4:
+                    st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                    st.metric("Pasan a Inactivos", f"{int(a_inactivos.sum()):,}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                # Matriz de transiciones (conteos y % de cada segmento de origen)
+                st.markdown('<h3 class="sub-header">Matriz de transiciones</h3>', unsafe_allow_html=True)
+                matriz = transiciones.rename(index=nombre_segmento, columns=nombre_segmento)
+                col_conteos, col_porcentajes = st.columns(2)
+                with col_conteos:
+                    st.markdown("**Clientes** (filas: foto anterior, columnas: foto posterior)")
+                    st.dataframe(matriz, use_container_width=True)
+                with col_porcentajes:
+                    st.markdown("**% de cada segmento de origen**")
+                    porcentajes = matriz.div(matriz.sum(axis=1).replace(0, 1), axis=0) * 100
+                    st.dataframe(porcentajes.style.format('{:.1f}%'), use_container_width=True)
+
+                col_inactivos, col_deriva = st.columns([1, 2])
+                with col_inactivos:
+                    st.markdown('<h3 class="sub-header">Pasan a Inactivos</h3>', unsafe_allow_html=True)
+                    st.dataframe(a_inactivos.rename(nombre_segmento).to_frame(), use_container_width=True)
+                with col_deriva:
+                    st.markdown('<h3 class="sub-header">Deriva de centroides</h3>', unsafe_allow_html=True)
+                    st.dataframe(deriva.rename(index=nombre_segmento).round(2), use_container_width=True)
+                    st.caption("Distancia entre el perfil medio de cada segmento en las dos fotos, "
+                               "en desviaciones estándar de la foto anterior.")
+
+    # --- SECCIÓN 6: RECOMENDACIONES ESTRATÉGICAS ---
+    elif opcion == "Recomendaciones Estratégicas":
+        st.markdown('<h2 class="sub-header">Recomendaciones por Segmento</h2>', unsafe_allow_html=True)
+
+        recomendaciones = {
+            0: {
+                "nombre": NOMBRES_SEGMENTOS[0],
+                "descripcion": "Alta recencia, baja frecuencia y valor monetario. Clientes que no han realizado compras recientemente.",
+                "caracteristicas": ["No compran hace mucho tiempo", "Bajo historial de compras", "Bajo valor total"],
+                "estrategias": [
+                    "Campañas de reactivación con descuentos especiales",
+                    "Encuestas de satisfacción para entender su partida", 
+                    "Programas de recuperación con beneficios exclusivos",
+                    "Email marketing con ofertas personalizadas"
+                ],
+                "objetivos": ["Recuperar al 20% de clientes", "Incrementar frecuencia de compra"]
+            },
+            1: {
+                "nombre": NOMBRES_SEGMENTOS[1], 
+                "descripcion": "Recencia media, frecuencia constante y valor moderado. Base estable de la empresa.",
+                "caracteristicas": ["Clientes regulares", "Fidelidad comprobada", "Valor constante"],
+                "estrategias": [
+                    "Programas de fidelización con puntos canjeables",
+                    "Acceso anticipado a nuevos productos y promociones",
+                    "Comunicación personalizada y reconocimiento especial",
+                    "Ofertas de cross-selling basadas en historial"
+                ],
+                "objetivos": ["Mantener tasa de retención >80%", "Incrementar valor promedio en 15%"]
+            },
+            2: {
+                "nombre": NOMBRES_SEGMENTOS[2],
+                "descripcion": "Recencia baja, frecuencia en crecimiento, valor variable. Oportunidad de crecimiento.", 
+                "caracteristicas": ["Clientes recientes", "En proceso de fidelización", "Potencial de crecimiento"],
+                "estrategias": [
+                    "Programas de onboarding y bienvenida",
+                    "Tutoriales y guías de uso de productos",
+                    "Ofertas de seguimiento para segunda compra", 
+                    "Contenido educativo sobre beneficios de la marca"
+                ],
+                "objetivos": ["Convertir 40% en clientes leales", "Duplicar frecuencia en 6 meses"]
+            },
+            3: {
+                "nombre": NOMBRES_SEGMENTOS[3],
+                "descripcion": "Baja recencia, alta frecuencia y valor monetario elevado. Clientes más valiosos.",
+                "caracteristicas": ["Clientes más valiosos", "Frecuentes y recientes", "Alto gasto total"],
+                "estrategias": [
+                    "Atención personalizada y dedicada (account manager)",
+                    "Ofertas exclusivas y productos premium",
+                    "Eventos especiales e invitaciones privadas", 
+                    "Programas VIP con beneficios superiores"
+                ],
+                "objetivos": ["Retención del 95%", "Incrementar valor en 25% anual"]
+            }
+        }
+
+        # Selector de segmento para recomendaciones
+        if resumen is not None:
+            segmentos_disponibles = resumen.clusters.tolist()
+            segmento_recomendaciones = st.selectbox(
+                "Selecciona un segmento para ver recomendaciones:",
+                options=segmentos_disponibles,
+                format_func=lambda x: f"Segmento {x}: {recomendaciones.get(x, {}).get('nombre', 'Desconocido')}"
+            )
+        else:
+            st.warning("No hay segmentos disponibles para mostrar recomendaciones.")
+            raise PaginaDetenida
+
+        if segmento_recomendaciones in recomendaciones:
+            info = recomendaciones[segmento_recomendaciones]
+
+            # Header del segmento
+            st.markdown(f"""
+            <div class="cluster-info">
+                <h3>{info["nombre"]}</h3>
+                <p>{info["descripcion"]}</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+            col_info, col_metrics = st.columns([2, 1])
+
+            with col_info:
+                st.markdown("**Características Principales**")
+                for caracteristica in info['caracteristicas']:
                     st.markdown(f"""
-                    <div class="stat-card">
-                        <h4>Clientes</h4>
-                        <div class="value">{len(segmento_stats):,}</div>
-                        <div class="subvalue">en segmento</div>
+                    <div class="feature-box">
+                        <p class="box-content">• {caracteristica}</p>
                     </div>
                     """, unsafe_allow_html=True)
-                    
-                    if 'Monetary' in segmento_stats.columns:
-                        st.markdown(f"""
-                        <div class="stat-card">
-                            <h4>Valor Promedio</h4>
-                            <div class="value">${segmento_stats['Monetary'].mean():.2f}</div>
-                            <div class="subvalue">por cliente</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                with col2:
-                    if 'Recency' in segmento_stats.columns:
-                        st.markdown(f"""
-                        <div class="stat-card">
-                            <h4>Recencia</h4>
-                            <div class="value">{segmento_stats['Recency'].mean():.1f}</div>
-                            <div class="subvalue">días promedio</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    if 'Frequency' in segmento_stats.columns:
+
+                st.markdown("**Estrategias Recomendadas**")
+                for estrategia in info['estrategias']:
+                    st.markdown(f"""
+                    <div class="strategy-box">
+                        <p class="box-content">• {estrategia}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+                st.markdown("**Métricas Objetivo**")
+                for objetivo in info['objetivos']:
+                    st.markdown(f"""
+                    <div class="info-box">
+                        <p class="box-content">• {objetivo}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+            with col_metrics:
+                # Estadísticas rápidas del segmento
+                if resumen is not None:
+                    segmento_stats = resumen.medias.loc[segmento_recomendaciones]
+
+                    st.markdown("**Estadísticas del Segmento**")
+
+                    # Métricas en cards especiales
+                    col1, col2 = st.columns(2)
+
+                    with col1:
                         st.markdown(f"""
                         <div class="stat-card">
-                            <h4>Frecuencia</h4>
-                            <div class="value">{segmento_stats['Frequency'].mean():.1f}</div>
-                            <div class="subvalue">transacciones</div>
+                            <h4>Clientes</h4>
+                            <div class="value">{resumen.conteos.loc[segmento_recomendaciones]:,}</div>
+                            <div class="subvalue">en segmento</div>
                         </div>
                         """, unsafe_allow_html=True)
-    
-    # Resumen ejecutivo
+
+                        if 'Monetary' in segmento_stats.index:
+                            st.markdown(f"""
+                            <div class="stat-card">
+                                <h4>Valor Promedio</h4>
+                                <div class="value">${segmento_stats['Monetary']:.2f}</div>
+                                <div class="subvalue">por cliente</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+                    with col2:
+                        if 'Recency' in segmento_stats.index:
+                            st.markdown(f"""
+                            <div class="stat-card">
+                                <h4>Recencia</h4>
+                                <div class="value">{segmento_stats['Recency']:.1f}</div>
+                                <div class="subvalue">días promedio</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+                        if 'Frequency' in segmento_stats.index:
+                            st.markdown(f"""
+                            <div class="stat-card">
+                                <h4>Frecuencia</h4>
+                                <div class="value">{segmento_stats['Frequency']:.1f}</div>
+                                <div class="subvalue">transacciones</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+
+        # Resumen ejecutivo
+        st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+        st.markdown('<h3 class="sub-header">Resumen Ejecutivo de Segmentación</h3>', unsafe_allow_html=True)
+
+        if resumen is not None:
+            resumen_final = resumen.resumen_ejecutivo()
+
+            # Formatear valores monetarios
+            resumen_display = resumen_final.copy()
+            resumen_display['Valor Prom'] = resumen_display['Valor Prom'].apply(lambda x: f"${x:,.2f}")
+            resumen_display['Valor Total'] = resumen_display['Valor Total'].apply(lambda x: f"${x:,.2f}")
+            resumen_display['Recencia Prom'] = resumen_display['Recencia Prom'].apply(lambda x: f"{x:.1f} días")
+
+            st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
+            with cronometro.medir("Tabla: resumen ejecutivo"):
+                st.dataframe(resumen_display, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+    cronometro.terminar(f"Sección: {opcion}")
+
+    # Footer
     st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-    st.markdown('<h3 class="sub-header">Resumen Ejecutivo de Segmentación</h3>', unsafe_allow_html=True)
-    
-    if 'Cluster' in rfm_data.columns:
-        resumen_final = rfm_data.groupby('Cluster').agg({
-            'Recency': 'mean',
-            'Frequency': 'mean',
-            'Monetary': ['mean', 'sum'],
-            'Cluster': 'count'
-        }).round(2)
-        
-        resumen_final.columns = ['Recencia Prom', 'Frecuencia Prom', 'Valor Prom', 'Valor Total', 'Clientes']
-        
-        # Formatear valores monetarios
-        resumen_display = resumen_final.copy()
-        resumen_display['Valor Prom'] = resumen_display['Valor Prom'].apply(lambda x: f"${x:,.2f}")
-        resumen_display['Valor Total'] = resumen_display['Valor Total'].apply(lambda x: f"${x:,.2f}")
-        resumen_display['Recencia Prom'] = resumen_display['Recencia Prom'].apply(lambda x: f"{x:.1f} días")
-        
-        st.markdown('<div class="dataframe-container">', unsafe_allow_html=True)
-        st.dataframe(resumen_display, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-# Footer
-st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-st.markdown("**Proyecto de Minería de Datos - Grupo 4** | *Sistema de clasificación de clientes según patrones de compra*")
-st.markdown("""
-### 💻 Desarrollado con Streamlit
-
----
-
-### 👥 Integrantes
-- Darwin Torrez  
-- Harold Gustavo  
-- Harold Gustavo  
-- Mangel Isacc  
-- Mario Acuña  
-- Kevin David
-""")
-
-
-# Información del sistema en sidebar
-with st.sidebar:
-    st.markdown("---")
-    st.markdown("### Información del Sistema")
-    st.write(f"**Clientes cargados:** {len(rfm_data):,}")
-    if 'Cluster' in rfm_data.columns:
-        st.write(f"**Segmentos:** {rfm_data['Cluster'].nunique()}")
-    st.write(f"**Última actualización:** {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
\ No newline at end of file
+    st.markdown("**Proyecto de Minería de Datos - Grupo 4** | *Sistema de clasificación de clientes según patrones de compra*")
+    st.markdown("""
+    ### 💻 Desarrollado con Streamlit
+
+    ---
+
+    ### 👥 Integrantes
+    - Darwin Torrez  
+    - Harold Gustavo  
+    - Harold Gustavo  
+    - Mangel Isacc  
+    - Mario Acuña  
+    - Kevin David
+    """)
+
+
+    # Información del sistema en sidebar
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### Información del Sistema")
+        st.write(f"**Clientes cargados:** {resumen.total_clientes if resumen is not None else len(rfm_data):,}")
+        if resumen is not None:
+            st.write(f"**Segmentos:** {len(resumen.clusters)}")
+        if rfm_data is not None:
+            st.write(f"**Memoria tabla RFM:** {reporte_memoria({'RFM': rfm_data}).loc['RFM', 'MB']:.2f} MB")
+        st.write(f"**Última actualización:** {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}")
+        if any(recurso.recargando for recurso in recursos_recargables().values()):
+            st.caption("Cargando datos nuevos en segundo plano...")
+except PaginaDetenida:
+    pass
+finally:
+    cronometro.terminar(f"Sección: {opcion}")
+    # Primero el perfil: no usa Streamlit, así que se guarda aunque la ejecución se interrumpa
+    if perfil is not None:
+        perfil.guardar(opcion or "inicio")
+    # Desglose de tiempos (RFM_TIEMPOS=1), también en las páginas que terminan antes
+    if tiempos_activados():
+        with st.sidebar:
+            st.markdown("**Tiempos de esta ejecución:**")
+            st.dataframe(cronometro.tabla(), use_container_width=True)
+            st.write(f"**Total:** {cronometro.total() * 1000:.0f} ms")
+            cargas = {
+                recurso.nombre: round(recurso.segundos_carga * 1000, 1)
+                for recurso in recursos_recargables().values()
+                if recurso.segundos_carga is not None
+            }
+            if cargas:
+                st.markdown("**Última carga de cada recurso (ms):**")
+                st.dataframe(pd.Series(cargas, name="ms"), use_container_width=True)
@@ -0,0 +1,179 @@
+"""
+Benchmark del pipeline completo sobre datos sintéticos de varios tamaños.
+
+Para cada escala genera (o reutiliza) un log con datos_sinteticos.py y mide
+cada etapa: carga, limpieza, tipado, RFM (en memoria y por bloques),
+escalado, ajuste de K-Means, asignación de segmentos y las agregaciones del
+dashboard (resumen por segmento, resumen ejecutivo, índice y búsqueda de
+clientes, bundle). Los resultados se guardan en JSON para comparar antes y
+después de cada cambio.
+
+Uso:
+    python benchmark.py --escalas 10000 100000 1000000 --salida benchmark_resultados.json
+    python benchmark.py --escalas 100000 --comparar benchmark_anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import time
+
+import numpy as np
+import pandas as pd
+
+from busqueda import IndiceClientes
+from datos_sinteticos import LINEAS_POR_CLIENTE, escribir_transacciones
+from esquemas import reporte_memoria, tipar_transacciones
+from resumenes import ResumenSegmentos
+from rfm import COLUMNAS_RFM, calcular_rfm
+from rfm_bloques import calcular_rfm_por_bloques
+from segmentacion import asignar_segmentos, cargar_artefacto, exportar_artefacto
+from transacciones import leer_transacciones, limpiar_transacciones
+
+ESCALAS = [10_000, 100_000, 1_000_000]
+DIRECTORIO_DATOS = "benchmark_datos"
+N_CLUSTERS = 4
+
+# Búsquedas por prefijo medidas en la etapa busqueda_prefijo
+N_BUSQUEDAS = 1000
+
+
+def medir(resultados, escala, etapa, filas, funcion, repeticiones=1):
+    """Ejecutar funcion `repeticiones` veces, guardar el mejor tiempo y devolver su resultado"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        valor = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    segundos = min(tiempos)
+    resultados.append({
+        "escala": escala,
+        "etapa": etapa,
+        "filas": int(filas),
+        "segundos": segundos,
+        "filas_por_segundo": filas / segundos if segundos > 0 else None,
+    })
+    print(f"  {etapa:<20} {segundos:9.3f} s  {filas:>12,} filas")
+    return valor
+
+
+def ejecutar_escala(n_lineas, directorio=DIRECTORIO_DATOS, repeticiones=1, semilla=42,
+                    lineas_por_cliente=LINEAS_POR_CLIENTE):
+    """Medir todas las etapas para un log de n_lineas; devuelve (resultados, memoria)"""
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+
+    resultados = []
+    os.makedirs(directorio, exist_ok=True)
+    n_clientes = max(100, n_lineas // lineas_por_cliente)
+    ruta = os.path.join(directorio, f"sinteticos_{n_lineas}_{n_clientes}_{semilla}.csv")
+    print(f"\n--- {n_lineas:,} líneas, {n_clientes:,} clientes ---")
+
+    if not os.path.exists(ruta):
+        medir(resultados, n_lineas, "generar", n_lineas,
+              lambda: escribir_transacciones(ruta, n_lineas, semilla, n_clientes))
+
+    crudo = medir(resultados, n_lineas, "carga", n_lineas,
+                  lambda: leer_transacciones(ruta), repeticiones)
+    limpio = medir(resultados, n_lineas, "limpieza", len(crudo),
+                   lambda: limpiar_transacciones(crudo), repeticiones)
+    tipado = medir(resultados, n_lineas, "tipado", len(limpio),
+                   lambda: tipar_transacciones(limpio), repeticiones)
+    rfm = medir(resultados, n_lineas, "rfm", len(tipado),
+                lambda: calcular_rfm(tipado), repeticiones)
+    medir(resultados, n_lineas, "rfm_por_bloques", n_lineas,
+          lambda: calcular_rfm_por_bloques(ruta), repeticiones)
+
+    scaler = StandardScaler()
+    x = medir(resultados, n_lineas, "escalado", len(rfm),
+              lambda: scaler.fit_transform(rfm[COLUMNAS_RFM]), repeticiones)
+    kmeans = medir(resultados, n_lineas, "kmeans", len(rfm),
+                   lambda: KMeans(n_clusters=N_CLUSTERS, random_state=42).fit(x), repeticiones)
+
+    ruta_artefacto = os.path.join(directorio, f"artefacto_{n_lineas}.npz")
+    exportar_artefacto(scaler, kmeans, ruta_artefacto, columnas=COLUMNAS_RFM)
+    artefacto = cargar_artefacto(ruta_artefacto)
+    rfm["Cluster"] = medir(resultados, n_lineas, "asignacion", len(rfm),
+                           lambda: asignar_segmentos(artefacto, rfm), repeticiones)
+
+    total_unidades = tipado["Quantity"].sum()
+    resumen = medir(resultados, n_lineas, "resumen_segmentos", len(rfm),
+                    lambda: ResumenSegmentos(rfm, total_unidades), repeticiones)
+    medir(resultados, n_lineas, "resumen_ejecutivo", len(rfm),
+          resumen.resumen_ejecutivo, repeticiones)
+
+    ruta_bundle = os.path.join(directorio, f"bundle_{n_lineas}.npz")
+    medir(resultados, n_lineas, "bundle", len(rfm),
+          lambda: (resumen.guardar(ruta_bundle), ResumenSegmentos.cargar(ruta_bundle)),
+          repeticiones)
+
+    indice = medir(resultados, n_lineas, "indice_clientes", len(rfm),
+                   lambda: IndiceClientes(rfm.index), repeticiones)
+    prefijos = np.random.default_rng(semilla).choice(rfm.index.to_numpy(), N_BUSQUEDAS).astype(str)
+    medir(resultados, n_lineas, "busqueda_prefijo", N_BUSQUEDAS,
+          lambda: [indice.buscar_prefijo(p[:3]) for p in prefijos], repeticiones)
+
+    memoria = reporte_memoria({"transacciones": limpio, "transacciones_tipadas": tipado, "rfm": rfm})
+    memoria = {tabla: round(float(mb), 3) for tabla, mb in memoria["MB"].items()}
+    return resultados, memoria
+
+
+def entorno():
+    import sklearn
+
+    return {
+        "fecha": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparar(actual, anterior):
+    """Tabla (escala, etapa) con segundos antes/después y el cociente"""
+    claves = ["escala", "etapa"]
+    nuevo = pd.DataFrame(actual["resultados"]).set_index(claves)["segundos"]
+    viejo = pd.DataFrame(anterior["resultados"]).set_index(claves)["segundos"]
+    tabla = pd.DataFrame({"Antes": viejo, "Despues": nuevo}).dropna()
+    tabla["Cociente"] = tabla["Despues"] / tabla["Antes"]
+    return tabla
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline RFM sobre datos sintéticos")
+    parser.add_argument("--escalas", type=int, nargs="+", default=ESCALAS,
+                        help="Número de líneas de cada log sintético")
+    parser.add_argument("--directorio", default=DIRECTORIO_DATOS,
+                        help="Donde se guardan (y reutilizan) los logs generados")
+    parser.add_argument("--repeticiones", type=int, default=1,
+                        help="Se guarda el mejor tiempo de las repeticiones")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--lineas-por-cliente", type=int, default=LINEAS_POR_CLIENTE,
+                        help="Menos líneas por cliente = más clientes para las etapas del dashboard")
+    parser.add_argument("--salida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    reporte = {"entorno": entorno(), "resultados": [], "memoria_mb": {}}
+    for escala in args.escalas:
+        resultados, memoria = ejecutar_escala(escala, args.directorio, args.repeticiones,
+                                              args.semilla, args.lineas_por_cliente)
+        reporte["resultados"].extend(resultados)
+        reporte["memoria_mb"][str(escala)] = memoria
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Resultados guardados en: {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        print("\n--- Comparación con", args.comparar, "---")
+        print(comparar(reporte, anterior).to_string(float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
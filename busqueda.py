@@ -0,0 +1,55 @@
+"""
+Búsqueda de clientes por CustomerID.
+
+Índice construido una vez por versión de los datos: los IDs como enteros
+ordenados (búsqueda exacta O(log n)) y como texto ordenado (búsqueda por
+prefijo con búsqueda binaria), ambos apuntando a la posición de la fila en
+la tabla RFM.
+"""
+import numpy as np
+
+
+class IndiceClientes:
+    """Índice ordenado de CustomerID -> posición de fila"""
+
+    def __init__(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+
+        orden = np.argsort(ids, kind="stable")
+        self.ids = ids[orden]
+        self.posiciones = orden
+
+        # El orden del texto no coincide con el numérico ("123" < "13")
+        texto = ids.astype(str)
+        orden_texto = np.argsort(texto, kind="stable")
+        self.textos = texto[orden_texto]
+        self.posiciones_texto = orden_texto
+        self._ids_originales = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def posicion(self, customer_id):
+        """Posición de la fila del cliente, o None si no existe"""
+        try:
+            customer_id = int(customer_id)
+        except (TypeError, ValueError):
+            return None
+        i = np.searchsorted(self.ids, customer_id)
+        if i < len(self.ids) and self.ids[i] == customer_id:
+            return int(self.posiciones[i])
+        return None
+
+    def buscar_prefijo(self, prefijo, limite=20):
+        """Hasta `limite` CustomerID cuyo texto empieza por `prefijo`"""
+        prefijo = str(prefijo).strip()
+        if not prefijo:
+            return self.ids[:limite].tolist()
+        inicio = np.searchsorted(self.textos, prefijo, side="left")
+        fin = min(inicio + limite, len(self.textos))
+        candidatos = self.textos[inicio:fin]
+        coinciden = np.char.startswith(candidatos, prefijo)
+        # Los que coinciden son un bloque contiguo al principio
+        n = int(coinciden.sum()) if coinciden.all() else int(np.argmin(coinciden))
+        posiciones = self.posiciones_texto[inicio:inicio + n]
+        return self._ids_originales[posiciones].tolist()
@@ -0,0 +1,115 @@
+"""
+Caché columnar en disco para los datos del proyecto.
+
+Guarda un DataFrame como columnas NumPy dentro de un único archivo .npz,
+junto con la huella del archivo de origen (tamaño, fecha de modificación y,
+opcionalmente, hash del contenido). Al leer, la caché solo se usa si la
+huella coincide con la del archivo de origen actual. Las columnas de texto
+se devuelven como categóricas, sin crear un objeto de Python por fila.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Cambiar este número invalida todas las cachés escritas con un formato anterior
+VERSION_CACHE = 1
+
+_CLAVE_META = "__meta__"
+
+
+def huella_archivo(ruta, con_hash=False):
+    """Huella barata de un archivo: tamaño + mtime (y SHA-1 si se pide)"""
+    info = os.stat(ruta)
+    huella = {
+        "tamano": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+    }
+    if con_hash:
+        sha1 = hashlib.sha1()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(bloque)
+        huella["sha1"] = sha1.hexdigest()
+    return huella
+
+
+def huella_contenido(ruta):
+    """Huella que solo depende del contenido (no cambia al copiar el archivo)"""
+    huella = huella_archivo(ruta, con_hash=True)
+    return {"tamano": huella["tamano"], "sha1": huella["sha1"]}
+
+
+def _codificar_columna(serie):
+    """Convertir una columna a arrays NumPy que se puedan guardar sin pickle"""
+    es_texto = (
+        pd.api.types.is_object_dtype(serie)
+        or pd.api.types.is_string_dtype(serie)
+        or isinstance(serie.dtype, pd.CategoricalDtype)
+    )
+    if es_texto:
+        # Columnas de texto: códigos enteros + diccionario de categorías
+        codigos, categorias = pd.factorize(serie, sort=False)
+        categorias = np.asarray(categorias, dtype=str)
+        return "texto", {"codigos": codigos.astype(np.int32), "categorias": categorias}
+    # Números y fechas (datetime64) se guardan tal cual
+    return "numero", {"valores": serie.to_numpy()}
+
+
+def _decodificar_columna(tipo, arrays):
+    if tipo == "texto":
+        # Código -1 = valor nulo, igual que en pd.factorize
+        return pd.Categorical.from_codes(arrays["codigos"], categories=arrays["categorias"])
+    return arrays["valores"]
+
+
+def guardar_cache(df, ruta_cache, huella):
+    """Escribir el DataFrame en ruta_cache de forma atómica"""
+    arrays = {}
+    tipos = {}
+    for i, columna in enumerate(df.columns):
+        tipo, partes = _codificar_columna(df[columna])
+        tipos[columna] = tipo
+        for nombre, valores in partes.items():
+            arrays[f"c{i}_{nombre}"] = valores
+
+    meta = {
+        "version": VERSION_CACHE,
+        "huella": huella,
+        "columnas": list(df.columns),
+        "tipos": tipos,
+    }
+    arrays[_CLAVE_META] = np.array(json.dumps(meta))
+
+    directorio = os.path.dirname(os.path.abspath(ruta_cache))
+    os.makedirs(directorio, exist_ok=True)
+    ruta_tmp = f"{ruta_cache}.tmp"
+    with open(ruta_tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(ruta_tmp, ruta_cache)
+
+
+def leer_cache(ruta_cache, huella):
+    """Leer la caché si existe y corresponde a la huella dada; si no, None"""
+    if not os.path.exists(ruta_cache):
+        return None
+    try:
+        with np.load(ruta_cache, allow_pickle=False) as datos:
+            meta = json.loads(str(datos[_CLAVE_META]))
+            if meta.get("version") != VERSION_CACHE or meta.get("huella") != huella:
+                return None
+            columnas = {}
+            for i, columna in enumerate(meta["columnas"]):
+                tipo = meta["tipos"][columna]
+                prefijo = f"c{i}_"
+                partes = {
+                    clave[len(prefijo):]: datos[clave]
+                    for clave in datos.files if clave.startswith(prefijo)
+                }
+                columnas[columna] = _decodificar_columna(tipo, partes)
+    except (OSError, ValueError, KeyError):
+        # Caché corrupta o incompleta: se regenera desde el origen
+        return None
+    return pd.DataFrame(columnas, columns=meta["columnas"])
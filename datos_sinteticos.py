@@ -0,0 +1,176 @@
+"""
+Generador de transacciones sintéticas con el esquema de Online Retail.
+
+Produce logs de cualquier tamaño (de miles a decenas de millones de líneas)
+por bloques, con proporciones parecidas al dataset original: ~21 líneas
+por factura, ~93 líneas por cliente identificado, un 25 % de líneas sin
+CustomerID, un 2 % de facturas canceladas ("C..." con cantidades
+negativas), actividad de clientes muy desigual (Pareto) y popularidad de
+productos tipo Zipf. Con la misma semilla el resultado es idéntico.
+
+Uso:
+    python datos_sinteticos.py 1000000 --salida sinteticos_1M.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from transacciones import COLUMNAS
+
+TAMANO_BLOQUE = 1_000_000
+
+LINEAS_POR_FACTURA = 21
+LINEAS_POR_CLIENTE = 93
+N_PRODUCTOS = 4000
+PROPORCION_SIN_CLIENTE = 0.25
+PROPORCION_CANCELADAS = 0.02
+PRIMERA_FACTURA = 536365
+FECHA_INICIO = "2010-12-01 08:00"
+DIAS = 373
+
+PAISES = ["United Kingdom", "Germany", "France", "EIRE", "Spain", "Netherlands",
+          "Belgium", "Switzerland", "Portugal", "Australia", "Norway", "Italy"]
+PESOS_PAISES = [0.90, 0.02, 0.02, 0.015, 0.01, 0.008, 0.007, 0.006, 0.005, 0.004, 0.003, 0.002]
+
+
+class GeneradorTransacciones:
+    """Catálogo de clientes y productos fijo + facturas generadas por bloques"""
+
+    def __init__(self, n_lineas, semilla=42, n_clientes=None):
+        self.n_lineas = int(n_lineas)
+        self.semilla = semilla
+        self.n_clientes = n_clientes or max(100, self.n_lineas // LINEAS_POR_CLIENTE)
+        rng = np.random.default_rng(semilla)
+
+        # Clientes: actividad muy desigual y un país fijo por cliente
+        self.ids_clientes = 12346 + rng.permutation(self.n_clientes * 2)[:self.n_clientes]
+        actividad = rng.pareto(2.0, self.n_clientes) + 1
+        self.acumulado_clientes = np.cumsum(actividad) / actividad.sum()
+        self.pais_cliente = rng.choice(len(PAISES), self.n_clientes,
+                                       p=np.array(PESOS_PAISES) / sum(PESOS_PAISES))
+
+        # Productos: popularidad Zipf y precio log-normal (mediana ~2.5)
+        popularidad = 1.0 / np.arange(1, N_PRODUCTOS + 1) ** 1.1
+        self.acumulado_productos = np.cumsum(popularidad) / popularidad.sum()
+        self.codigos = np.array([f"{20000 + i}" if i % 7 else f"{20000 + i}A"
+                                 for i in range(N_PRODUCTOS)])
+        self.descripciones = np.array([f"PRODUCT {codigo}" for codigo in self.codigos])
+        self.precios = np.round(rng.lognormal(np.log(2.5), 0.8, N_PRODUCTOS), 2).clip(0.01)
+
+    def bloques(self, tamano_bloque=TAMANO_BLOQUE):
+        """DataFrames de ~tamano_bloque líneas hasta completar n_lineas"""
+        rng = np.random.default_rng(self.semilla + 1)
+        inicio = np.datetime64(pd.Timestamp(FECHA_INICIO), "s")
+        segundos_periodo = DIAS * 24 * 3600
+        siguiente_factura = PRIMERA_FACTURA
+        generadas = 0
+
+        while generadas < self.n_lineas:
+            objetivo = min(tamano_bloque, self.n_lineas - generadas)
+
+            # Facturas del bloque y número de líneas de cada una
+            lineas_factura = rng.geometric(1 / LINEAS_POR_FACTURA,
+                                           int(objetivo / LINEAS_POR_FACTURA * 1.1) + 16)
+            while lineas_factura.sum() < objetivo:
+                lineas_factura = np.concatenate([
+                    lineas_factura, rng.geometric(1 / LINEAS_POR_FACTURA, len(lineas_factura))
+                ])
+            acumulado = np.cumsum(lineas_factura)
+            n_facturas = int(np.searchsorted(acumulado, objetivo)) + 1
+            lineas_factura = lineas_factura[:n_facturas]
+            lineas_factura[-1] -= acumulado[n_facturas - 1] - objetivo
+            n = int(lineas_factura.sum())
+
+            numeros = siguiente_factura + np.arange(n_facturas)
+            siguiente_factura += n_facturas
+            canceladas = rng.random(n_facturas) < PROPORCION_CANCELADAS
+            sin_cliente = rng.random(n_facturas) < PROPORCION_SIN_CLIENTE
+            cliente = np.searchsorted(self.acumulado_clientes, rng.random(n_facturas))
+            cliente = np.minimum(cliente, self.n_clientes - 1)
+
+            # Fechas crecientes a lo largo del periodo, una por factura
+            posicion = (generadas + np.cumsum(lineas_factura) - lineas_factura) / self.n_lineas
+            fechas = inicio + (posicion * segundos_periodo).astype("timedelta64[s]")
+
+            # Expandir a nivel de línea
+            factura_linea = np.repeat(np.arange(n_facturas), lineas_factura)
+            producto = np.searchsorted(self.acumulado_productos, rng.random(n))
+            producto = np.minimum(producto, N_PRODUCTOS - 1)
+            cantidad = rng.geometric(0.25, n)
+            por_caja = rng.random(n) < 0.05
+            cantidad[por_caja] *= 12
+            cantidad[canceladas[factura_linea]] *= -1
+
+            texto_factura = numeros.astype(str).astype(object)
+            texto_factura[canceladas] = "C" + texto_factura[canceladas]
+            ids = self.ids_clientes[cliente].astype(np.float64)
+            ids[sin_cliente] = np.nan
+            paises = np.array(PAISES)[self.pais_cliente[cliente]]
+            paises[sin_cliente] = "United Kingdom"
+
+            bloque = pd.DataFrame({
+                "InvoiceNo": texto_factura[factura_linea],
+                "StockCode": self.codigos[producto],
+                "Description": self.descripciones[producto],
+                "Quantity": cantidad,
+                "InvoiceDate": fechas[factura_linea].astype("datetime64[ns]"),
+                "UnitPrice": self.precios[producto],
+                "CustomerID": ids[factura_linea],
+                "Country": paises[factura_linea],
+            }, columns=COLUMNAS)
+            generadas += n
+            yield bloque
+
+
+def generar_transacciones(n_lineas, semilla=42, n_clientes=None):
+    """Log completo en memoria (para escalas pequeñas)"""
+    generador = GeneradorTransacciones(n_lineas, semilla, n_clientes)
+    return pd.concat(list(generador.bloques()), ignore_index=True)
+
+
+def escribir_transacciones(ruta, n_lineas, semilla=42, n_clientes=None,
+                           tamano_bloque=TAMANO_BLOQUE):
+    """Escribir el log en CSV o Parquet bloque a bloque (memoria acotada)"""
+    generador = GeneradorTransacciones(n_lineas, semilla, n_clientes)
+    ruta_tmp = f"{ruta}.tmp"
+    if ruta.lower().endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        escritor = None
+        for bloque in generador.bloques(tamano_bloque):
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(ruta_tmp, tabla.schema)
+            escritor.write_table(tabla)
+        if escritor is not None:
+            escritor.close()
+    else:
+        with open(ruta_tmp, "w", newline="") as f:
+            for i, bloque in enumerate(generador.bloques(tamano_bloque)):
+                bloque.to_csv(f, index=False, header=i == 0, date_format="%Y-%m-%d %H:%M:%S")
+    os.replace(ruta_tmp, ruta)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar transacciones sintéticas (esquema Online Retail)")
+    parser.add_argument("lineas", type=int, help="Número de líneas a generar")
+    parser.add_argument("--salida", required=True, help="CSV o Parquet de salida")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--clientes", type=int, default=None,
+                        help=f"Clientes distintos (por defecto lineas / {LINEAS_POR_CLIENTE})")
+    parser.add_argument("--tamano-bloque", type=int, default=TAMANO_BLOQUE)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    escribir_transacciones(args.salida, args.lineas, args.semilla, args.clientes, args.tamano_bloque)
+    print(f"✅ {args.lineas:,} líneas guardadas en: {args.salida} "
+          f"({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
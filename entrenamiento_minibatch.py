@@ -0,0 +1,182 @@
+"""
+Entrenamiento de K-Means por mini-lotes para bases de clientes grandes.
+
+La tabla RFM se lee del disco por bloques: la primera pasada ajusta el
+StandardScaler con partial_fit y las siguientes entrenan un MiniBatchKMeans
+con partial_fit sobre los bloques escalados. La memoria depende del tamaño
+de bloque, no del número de clientes. El resultado se guarda igual que en
+el notebook (modelo_kmeans.pkl + modelo_segmentacion.npz).
+
+Si ya existe un artefacto, el entrenamiento arranca desde sus centroides y
+cada clúster nuevo conserva el segmento del anterior (ver reentrenamiento.py).
+
+Con --comparar solo se evalúa (frente a un K-Means completo sobre la muestra
+del reservorio, no sobre toda la tabla): el modelo de producción no se
+sobrescribe y solo se escriben los destinos indicados con --modelo o
+--artefacto. --no-guardar evita guardar en cualquier caso.
+
+Uso:
+    python entrenamiento_minibatch.py resultados_segmentacion.csv
+    python entrenamiento_minibatch.py resultados_segmentacion.csv --comparar
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import StandardScaler
+
+from reentrenamiento import alinear_segmentos, centroides_anteriores
+from rfm import COLUMNAS_RFM
+from segmentacion import RUTA_ARTEFACTO, cargar_artefacto, exportar_artefacto
+
+RUTA_MODELO = "modelo_kmeans.pkl"
+
+TAMANO_BLOQUE = 100_000
+
+
+def iterar_rfm(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """Bloques de la tabla RFM (CSV o Parquet) como DataFrames de R, F, M"""
+    if ruta.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        archivo = pq.ParquetFile(ruta)
+        for lote in archivo.iter_batches(batch_size=tamano_bloque, columns=COLUMNAS_RFM):
+            yield lote.to_pandas()
+    else:
+        for bloque in pd.read_csv(ruta, usecols=COLUMNAS_RFM, chunksize=tamano_bloque):
+            yield bloque[COLUMNAS_RFM]
+
+
+def entrenar_minibatch(ruta, k=4, tamano_bloque=TAMANO_BLOQUE, n_epocas=3,
+                       tamano_muestra=100_000, random_state=42, artefacto_anterior=None):
+    """
+    Entrenar scaler + MiniBatchKMeans leyendo la tabla RFM por bloques.
+
+    En la primera pasada se ajusta el scaler y se guarda una muestra uniforme
+    acotada (muestreo por reservorio); los centroides iniciales son los del
+    artefacto anterior (si tiene el mismo k) o salen de un K-Means sobre esa
+    muestra, y las pasadas siguientes los refinan con partial_fit.
+    Devuelve (scaler, modelo, segmentos, muestra_escalada).
+    """
+    rng = np.random.default_rng(random_state)
+    scaler = StandardScaler()
+    muestra = np.empty((0, len(COLUMNAS_RFM)))
+    claves = np.empty(0)
+    for bloque in iterar_rfm(ruta, tamano_bloque):
+        scaler.partial_fit(bloque)
+        # Reservorio: quedarse con las filas de menor clave aleatoria
+        muestra = np.concatenate([muestra, bloque.to_numpy(dtype=np.float64)])
+        claves = np.concatenate([claves, rng.random(len(bloque))])
+        if len(claves) > tamano_muestra:
+            elegidas = np.argpartition(claves, tamano_muestra)[:tamano_muestra]
+            muestra, claves = muestra[elegidas], claves[elegidas]
+
+    muestra = scaler.transform(pd.DataFrame(muestra, columns=COLUMNAS_RFM))
+    inicial = centroides_anteriores(scaler, artefacto_anterior)
+    if inicial is None or len(inicial) != k:
+        inicial = KMeans(n_clusters=k, random_state=random_state).fit(muestra).cluster_centers_
+
+    # Sin reasignaciones: el clúster de clientes de muy alto valor es pequeño y
+    # MiniBatchKMeans lo reubicaría como si fuera un centroide vacío
+    modelo = MiniBatchKMeans(n_clusters=k, init=inicial, n_init=1,
+                             batch_size=min(tamano_bloque, 4096),
+                             reassignment_ratio=0.0, random_state=random_state)
+    for _ in range(n_epocas):
+        for bloque in iterar_rfm(ruta, tamano_bloque):
+            modelo.partial_fit(scaler.transform(bloque))
+
+    segmentos = alinear_segmentos(modelo.cluster_centers_, scaler, artefacto_anterior)
+    return scaler, modelo, segmentos, muestra
+
+
+def comparar_con_kmeans(x, modelo, random_state=42):
+    """Inercia y acuerdo de etiquetas de un modelo frente a K-Means completo"""
+    k = modelo.cluster_centers_.shape[0]
+
+    inicio = time.perf_counter()
+    completo = KMeans(n_clusters=k, random_state=random_state).fit(x)
+    segundos_completo = time.perf_counter() - inicio
+
+    etiquetas_mb = modelo.predict(x)
+    etiquetas_km = completo.labels_
+
+    # Acuerdo tras emparejar cada clúster con el que más coincide
+    from scipy.optimize import linear_sum_assignment
+
+    contingencia = np.zeros((k, k), dtype=np.int64)
+    np.add.at(contingencia, (etiquetas_km, etiquetas_mb), 1)
+    filas, columnas = linear_sum_assignment(-contingencia)
+    acuerdo = contingencia[filas, columnas].sum() / len(x)
+
+    distancias = ((x - modelo.cluster_centers_[etiquetas_mb]) ** 2).sum()
+    return {
+        "n_muestra": len(x),
+        "InerciaMiniBatch": float(distancias),
+        "InerciaKMeans": float(completo.inertia_),
+        "RatioInercia": float(distancias / completo.inertia_),
+        "AcuerdoEtiquetas": float(acuerdo),
+        "ARI": float(adjusted_rand_score(etiquetas_km, etiquetas_mb)),
+        "SegundosKMeans": segundos_completo,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrenar K-Means por mini-lotes desde disco")
+    parser.add_argument("entrada", help="Tabla RFM (CSV o Parquet) con Recency, Frequency, Monetary")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--tamano-bloque", type=int, default=TAMANO_BLOQUE)
+    parser.add_argument("--epocas", type=int, default=3)
+    parser.add_argument("--modelo", default=None, help=f"Destino del modelo (por defecto {RUTA_MODELO})")
+    parser.add_argument("--artefacto", default=None,
+                        help="Artefacto anterior (punto de partida) y destino del nuevo "
+                             f"(por defecto {RUTA_ARTEFACTO})")
+    parser.add_argument("--comparar", action="store_true",
+                        help="Solo evaluar: comparar con K-Means completo sobre la muestra; solo se "
+                             "guardan los destinos indicados con --modelo o --artefacto")
+    parser.add_argument("--no-guardar", action="store_true", help="No guardar el modelo ni el artefacto")
+    parser.add_argument("--tamano-muestra", type=int, default=100_000)
+    args = parser.parse_args()
+
+    ruta_artefacto = args.artefacto or RUTA_ARTEFACTO
+    # Al comparar solo se escriben los destinos indicados explícitamente
+    if args.no_guardar:
+        destino_modelo, destino_artefacto = None, None
+    elif args.comparar:
+        destino_modelo, destino_artefacto = args.modelo, args.artefacto
+    else:
+        destino_modelo, destino_artefacto = args.modelo or RUTA_MODELO, ruta_artefacto
+
+    anterior = cargar_artefacto(ruta_artefacto) if os.path.exists(ruta_artefacto) else None
+    inicio = time.perf_counter()
+    scaler, modelo, segmentos, muestra = entrenar_minibatch(
+        args.entrada, k=args.k, tamano_bloque=args.tamano_bloque,
+        n_epocas=args.epocas, tamano_muestra=args.tamano_muestra,
+        artefacto_anterior=anterior,
+    )
+    print(f"Entrenamiento: {time.perf_counter() - inicio:.1f} s")
+
+    if destino_modelo:
+        joblib.dump(modelo, destino_modelo)
+        print(f"✅ Modelo guardado en: {destino_modelo}")
+    if destino_artefacto:
+        exportar_artefacto(scaler, modelo, destino_artefacto, columnas=COLUMNAS_RFM, segmentos=segmentos,
+                           version_anterior=anterior["version_modelo"] if anterior is not None else None)
+        print(f"✅ Artefacto de segmentación guardado en: {destino_artefacto}")
+    if not destino_modelo and not destino_artefacto:
+        print("Modelo no guardado (solo evaluación; indique --modelo o --artefacto para guardarlo)")
+
+    if args.comparar:
+        reporte = comparar_con_kmeans(muestra, modelo)
+        print(f"\n--- MiniBatch vs K-Means completo, sobre la muestra por reservorio "
+              f"({len(muestra):,} de {int(scaler.n_samples_seen_):,} clientes) ---")
+        for clave, valor in reporte.items():
+            print(f"{clave}: {valor:.4f}" if isinstance(valor, float) else f"{clave}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
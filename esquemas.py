@@ -0,0 +1,145 @@
+"""
+Tipos compactos para las tablas RFM y de transacciones.
+
+Por defecto pandas carga los IDs como float64, los enteros como int64 y los
+textos como objetos de Python. Aquí se fija el esquema de cada tabla: IDs
+en int32, Cluster en int8, Recency/Frequency en el entero más pequeño que
+los contiene, Monetary en float32 cuando no se pierde ningún centavo y los
+textos como categóricas (códigos enteros + diccionario).
+
+Uso:
+    python esquemas.py resultados_segmentacion.csv --transacciones "Online Retail.xlsx"
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Columnas de texto de las transacciones que se guardan como categóricas
+COLUMNAS_CATEGORICAS = ["InvoiceNo", "StockCode", "Description", "Country"]
+
+_ENTEROS = (np.int8, np.int16, np.int32, np.int64)
+
+
+def _es_entero(valores):
+    """Numérico, sin nulos y sin parte decimal"""
+    if not pd.api.types.is_numeric_dtype(valores.dtype) or pd.api.types.is_bool_dtype(valores.dtype):
+        return False
+    if pd.api.types.is_integer_dtype(valores.dtype):
+        return True
+    return bool(np.isfinite(valores).all() and (valores == np.round(valores)).all())
+
+
+def entero_compacto(valores, minimo=np.int8):
+    """Convertir al entero con signo más pequeño (>= minimo) que contiene los valores"""
+    valores = np.asarray(valores)
+    if not _es_entero(valores):
+        return valores
+    if len(valores) == 0:
+        return valores.astype(minimo)
+    bajo, alto = valores.min(), valores.max()
+    for tipo in _ENTEROS:
+        if np.dtype(tipo).itemsize < np.dtype(minimo).itemsize:
+            continue
+        info = np.iinfo(tipo)
+        if info.min <= bajo and alto <= info.max:
+            return valores.astype(tipo)
+    return valores
+
+
+def decimal_compacto(valores, decimales=2):
+    """float32 si todos los valores conservan sus `decimales` al redondear; si no, float64"""
+    valores = np.asarray(valores, dtype=np.float64)
+    compactos = valores.astype(np.float32)
+    conserva = np.array_equal(
+        np.round(compactos.astype(np.float64), decimales),
+        np.round(valores, decimales),
+        equal_nan=True,
+    )
+    return compactos if conserva else valores
+
+
+def tipar_rfm(rfm):
+    """Tabla RFM (indexada por CustomerID) con el esquema compacto"""
+    rfm = rfm.copy()
+    rfm.index = pd.Index(entero_compacto(rfm.index.to_numpy(), minimo=np.int32),
+                         name=rfm.index.name)
+    for columna in ("Recency", "Frequency"):
+        if columna in rfm.columns:
+            rfm[columna] = entero_compacto(rfm[columna].to_numpy())
+    if "Monetary" in rfm.columns:
+        rfm["Monetary"] = decimal_compacto(rfm["Monetary"].to_numpy())
+    if "Cluster" in rfm.columns:
+        rfm["Cluster"] = entero_compacto(rfm["Cluster"].to_numpy())
+    return rfm
+
+
+def tipar_transacciones(df):
+    """
+    Transacciones limpias con el esquema compacto.
+
+    UnitPrice se deja en float64: Monetary se calcula multiplicándolo y un
+    precio en float32 cambiaría los importes en los últimos decimales.
+    """
+    df = df.copy()
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df.columns and not isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = df[columna].astype("category")
+    if "CustomerID" in df.columns:
+        df["CustomerID"] = entero_compacto(df["CustomerID"].to_numpy(), minimo=np.int32)
+    if "Quantity" in df.columns:
+        df["Quantity"] = entero_compacto(df["Quantity"].to_numpy(), minimo=np.int32)
+    return df
+
+
+def memoria_por_columna(df):
+    """Bytes y tipo de cada columna (incluido el índice)"""
+    bytes_columna = df.memory_usage(index=True, deep=True)
+    tipos = pd.Series({"Index": df.index.dtype, **df.dtypes.to_dict()})
+    return pd.DataFrame({"Tipo": tipos.astype(str), "Bytes": bytes_columna})
+
+
+def reporte_memoria(tablas):
+    """Filas, columnas y MB de cada tabla de un dict nombre -> DataFrame"""
+    filas = []
+    for nombre, df in tablas.items():
+        if df is None:
+            continue
+        filas.append({
+            "Tabla": nombre,
+            "Filas": len(df),
+            "Columnas": df.shape[1],
+            "MB": df.memory_usage(index=True, deep=True).sum() / 1e6,
+        })
+    return pd.DataFrame(filas, columns=["Tabla", "Filas", "Columnas", "MB"]).set_index("Tabla")
+
+
+def _comparar(nombre, original, tipada):
+    antes = memoria_por_columna(original)
+    despues = memoria_por_columna(tipada)
+    comparacion = antes.join(despues, lsuffix="Antes", rsuffix="Despues")
+    print(f"\n--- {nombre} ---")
+    print(comparacion.to_string())
+    total_antes, total_despues = antes["Bytes"].sum(), despues["Bytes"].sum()
+    print(f"Total: {total_antes / 1e6:.2f} MB -> {total_despues / 1e6:.2f} MB "
+          f"({total_antes / max(total_despues, 1):.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de memoria con el esquema compacto")
+    parser.add_argument("rfm", help="CSV de resultados RFM (indexado por CustomerID)")
+    parser.add_argument("--transacciones", help="Excel o CSV de transacciones (opcional)")
+    args = parser.parse_args()
+
+    rfm = pd.read_csv(args.rfm, index_col=0)
+    _comparar("Tabla RFM", rfm, tipar_rfm(rfm))
+
+    if args.transacciones:
+        from transacciones import leer_transacciones, limpiar_transacciones
+
+        df = limpiar_transacciones(leer_transacciones(args.transacciones))
+        _comparar("Transacciones", df, tipar_transacciones(df))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Gráficos del dashboard y caché de imágenes renderizadas.
+
+Cada gráfico se construye con matplotlib, se renderiza a PNG y se guarda en
+una caché LRU con límite de memoria, indexada por (versión de los datos,
+sección, segmento seleccionado, gráfico). Para las mismas entradas la
+imagen es idéntica, así que las vistas repetidas no vuelven a dibujar.
+
+matplotlib se importa la primera vez que hay que dibujar algo: una vista
+servida desde la caché (o una sección sin gráficos) no lo carga.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+COLORES_SEGMENTOS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
+COLOR_TEXTO = '#2c3e50'
+COLOR_FONDO = '#f8f9fa'
+
+# Memoria máxima de la caché de imágenes (bytes PNG)
+MAX_BYTES_CACHE = 64 * 1024 * 1024
+
+
+def _pyplot():
+    """matplotlib.pyplot con el backend sin pantalla (import diferido)"""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+class CacheGraficos:
+    """Caché LRU de imágenes PNG con límite de memoria total"""
+
+    def __init__(self, max_bytes=MAX_BYTES_CACHE):
+        self.max_bytes = max_bytes
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._imagenes = OrderedDict()
+        # Las sesiones de Streamlit corren en hilos distintos
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, construir_figura):
+        """PNG de la clave; si no está, se construye la figura y se renderiza"""
+        with self._lock:
+            if clave in self._imagenes:
+                self._imagenes.move_to_end(clave)
+                self.aciertos += 1
+                return self._imagenes[clave]
+            self.fallos += 1
+
+        png = figura_a_png(construir_figura())
+
+        with self._lock:
+            if clave not in self._imagenes and len(png) <= self.max_bytes:
+                self._imagenes[clave] = png
+                self.bytes_usados += len(png)
+                while self.bytes_usados > self.max_bytes:
+                    _, expulsada = self._imagenes.popitem(last=False)
+                    self.bytes_usados -= len(expulsada)
+        return png
+
+    def __len__(self):
+        return len(self._imagenes)
+
+
+def figura_a_png(fig, dpi=150):
+    """Renderizar la figura a PNG y cerrarla para liberar memoria"""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight",
+                    facecolor=fig.get_facecolor())
+    finally:
+        _pyplot().close(fig)
+    return buffer.getvalue()
+
+
+def _estilo_ejes(ax, titulo, xlabel, ylabel):
+    ax.set_title(titulo, fontweight='bold', color=COLOR_TEXTO)
+    ax.set_xlabel(xlabel, color=COLOR_TEXTO)
+    ax.set_ylabel(ylabel, color=COLOR_TEXTO)
+    ax.tick_params(colors=COLOR_TEXTO)
+    ax.grid(True, alpha=0.3)
+    ax.set_facecolor(COLOR_FONDO)
+
+
+def _barras_histograma(ax, histograma, **kwargs):
+    """Dibujar un histograma ya calculado (conteos, bordes): coste O(bins)"""
+    conteos, bordes = histograma
+    ax.hist(bordes[:-1], bins=bordes, weights=conteos, **kwargs)
+
+
+def grafico_segmentos(cluster_counts, total_clientes):
+    """Barras con el número de clientes por segmento"""
+    fig, ax = _pyplot().subplots(figsize=(10, 6))
+    bars = ax.bar([f'Segmento {i}' for i in cluster_counts.index],
+                  cluster_counts.values,
+                  color=COLORES_SEGMENTOS[:len(cluster_counts)])
+
+    ax.set_ylabel('Número de Clientes', fontweight='bold', color=COLOR_TEXTO)
+    ax.set_xlabel('Segmentos', fontweight='bold', color=COLOR_TEXTO)
+    ax.set_title('Distribución de Clientes por Segmento RFM', fontsize=14, fontweight='bold', color=COLOR_TEXTO)
+    ax.tick_params(colors=COLOR_TEXTO)
+    ax.tick_params(axis='x', rotation=45)
+
+    # Agregar valores en las barras
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                f'{int(height)}\n({height/total_clientes*100:.1f}%)',
+                ha='center', va='bottom', fontweight='bold', fontsize=9, color=COLOR_TEXTO)
+
+    ax.set_facecolor(COLOR_FONDO)
+    fig.patch.set_facecolor(COLOR_FONDO)
+    fig.tight_layout()
+    return fig
+
+
+def grafico_distribucion_rfm(histogramas):
+    """Histogramas de Recency, Frequency y Monetary (hasta el percentil 95)"""
+    fig, axes = _pyplot().subplots(1, 3, figsize=(15, 4))
+
+    if 'Recency' in histogramas:
+        _barras_histograma(axes[0], histogramas['Recency'], alpha=0.7, color='#3498db', edgecolor='black')
+        _estilo_ejes(axes[0], 'Distribución de Recencia', 'Días desde última compra', 'Frecuencia')
+
+    if 'Frequency' in histogramas:
+        _barras_histograma(axes[1], histogramas['Frequency'], alpha=0.7, color='#2ecc71', edgecolor='black')
+        _estilo_ejes(axes[1], 'Distribución de Frecuencia', 'Número de transacciones', 'Frecuencia')
+
+    if 'Monetary' in histogramas:
+        _barras_histograma(axes[2], histogramas['Monetary'], alpha=0.7, color='#e74c3c', edgecolor='black')
+        _estilo_ejes(axes[2], 'Distribución de Valor Monetario (95% percentil)', 'Valor total ($)', 'Frecuencia')
+
+    fig.patch.set_facecolor(COLOR_FONDO)
+    fig.tight_layout()
+    return fig
+
+
+def grafico_comparacion_segmentos(resumen, columna, segmento_seleccionado, color,
+                                  xlabel, titulo):
+    """Histograma de una variable para cada segmento, resaltando el elegido"""
+    fig, ax = _pyplot().subplots(figsize=(10, 5))
+
+    for cluster in resumen.clusters.tolist():
+        seleccionado = cluster == segmento_seleccionado
+        _barras_histograma(ax, resumen.histogramas[(cluster, columna)],
+                           alpha=0.8 if seleccionado else 0.4,
+                           label=f'Segmento {cluster}' if seleccionado else f'Seg {cluster}',
+                           color=color if seleccionado else '#bdc3c7')
+
+    _estilo_ejes(ax, titulo, xlabel, 'Frecuencia')
+    ax.legend()
+    fig.patch.set_facecolor(COLOR_FONDO)
+    fig.tight_layout()
+    return fig
+
+
+def grafico_evolucion_segmentos(evolucion, nombres):
+    """Clientes por segmento en cada foto del histórico"""
+    fig, ax = _pyplot().subplots(figsize=(10, 4))
+
+    for i, cluster in enumerate(evolucion.columns):
+        ax.plot(evolucion.index, evolucion[cluster], marker='o',
+                color=COLORES_SEGMENTOS[i % len(COLORES_SEGMENTOS)],
+                label=nombres.get(cluster, f'Segmento {cluster}'))
+
+    _estilo_ejes(ax, 'Clientes por Segmento en cada Ejecución', 'Fecha', 'Número de Clientes')
+    ax.legend()
+    fig.autofmt_xdate()
+    fig.patch.set_facecolor(COLOR_FONDO)
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,102 @@
+"""
+Medición de tiempos del dashboard en cada ejecución del script.
+
+Cada ejecución de app_streamlit.py crea un Cronometro que mide los loaders,
+la sección elegida, los gráficos y las tablas con estilo. Con la variable
+de entorno RFM_TIEMPOS=1 el desglose se muestra en el bloque "Información
+del Sistema" de la barra lateral. Con RFM_PERFIL=<directorio> además se
+perfila cada ejecución con cProfile y se guarda un archivo .pstats
+(se abre con `python -m pstats archivo.pstats` o snakeviz).
+
+El cuerpo de la página va en un try/finally (ver app_streamlit.py): las
+ejecuciones que terminan antes (pantallas de error, excepciones) también
+detienen y guardan su perfil y muestran los tiempos.
+"""
+import cProfile
+import os
+import re
+import time
+import unicodedata
+from contextlib import contextmanager
+
+import pandas as pd
+
+VARIABLE_TIEMPOS = "RFM_TIEMPOS"
+VARIABLE_PERFIL = "RFM_PERFIL"
+
+
+def tiempos_activados():
+    return os.environ.get(VARIABLE_TIEMPOS, "") not in ("", "0")
+
+
+class Cronometro:
+    """Tiempos de las etapas de una ejecución, en orden de aparición"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self._abiertas = {}
+
+    @contextmanager
+    def medir(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas.append((nombre, time.perf_counter() - inicio))
+
+    def llamar(self, nombre, funcion, *args):
+        """Ejecutar funcion(*args) midiendo su tiempo"""
+        with self.medir(nombre):
+            return funcion(*args)
+
+    def iniciar(self, nombre):
+        """Para bloques que no se pueden envolver en un `with` (p. ej. un if/elif)"""
+        self._abiertas[nombre] = time.perf_counter()
+
+    def terminar(self, nombre):
+        inicio = self._abiertas.pop(nombre, None)
+        if inicio is not None:
+            self.etapas.append((nombre, time.perf_counter() - inicio))
+
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+    def tabla(self):
+        """Milisegundos por etapa (las repetidas se suman)"""
+        tabla = pd.DataFrame(self.etapas, columns=["Etapa", "ms"])
+        tabla["ms"] *= 1000
+        return tabla.groupby("Etapa", sort=False).sum().round(1)
+
+
+class PerfilEjecucion:
+    """cProfile de una ejecución del script, guardado como .pstats"""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.perfil = cProfile.Profile()
+
+    @classmethod
+    def desde_entorno(cls):
+        """Perfil ya iniciado si RFM_PERFIL está definida; si no, None"""
+        directorio = os.environ.get(VARIABLE_PERFIL)
+        if not directorio:
+            return None
+        perfil = cls(directorio)
+        try:
+            perfil.perfil.enable()
+        except ValueError:
+            # Solo puede haber un perfilador activo: otra sesión ya está perfilando
+            return None
+        return perfil
+
+    def guardar(self, etiqueta):
+        """Detener el perfil y guardarlo; devuelve la ruta del archivo"""
+        self.perfil.disable()
+        os.makedirs(self.directorio, exist_ok=True)
+        marca = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S_%f")
+        nombre = unicodedata.normalize("NFKD", etiqueta).encode("ascii", "ignore").decode()
+        nombre = re.sub(r"\W+", "_", nombre).strip("_").lower()
+        ruta = os.path.join(self.directorio, f"perfil_{marca}_{nombre}.pstats")
+        self.perfil.dump_stats(ruta)
+        return ruta
@@ -0,0 +1,151 @@
+"""
+Clientes de cada segmento, paginados y ordenados por cualquier variable.
+
+Al construirse se ordena una vez la tabla por (Cluster, variable) para cada
+columna ordenable: cada segmento queda contiguo y, dentro de él, ordenado por
+la variable. Una página es entonces un corte de ese array de posiciones
+(coste proporcional al tamaño de página, no al del segmento) y la exportación
+recorre el mismo array por bloques, escribiendo CSV o Parquet sin armar el
+segmento completo en memoria.
+
+Uso:
+    python miembros_segmentos.py resultados_segmentacion.csv --segmento 3 --orden Monetary --salida alto_valor.parquet
+"""
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from esquemas import tipar_rfm
+from rfm import COLUMNAS_RFM
+
+# Además de las variables RFM se puede ordenar por el propio CustomerID
+COLUMNA_ID = "CustomerID"
+
+TAMANO_PAGINA = 50
+
+# Clientes por bloque al exportar (acota la memoria intermedia)
+TAMANO_BLOQUE = 100_000
+
+FORMATOS = {"CSV": ("csv", "text/csv"), "Parquet": ("parquet", "application/octet-stream")}
+
+
+class MiembrosSegmentos:
+    """Orden de los clientes de cada segmento por cada variable, como posiciones de la tabla RFM"""
+
+    def __init__(self, rfm):
+        self.rfm = rfm
+        self.columnas = [c for c in COLUMNAS_RFM if c in rfm.columns]
+        self.columnas_orden = [COLUMNA_ID] + self.columnas
+
+        etiquetas = rfm["Cluster"].to_numpy()
+        clusters, conteos = np.unique(etiquetas, return_counts=True)
+        self.clusters = clusters
+        inicios = np.r_[0, np.cumsum(conteos)]
+        self._rangos = {c: (int(inicios[i]), int(inicios[i + 1])) for i, c in enumerate(clusters.tolist())}
+
+        tipo = np.int32 if len(rfm) < 2**31 else np.int64
+        self.ordenes = {}
+        for columna in self.columnas_orden:
+            valores = rfm.index.to_numpy() if columna == COLUMNA_ID else rfm[columna].to_numpy()
+            # Por Cluster y, dentro de cada uno, por la variable (empates en el orden de la tabla)
+            self.ordenes[columna] = np.lexsort((valores, etiquetas)).astype(tipo)
+
+    def tamano(self, cluster):
+        inicio, fin = self._rangos.get(cluster, (0, 0))
+        return fin - inicio
+
+    def n_paginas(self, cluster, tamano_pagina=TAMANO_PAGINA):
+        return max(1, -(-self.tamano(cluster) // tamano_pagina))
+
+    def posiciones(self, cluster, columna, desde, hasta, descendente=True):
+        """Filas de la tabla de los clientes [desde, hasta) del segmento en ese orden"""
+        inicio, fin = self._rangos.get(cluster, (0, 0))
+        desde, hasta = min(max(desde, 0), fin - inicio), min(max(hasta, 0), fin - inicio)
+        orden = self.ordenes[columna]
+        if descendente:
+            return orden[fin - hasta:fin - desde][::-1]
+        return orden[inicio + desde:inicio + hasta]
+
+    def pagina(self, cluster, columna, numero, tamano_pagina=TAMANO_PAGINA, descendente=True):
+        """Página `numero` (desde 1) de los clientes del segmento"""
+        desde = (numero - 1) * tamano_pagina
+        posiciones = self.posiciones(cluster, columna, desde, desde + tamano_pagina, descendente)
+        return self.rfm.iloc[posiciones][self.columnas]
+
+    def bloques(self, cluster, columna, descendente=True, tamano_bloque=TAMANO_BLOQUE):
+        """Todos los clientes del segmento en orden, por bloques (al menos uno, aunque esté vacío)"""
+        for desde in range(0, max(self.tamano(cluster), 1), tamano_bloque):
+            posiciones = self.posiciones(cluster, columna, desde, desde + tamano_bloque, descendente)
+            yield self.rfm.iloc[posiciones][self.columnas + ["Cluster"]]
+
+    def exportar(self, destino, cluster, columna, descendente=True, formato="CSV",
+                 tamano_bloque=TAMANO_BLOQUE):
+        """
+        Escribir el segmento completo en `destino` (ruta o archivo binario)
+        bloque a bloque. Devuelve el número de clientes escritos.
+        """
+        total = 0
+        bloques = self.bloques(cluster, columna, descendente, tamano_bloque)
+        if formato == "Parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            escritor = None
+            for bloque in bloques:
+                tabla = pa.Table.from_pandas(bloque.rename_axis(COLUMNA_ID).reset_index(), preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(destino, tabla.schema)
+                escritor.write_table(tabla)
+                total += len(bloque)
+            if escritor is not None:
+                escritor.close()
+            return total
+
+        cerrar = isinstance(destino, (str, os.PathLike))
+        f = open(destino, "wb") if cerrar else destino
+        try:
+            f.write((",".join([COLUMNA_ID] + self.columnas + ["Cluster"]) + "\n").encode("utf-8"))
+            for bloque in bloques:
+                f.write(bloque.to_csv(header=False, lineterminator="\n").encode("utf-8"))
+                total += len(bloque)
+        finally:
+            if cerrar:
+                f.close()
+        return total
+
+    def archivo_exportacion(self, cluster, columna, descendente=True, formato="CSV"):
+        """
+        Segmento exportado en un archivo en memoria (io.BytesIO, uno de los
+        tipos que acepta st.download_button), listo para leer.
+        """
+        archivo = io.BytesIO()
+        self.exportar(archivo, cluster, columna, descendente, formato)
+        archivo.seek(0)
+        return archivo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar los clientes de un segmento ordenados")
+    parser.add_argument("entrada", help="CSV con CustomerID, RFM y Cluster")
+    parser.add_argument("--segmento", type=int, required=True)
+    parser.add_argument("--orden", default="Monetary", help="CustomerID, Recency, Frequency o Monetary")
+    parser.add_argument("--ascendente", action="store_true")
+    parser.add_argument("--salida", required=True, help="Archivo .csv o .parquet")
+    args = parser.parse_args()
+
+    miembros = MiembrosSegmentos(tipar_rfm(pd.read_csv(args.entrada, index_col=0)))
+    if args.orden not in miembros.columnas_orden:
+        parser.error(f"--orden debe ser una de: {', '.join(miembros.columnas_orden)}")
+    formato = "Parquet" if args.salida.lower().endswith(".parquet") else "CSV"
+
+    ruta_tmp = f"{args.salida}.tmp"
+    total = miembros.exportar(ruta_tmp, args.segmento, args.orden, not args.ascendente, formato)
+    os.replace(ruta_tmp, args.salida)
+    print(f"✅ {total:,} clientes del segmento {args.segmento} guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
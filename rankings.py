@@ -0,0 +1,250 @@
+"""
+Rankings de clientes: los K mayores y menores de cada variable RFM, por
+segmento y para toda la base.
+
+Se calculan una vez por versión de los datos con selección parcial
+(np.argpartition, O(n) por segmento y variable, sin ordenar la tabla) y se
+guardan para hasta K_MAXIMO clientes; la app solo corta la lista.
+
+Tras una actualización incremental (rfm_incremental.py) no hace falta
+recalcularlos: los clientes tocados salen de cada ranking y vuelven a entrar
+como candidatos con sus valores nuevos. Los clientes no tocados no cambian
+de orden (Recency se desplaza igual para todos), así que el ranking sigue
+siendo exacto mientras queden al menos K clientes por encima del último
+valor guardado; para eso se guarda una reserva de clientes extra, y solo
+cuando se agota se recalcula ese ranking desde la tabla.
+
+Uso:
+    python rankings.py resultados_segmentacion.csv --salida rankings_rfm.npz
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_datos import huella_contenido
+from esquemas import tipar_rfm
+from rfm import COLUMNAS_RFM
+
+RUTA_RANKINGS = "rankings_rfm.npz"
+
+# Versión del formato del archivo
+VERSION_RANKINGS = 1
+
+# Clientes por ranking que se pueden pedir (máximo del selector de la app)
+K_MAXIMO = 100
+
+# Clientes extra guardados por ranking: absorben las salidas de clientes
+# tocados en las actualizaciones incrementales sin tener que recalcular
+RESERVA = 100
+
+# Grupo de los rankings de toda la base (el resto son números de Cluster)
+TODOS = None
+
+
+def _nombre_grupo(grupo):
+    return "todos" if grupo is TODOS else str(grupo)
+
+
+def _contiene(ordenados, valores):
+    """Pertenencia de cada valor a un array ordenado (búsqueda binaria)"""
+    if not len(ordenados):
+        return np.zeros(len(valores), dtype=bool)
+    lugar = np.minimum(np.searchsorted(ordenados, valores), len(ordenados) - 1)
+    return ordenados[lugar] == valores
+
+
+def seleccionar(valores, ids, k, mayores=True):
+    """Posiciones de los k mejores valores, ordenadas (mayores o menores primero)"""
+    n = len(valores)
+    clave = -valores if mayores else valores
+    if n > k:
+        candidatos = np.argpartition(clave, k - 1)[:k]
+    else:
+        candidatos = np.arange(n)
+    return candidatos[np.lexsort((ids[candidatos], clave[candidatos]))]
+
+
+class RankingsRFM:
+    """Top y bottom K de cada variable RFM por segmento y global"""
+
+    def __init__(self, rfm, k=K_MAXIMO, reserva=RESERVA):
+        self.k = int(k)
+        self.capacidad = self.k + int(reserva)
+        self.columnas = [c for c in COLUMNAS_RFM if c in rfm.columns]
+        self.meta = {}
+        etiquetas = rfm["Cluster"].to_numpy()
+        self.clusters, conteos = np.unique(etiquetas, return_counts=True)
+        self.tamanos = {TODOS: len(rfm), **dict(zip(self.clusters.tolist(), conteos.tolist()))}
+
+        ids = rfm.index.to_numpy(dtype=np.int64)
+        valores = rfm[self.columnas].to_numpy(dtype=np.float64)
+        orden = np.argsort(etiquetas, kind="stable")
+        inicios = np.r_[0, np.cumsum(conteos)]
+        posiciones = {TODOS: np.arange(len(rfm))}
+        for i, cluster in enumerate(self.clusters.tolist()):
+            posiciones[cluster] = orden[inicios[i]:inicios[i + 1]]
+
+        # (grupo, columna, mayores) -> (ids, valores de todas las columnas), el mejor primero
+        self.tablas = {}
+        for grupo, filas in posiciones.items():
+            for columna in self.columnas:
+                for mayores in (True, False):
+                    self.tablas[(grupo, columna, mayores)] = self._calcular(
+                        ids[filas], valores[filas], columna, mayores)
+
+    @property
+    def grupos(self):
+        return [TODOS] + self.clusters.tolist()
+
+    def _calcular(self, ids, valores, columna, mayores):
+        seleccion = seleccionar(valores[:, self.columnas.index(columna)], ids, self.capacidad, mayores)
+        return ids[seleccion], valores[seleccion]
+
+    def ranking(self, grupo, columna, k=10, mayores=True):
+        """Los k (<= self.k) clientes con mayor (o menor) `columna` del segmento (TODOS = toda la base)"""
+        k = min(k, self.k)
+        ids, valores = self.tablas.get((grupo, columna, mayores), (np.empty(0, dtype=np.int64),
+                                                                   np.empty((0, len(self.columnas)))))
+        return pd.DataFrame(valores[:k], columns=self.columnas,
+                            index=pd.Index(ids[:k], name="CustomerID"))
+
+    def actualizar(self, rfm, tocados):
+        """
+        Incorporar los cambios de los clientes `tocados` (nuevos o con
+        valores o Cluster distintos). `rfm` es la tabla completa ya
+        actualizada; solo se recorre para los rankings que no se pueden
+        completar con los candidatos. Devuelve cuántos se recalcularon.
+        """
+        tocados = pd.Index(tocados)
+        # Ordenados una vez: la pertenencia de cada ranking es una búsqueda binaria
+        tocados_ordenados = np.sort(tocados.to_numpy(dtype=np.int64))
+        etiquetas = rfm["Cluster"].to_numpy()
+        nuevos_tamanos = {TODOS: len(rfm), **rfm["Cluster"].value_counts().to_dict()}
+        candidatos = rfm.loc[rfm.index.intersection(tocados)]
+        ids_candidatos = candidatos.index.to_numpy(dtype=np.int64)
+        valores_candidatos = candidatos[self.columnas].to_numpy(dtype=np.float64)
+        clusters_candidatos = candidatos["Cluster"].to_numpy()
+
+        completa = {}
+
+        def tabla_completa():
+            # Solo se convierte la tabla entera si algún ranking hay que recalcularlo
+            if not completa:
+                completa["ids"] = rfm.index.to_numpy(dtype=np.int64)
+                completa["valores"] = rfm[self.columnas].to_numpy(dtype=np.float64)
+            return completa["ids"], completa["valores"]
+
+        recalculados = 0
+        tablas = {}
+        grupos = [TODOS] + sorted(int(g) for g in nuevos_tamanos if g is not TODOS)
+        for grupo in grupos:
+            en_grupo = (np.ones(len(candidatos), dtype=bool) if grupo is TODOS
+                        else clusters_candidatos == grupo)
+            for columna in self.columnas:
+                j = self.columnas.index(columna)
+                for mayores in (True, False):
+                    ids, valores = self.tablas.get((grupo, columna, mayores), (None, None))
+                    tabla = None
+                    if ids is not None:
+                        tabla = self._combinar(rfm, tocados_ordenados, ids, valores, j, mayores,
+                                               self.tamanos.get(grupo, 0), nuevos_tamanos.get(grupo, 0),
+                                               ids_candidatos[en_grupo], valores_candidatos[en_grupo])
+                    if tabla is None:
+                        ids_tabla, valores_tabla = tabla_completa()
+                        filas = (np.arange(len(rfm)) if grupo is TODOS
+                                 else np.flatnonzero(etiquetas == grupo))
+                        tabla = self._calcular(ids_tabla[filas], valores_tabla[filas], columna, mayores)
+                        recalculados += 1
+                    tablas[(grupo, columna, mayores)] = tabla
+
+        self.tablas = tablas
+        self.tamanos = {g: int(nuevos_tamanos[g]) for g in grupos}
+        self.clusters = np.array(grupos[1:], dtype=np.int64)
+        self.meta.pop("huella_resultados", None)
+        return recalculados
+
+    def _combinar(self, rfm, tocados_ordenados, ids, valores, j, mayores, tamano_anterior, tamano_nuevo,
+                  ids_candidatos, valores_candidatos):
+        """Ranking actualizado a partir del anterior y los candidatos, o None si hay que recalcularlo"""
+        filas = rfm.index.get_indexer(ids)
+        conservar = (filas >= 0) & ~_contiene(tocados_ordenados, ids)
+        ids_conservados = ids[conservar]
+        # Valores al día (Recency se desplaza con el snapshot, igual para todos)
+        valores_conservados = rfm.iloc[filas[conservar]][self.columnas].to_numpy(dtype=np.float64)
+
+        union_ids = np.concatenate([ids_conservados, ids_candidatos])
+        union_valores = np.concatenate([valores_conservados, valores_candidatos])
+        if len(ids) < tamano_anterior:
+            # Fuera del ranking hay clientes no tocados: solo valen los que llegan al último guardado
+            if not len(ids_conservados):
+                return None
+            desplazamiento = valores_conservados[0, j] - valores[conservar][0, j]
+            umbral = valores[-1, j] + desplazamiento
+            validos = (union_valores[:, j] >= umbral) if mayores else (union_valores[:, j] <= umbral)
+            if validos.sum() < min(self.k, tamano_nuevo):
+                return None
+            union_ids, union_valores = union_ids[validos], union_valores[validos]
+        seleccion = seleccionar(union_valores[:, j], union_ids, self.capacidad, mayores)
+        return union_ids[seleccion], union_valores[seleccion]
+
+    def guardar(self, ruta=RUTA_RANKINGS, huella_resultados=None):
+        """Escribir los rankings en un .npz (escritura atómica)"""
+        meta = {**self.meta, "version_rankings": VERSION_RANKINGS, "k": self.k, "capacidad": self.capacidad,
+                "columnas": self.columnas, "clusters": self.clusters.tolist(),
+                "tamanos": {_nombre_grupo(g): int(n) for g, n in self.tamanos.items()},
+                "huella_resultados": huella_resultados}
+        arrays = {}
+        for (grupo, columna, mayores), (ids, valores) in self.tablas.items():
+            prefijo = f"{_nombre_grupo(grupo)}_{columna}_{'mayores' if mayores else 'menores'}"
+            arrays[f"{prefijo}_ids"] = ids
+            arrays[f"{prefijo}_valores"] = valores
+        ruta_tmp = f"{ruta}.tmp"
+        with open(ruta_tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(ruta_tmp, ruta)
+        return ruta
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_RANKINGS, huella_resultados=None):
+        """Rankings guardados, o None si son de otro CSV de resultados u otro formato"""
+        with np.load(ruta, allow_pickle=False) as datos:
+            meta = json.loads(str(datos["meta"]))
+            if meta.get("version_rankings") != VERSION_RANKINGS:
+                return None
+            if huella_resultados is not None and meta.get("huella_resultados") != huella_resultados:
+                return None
+            rankings = cls.__new__(cls)
+            rankings.k = meta["k"]
+            rankings.capacidad = meta["capacidad"]
+            rankings.columnas = meta["columnas"]
+            rankings.clusters = np.array(meta["clusters"], dtype=np.int64)
+            rankings.tamanos = {TODOS if g == "todos" else int(g): n for g, n in meta["tamanos"].items()}
+            rankings.meta = meta
+            rankings.tablas = {}
+            for grupo in rankings.grupos:
+                for columna in rankings.columnas:
+                    for mayores in (True, False):
+                        prefijo = f"{_nombre_grupo(grupo)}_{columna}_{'mayores' if mayores else 'menores'}"
+                        rankings.tablas[(grupo, columna, mayores)] = (datos[f"{prefijo}_ids"],
+                                                                      datos[f"{prefijo}_valores"])
+        return rankings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcular los rankings de clientes por segmento")
+    parser.add_argument("entrada", help="CSV con CustomerID, RFM y Cluster")
+    parser.add_argument("--salida", default=RUTA_RANKINGS)
+    parser.add_argument("--k", type=int, default=K_MAXIMO)
+    args = parser.parse_args()
+
+    rankings = RankingsRFM(tipar_rfm(pd.read_csv(args.entrada, index_col=0)), args.k)
+    rankings.guardar(args.salida, huella_resultados=huella_contenido(args.entrada))
+    print(f"✅ Rankings de {len(rankings.grupos)} grupos (K={rankings.k}) guardados en: {args.salida}")
+    print(rankings.ranking(TODOS, "Monetary", 10).to_string())
+
+
+if __name__ == "__main__":
+    main()
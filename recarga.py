@@ -0,0 +1,117 @@
+"""
+Recursos que se recargan en segundo plano cuando cambian sus archivos.
+
+Cada recurso guarda el valor cargado junto con la huella (tamaño + mtime,
+o tamaño + SHA-1 con con_hash=True) de sus archivos y de los recursos de
+los que depende. Si al pedirlo la huella ya no coincide (p. ej. el proceso
+nocturno sobrescribió el CSV), se lanza la recarga en un hilo y mientras
+tanto se sigue devolviendo la versión anterior; cuando la nueva está
+completa se sustituye de una sola vez.
+"""
+import os
+import threading
+import time
+
+from cache_datos import huella_archivo
+
+_SIN_VALOR = object()
+
+# Dentro de una carga, las dependencias se cargan en el mismo hilo y se espera
+_contexto = threading.local()
+
+
+class Recargable:
+    """Valor derivado de archivos, con recarga en segundo plano y cambio atómico"""
+
+    def __init__(self, cargar, rutas=(), dependencias=(), con_hash=False, nombre=None):
+        self.cargar = cargar
+        self.rutas = list(rutas)
+        self.dependencias = list(dependencias)
+        self.con_hash = con_hash
+        self.nombre = nombre or getattr(cargar, "__name__", "recurso")
+        self.error = None
+        self.segundos_carga = None
+        # (valor, huella) se reemplaza como una sola tupla
+        self._estado = (_SIN_VALOR, None)
+        self._lock_carga = threading.Lock()
+        self._lock_hilo = threading.Lock()
+        self._hilo = None
+        self._huella_fallida = None
+        # ruta -> ((tamano, mtime_ns), sha1): el hash solo se recalcula si cambia el stat
+        self._hashes = {}
+
+    def _huella_ruta(self, ruta):
+        if not os.path.exists(ruta):
+            return None
+        huella = huella_archivo(ruta)
+        if not self.con_hash:
+            return huella
+        stat = (huella["tamano"], huella["mtime_ns"])
+        guardado = self._hashes.get(ruta)
+        if guardado is None or guardado[0] != stat:
+            guardado = (stat, huella_archivo(ruta, con_hash=True)["sha1"])
+            self._hashes[ruta] = guardado
+        # Sin mtime: reescribir el mismo contenido no provoca una recarga
+        return {"tamano": huella["tamano"], "sha1": guardado[1]}
+
+    def huella(self):
+        """Huella de los archivos propios y de las dependencias"""
+        archivos = tuple(self._huella_ruta(ruta) for ruta in self.rutas)
+        return archivos, tuple(dependencia.huella() for dependencia in self.dependencias)
+
+    @property
+    def recargando(self):
+        hilo = self._hilo
+        return hilo is not None and hilo.is_alive()
+
+    def obtener(self):
+        """
+        Valor actual. La primera vez (o dentro de otra carga) se carga en este
+        hilo; después, si los archivos cambiaron, se devuelve el valor anterior
+        y la versión nueva se prepara en segundo plano.
+        """
+        huella = self.huella()
+        valor, huella_valor = self._estado
+        if valor is _SIN_VALOR or getattr(_contexto, "cargando", False):
+            if valor is _SIN_VALOR or huella_valor != huella:
+                return self._cargar(huella)
+            return valor
+        if huella_valor != huella:
+            self._recargar_en_segundo_plano(huella)
+        return valor
+
+    def _cargar(self, huella):
+        with self._lock_carga:
+            # Otro hilo pudo terminar la misma carga mientras se esperaba el lock
+            valor, huella_valor = self._estado
+            if valor is not _SIN_VALOR and huella_valor == huella:
+                return valor
+            anterior = getattr(_contexto, "cargando", False)
+            _contexto.cargando = True
+            inicio = time.perf_counter()
+            try:
+                valor = self.cargar()
+            finally:
+                _contexto.cargando = anterior
+            self.segundos_carga = time.perf_counter() - inicio
+            self._estado = (valor, huella)
+            self.error = None
+            return valor
+
+    def _recargar_en_segundo_plano(self, huella):
+        with self._lock_hilo:
+            if self.recargando or huella == self._huella_fallida:
+                return
+            self._hilo = threading.Thread(
+                target=self._recargar, args=(huella,),
+                name=f"recarga-{self.nombre}", daemon=True,
+            )
+            self._hilo.start()
+
+    def _recargar(self, huella):
+        try:
+            self._cargar(huella)
+        except Exception as e:
+            # Se sigue sirviendo la versión anterior; no se reintenta con la misma huella
+            self.error = e
+            self._huella_fallida = huella
@@ -0,0 +1,196 @@
+"""
+Reentrenamiento del K-Means con segmentos estables.
+
+Los números de clúster de K-Means son arbitrarios: dos entrenamientos sobre
+datos casi iguales pueden intercambiar "Clientes Inactivos" y "Clientes de
+Alto Valor", y con ellos los nombres y recomendaciones de la app. Al
+reentrenar con un artefacto anterior:
+
+- el K-Means arranca desde sus centroides (pasados a la escala nueva), que
+  ya están cerca de la solución y necesitan muchas menos iteraciones;
+- cada centroide nuevo se empareja con uno anterior minimizando la suma de
+  distancias (algoritmo húngaro) y hereda su segmento.
+
+Sin artefacto anterior, los segmentos se nombran por el perfil RFM de los
+centroides (ver segmentos_iniciales); un artefacto con los nombres
+cambiados se corrige sin reentrenar con --por-perfil. El segmento de cada centroide se
+guarda en el artefacto y asignar_segmentos devuelve directamente el
+segmento, así que las tablas y resúmenes por segmento no cambian de
+significado entre entrenamientos.
+
+Uso:
+    python reentrenamiento.py resultados_segmentacion.csv --salida resultados_segmentacion.csv
+    python reentrenamiento.py resultados_segmentacion.csv --por-perfil --salida resultados_segmentacion.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from rfm import COLUMNAS_RFM
+from segmentacion import (NOMBRES_SEGMENTOS, RUTA_ARTEFACTO, SEGMENTOS_POR_NOMBRE,
+                          asignar_segmentos, cargar_artefacto, exportar_artefacto,
+                          guardar_resultados, guardar_segmentos)
+
+# Primer entrenamiento (k = 4): segmento y variable cuyo máximo lo identifica,
+# en este orden; el clúster que queda es "Clientes Nuevos/Potenciales"
+REGLAS_INICIALES = [
+    ("Clientes de Alto Valor", "Monetary"),
+    ("Clientes Inactivos", "Recency"),
+    ("Clientes Leales", "Frequency"),
+]
+
+
+def columnas_scaler(scaler):
+    return [str(c) for c in getattr(scaler, "feature_names_in_", COLUMNAS_RFM)]
+
+
+def centroides_anteriores(scaler, artefacto_anterior):
+    """
+    Centroides del artefacto anterior en la escala de `scaler`, o None si no
+    hay artefacto o usa otras columnas.
+    """
+    if artefacto_anterior is None or list(artefacto_anterior["columnas"]) != columnas_scaler(scaler):
+        return None
+    originales = artefacto_anterior["centroides"] * artefacto_anterior["escalas"] + artefacto_anterior["medias"]
+    return (originales - scaler.mean_) / scaler.scale_
+
+
+def segmentos_iniciales(centroides, columnas=COLUMNAS_RFM):
+    """
+    Segmento de cada centroide por su perfil RFM. Solo con 4 clústeres (uno
+    por nombre de NOMBRES_SEGMENTOS); con otro k, el orden del K-Means.
+    """
+    k = len(centroides)
+    if k != len(NOMBRES_SEGMENTOS) or not set(COLUMNAS_RFM) <= set(columnas):
+        return np.arange(k)
+    posicion = {columna: i for i, columna in enumerate(columnas)}
+
+    segmentos = np.empty(k, dtype=np.int64)
+    libres = list(range(k))
+    for nombre, columna in REGLAS_INICIALES:
+        elegido = max(libres, key=lambda i: centroides[i, posicion[columna]])
+        segmentos[elegido] = SEGMENTOS_POR_NOMBRE[nombre]
+        libres.remove(elegido)
+    restante = set(SEGMENTOS_POR_NOMBRE) - {nombre for nombre, _ in REGLAS_INICIALES}
+    segmentos[libres[0]] = SEGMENTOS_POR_NOMBRE[restante.pop()]
+    return segmentos
+
+
+def emparejar_centroides(nuevos, anteriores, segmentos_anteriores):
+    """
+    Segmento de cada centroide nuevo: el del centroide anterior emparejado
+    (mínima suma de distancias al cuadrado). Si hay más clústeres que antes,
+    los que sobran reciben segmentos nuevos a continuación del mayor.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    segmentos_anteriores = np.asarray(segmentos_anteriores, dtype=np.int64)
+    costes = ((nuevos[:, None, :] - anteriores[None, :, :]) ** 2).sum(axis=2)
+    filas, columnas = linear_sum_assignment(costes)
+    segmentos = np.full(len(nuevos), -1, dtype=np.int64)
+    segmentos[filas] = segmentos_anteriores[columnas]
+    sobrantes = np.flatnonzero(segmentos < 0)
+    segmentos[sobrantes] = segmentos_anteriores.max() + 1 + np.arange(len(sobrantes))
+    return segmentos
+
+
+def alinear_segmentos(centroides, scaler, artefacto_anterior=None):
+    """Segmento de cada centroide (escala de `scaler`): emparejado con el artefacto anterior o por perfil"""
+    anteriores = centroides_anteriores(scaler, artefacto_anterior)
+    if anteriores is None:
+        return segmentos_iniciales(centroides, columnas_scaler(scaler))
+    return emparejar_centroides(centroides, anteriores, artefacto_anterior["segmentos"])
+
+
+def entrenar_kmeans(x, k, scaler, artefacto_anterior=None, random_state=42):
+    """
+    K-Means sobre x (ya escalado con `scaler`) con segmentos estables.
+
+    Con un artefacto anterior del mismo k arranca desde sus centroides
+    (n_init=1); si no, k-means++ como siempre. Devuelve (kmeans, segmentos),
+    donde segmentos[i] es el segmento del clúster i: el segmento de cada
+    fila es segmentos[kmeans.labels_].
+    """
+    from sklearn.cluster import KMeans
+
+    anteriores = centroides_anteriores(scaler, artefacto_anterior)
+    if anteriores is not None and len(anteriores) == k:
+        kmeans = KMeans(n_clusters=k, init=anteriores, n_init=1, random_state=random_state)
+    else:
+        kmeans = KMeans(n_clusters=k, random_state=random_state)
+    kmeans.fit(x)
+    return kmeans, alinear_segmentos(kmeans.cluster_centers_, scaler, artefacto_anterior)
+
+
+def renombrar_por_perfil(ruta_artefacto=RUTA_ARTEFACTO):
+    """
+    Volver a nombrar los segmentos del artefacto por el perfil de sus
+    centroides (sin reentrenar). Devuelve {segmento anterior: segmento
+    nuevo} para traducir las tablas ya segmentadas con él.
+    """
+    artefacto = cargar_artefacto(ruta_artefacto)
+    segmentos = segmentos_iniciales(artefacto["centroides"], artefacto["columnas"])
+    guardar_segmentos(ruta_artefacto, segmentos)
+    return dict(zip(artefacto["segmentos"].tolist(), segmentos.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reentrenar el K-Means manteniendo los segmentos")
+    parser.add_argument("entrada", help="CSV con CustomerID, Recency, Frequency, Monetary")
+    parser.add_argument("--k", type=int, default=len(NOMBRES_SEGMENTOS))
+    parser.add_argument("--artefacto", default=RUTA_ARTEFACTO,
+                        help="Artefacto anterior (punto de partida) y destino del nuevo")
+    parser.add_argument("--modelo", default="modelo_kmeans.pkl")
+    parser.add_argument("--salida", default=None, help="CSV con el RFM y el Cluster nuevo")
+    parser.add_argument("--por-perfil", action="store_true",
+                        help="No reentrenar: nombrar los segmentos del artefacto por el perfil de sus "
+                             "centroides y traducir el Cluster de la entrada")
+    args = parser.parse_args()
+
+    if args.por_perfil:
+        traduccion = renombrar_por_perfil(args.artefacto)
+        for anterior, nuevo in traduccion.items():
+            print(f"  Segmento {anterior} -> {nuevo}: {NOMBRES_SEGMENTOS.get(nuevo, f'Segmento {nuevo}')}")
+        print(f"✅ Artefacto de segmentación guardado en: {args.artefacto}")
+        if args.salida:
+            # Solo cambia Cluster: el resto de columnas se reescribe sin perder decimales
+            rfm = pd.read_csv(args.entrada, index_col=0, float_precision="round_trip")
+            guardar_resultados(rfm.assign(Cluster=rfm["Cluster"].replace(traduccion)), args.salida)
+            print(f"✅ Resultados guardados en: {args.salida}")
+        return
+
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+
+    rfm = pd.read_csv(args.entrada, index_col=0)
+    anterior = cargar_artefacto(args.artefacto) if os.path.exists(args.artefacto) else None
+
+    scaler = StandardScaler()
+    x = scaler.fit_transform(rfm[COLUMNAS_RFM])
+    inicio = time.perf_counter()
+    kmeans, segmentos = entrenar_kmeans(x, args.k, scaler, anterior)
+    print(f"Entrenamiento: {time.perf_counter() - inicio:.2f} s, {kmeans.n_iter_} iteraciones "
+          f"({'desde el artefacto anterior' if anterior is not None else 'sin artefacto anterior'})")
+
+    nuevo = segmentos[kmeans.labels_]
+    if anterior is not None:
+        cambian = int((asignar_segmentos(anterior, rfm) != nuevo).sum())
+        print(f"Clientes que cambian de segmento: {cambian:,} de {len(rfm):,}")
+
+    joblib.dump(kmeans, args.modelo)
+    exportar_artefacto(scaler, kmeans, args.artefacto, columnas=COLUMNAS_RFM, segmentos=segmentos,
+                       version_anterior=anterior["version_modelo"] if anterior is not None else None)
+    for cluster, segmento in enumerate(segmentos):
+        print(f"  Clúster {cluster} -> {segmento}: {NOMBRES_SEGMENTOS.get(segmento, f'Segmento {segmento}')}")
+    print(f"✅ Modelo guardado en: {args.modelo}")
+    print(f"✅ Artefacto de segmentación guardado en: {args.artefacto}")
+    if args.salida:
+        guardar_resultados(rfm.assign(Cluster=nuevo)[COLUMNAS_RFM + ["Cluster"]], args.salida)
+        print(f"✅ Resultados guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Resúmenes por segmento compartidos por todas las secciones del dashboard.
+
+Se construyen una vez por versión de los datos (conteos, medias, sumas,
+cuantiles, histogramas y las posiciones de las filas de cada clúster) para
+que las secciones no tengan que volver a recorrer toda la tabla de clientes
+en cada interacción. Los gráficos se dibujan a partir de los conteos de los
+histogramas, así que su coste depende del número de bins y no del de
+clientes.
+
+El resumen se puede guardar como "bundle" (.npz) desde el notebook y la app
+lo carga sin leer la tabla de clientes para las páginas de resumen.
+
+Las listas de mejores clientes por segmento (antes "top_{cluster}" en el
+bundle) están en rankings_rfm.npz (ver rankings.py): mayores y menores K
+por variable, por segmento y globales, también sin leer la tabla completa.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from rfm import COLUMNAS_RFM
+
+CUANTILES = (0.25, 0.5, 0.75, 0.95)
+
+BINS_GLOBALES = 30
+BINS_SEGMENTO = 15
+
+# Variables cuyos histogramas se cortan en el percentil 95 (valores atípicos)
+RECORTE_P95 = ("Monetary",)
+
+RUTA_BUNDLE = "dashboard_bundle.npz"
+VERSION_BUNDLE = 1
+
+
+def metricas_generales(rfm, total_unidades=None):
+    """Valores de las cuatro tarjetas del Dashboard General"""
+    total_clientes = len(rfm)
+    if 'Frequency' in rfm.columns:
+        total_pedidos = int(rfm['Frequency'].to_numpy(dtype=np.int64).sum())
+    else:
+        total_pedidos = total_clientes * 5  # Estimación para datos de ejemplo
+    if total_unidades is None:
+        total_unidades = total_pedidos * 10  # Estimación para datos de ejemplo
+    if 'Monetary' in rfm.columns:
+        ingresos_totales = float(rfm['Monetary'].to_numpy(dtype=np.float64).sum())
+    else:
+        ingresos_totales = float(total_unidades * 50)  # Estimación para datos de ejemplo
+    return {
+        "total_clientes": total_clientes,
+        "total_unidades": int(total_unidades),
+        "ingresos_totales": ingresos_totales,
+        "total_pedidos": total_pedidos,
+    }
+
+
+def histograma(valores, bins, limite=None):
+    """(conteos, bordes) como en plt.hist; con limite solo valores < limite"""
+    valores = np.asarray(valores, dtype=np.float64)
+    if limite is not None:
+        valores = valores[valores < limite]
+    return np.histogram(valores, bins=bins)
+
+
+def histogramas_globales(rfm, bins=BINS_GLOBALES):
+    """Histogramas de cada variable RFM sobre toda la base de clientes"""
+    histogramas = {}
+    for columna in COLUMNAS_RFM:
+        if columna in rfm.columns:
+            limite = rfm[columna].quantile(0.95) if columna in RECORTE_P95 else None
+            histogramas[columna] = histograma(rfm[columna].to_numpy(), bins, limite)
+    return histogramas
+
+
+class ResumenSegmentos:
+    """
+    Estadísticas por clúster de una tabla RFM con columna Cluster.
+
+    total_unidades es la suma de Quantity de las transacciones (tarjeta
+    "Total Transacciones"); si no se conoce se estima como en la app.
+    Cargado desde un bundle, rfm es None y solo están los agregados.
+    """
+
+    def __init__(self, rfm, total_unidades=None):
+        self.rfm = rfm
+        self.version = format(int(pd.util.hash_pandas_object(rfm).sum()), "x")
+        self.columnas = [c for c in COLUMNAS_RFM if c in rfm.columns]
+
+        etiquetas = rfm["Cluster"].to_numpy()
+        # Un único ordenamiento por clúster: cada segmento queda contiguo
+        orden = np.argsort(etiquetas, kind="stable")
+        self.clusters, inicios, conteos = np.unique(
+            etiquetas[orden], return_index=True, return_counts=True
+        )
+        self.indices = {
+            c: orden[inicio:inicio + n]
+            for c, inicio, n in zip(self.clusters.tolist(), inicios, conteos)
+        }
+
+        self.conteos = pd.Series(conteos, index=pd.Index(self.clusters, name="Cluster"),
+                                 name="Clientes")
+        # Sumas y medias en float64 aunque la tabla use tipos compactos
+        valores = rfm[self.columnas].astype(np.float64)
+        agrupado = valores.groupby(rfm["Cluster"])
+        self.sumas = agrupado.sum()
+        self.medias = self.sumas.div(self.conteos, axis=0)
+        self.cuantiles = agrupado.quantile(list(CUANTILES))
+
+        # Histogramas por segmento para los gráficos comparativos
+        self.histogramas = {}
+        for cluster in self.clusters.tolist():
+            for columna in self.columnas:
+                limite = (self.cuantil(cluster, columna, 0.95)
+                          if columna in RECORTE_P95 else None)
+                self.histogramas[(cluster, columna)] = histograma(
+                    self.columna(cluster, columna), BINS_SEGMENTO, limite
+                )
+
+        self.total_clientes = len(rfm)
+        self.sumas_globales = valores.sum()
+        self.medias_globales = valores.mean()
+        self.cuantiles_globales = valores.quantile(list(CUANTILES))
+        self.histogramas_globales = histogramas_globales(rfm)
+        self.metricas = metricas_generales(rfm, total_unidades)
+
+    @property
+    def es_bundle(self):
+        return self.rfm is None
+
+    def filas(self, cluster):
+        """Filas del segmento sin recorrer la tabla con una máscara booleana"""
+        return self.rfm.iloc[self.indices.get(cluster, np.empty(0, dtype=np.int64))]
+
+    def columna(self, cluster, columna):
+        """Valores de una columna RFM para un segmento, como array"""
+        posiciones = self.indices.get(cluster, np.empty(0, dtype=np.int64))
+        return self.rfm[columna].to_numpy()[posiciones]
+
+    def cuantil(self, cluster, columna, q):
+        return self.cuantiles.loc[(cluster, q), columna]
+
+    def guardar(self, ruta=RUTA_BUNDLE, huella_resultados=None):
+        """
+        Guardar el resumen como bundle para la app (escritura atómica).
+
+        huella_resultados es huella_contenido(resultados_segmentacion.csv); la app
+        solo usa el bundle mientras el CSV no haya cambiado.
+        """
+        arrays = {
+            "clusters": self.clusters,
+            "conteos": self.conteos.to_numpy(),
+            "sumas": self.sumas.to_numpy(),
+            "cuantiles": self.cuantiles.to_numpy(),
+            "sumas_globales": self.sumas_globales.to_numpy(),
+            "medias_globales": self.medias_globales.to_numpy(),
+            "cuantiles_globales": self.cuantiles_globales.to_numpy(),
+        }
+        for columna, (conteos, bordes) in self.histogramas_globales.items():
+            arrays[f"histg_{columna}_conteos"] = conteos
+            arrays[f"histg_{columna}_bordes"] = bordes
+        for (cluster, columna), (conteos, bordes) in self.histogramas.items():
+            arrays[f"hist_{cluster}_{columna}_conteos"] = conteos
+            arrays[f"hist_{cluster}_{columna}_bordes"] = bordes
+
+        meta = {
+            "version_bundle": VERSION_BUNDLE,
+            "version": self.version,
+            "columnas": self.columnas,
+            "cuantiles": list(CUANTILES),
+            "total_clientes": self.total_clientes,
+            "metricas": self.metricas,
+            "huella_resultados": huella_resultados,
+        }
+        arrays["meta"] = np.array(json.dumps(meta))
+
+        ruta_tmp = f"{ruta}.tmp"
+        with open(ruta_tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(ruta_tmp, ruta)
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_BUNDLE, huella_resultados=None):
+        """
+        Leer un bundle. Si se indica huella_resultados y no coincide con la
+        guardada, devuelve None (el bundle está desactualizado).
+        """
+        with np.load(ruta, allow_pickle=False) as datos:
+            meta = json.loads(str(datos["meta"]))
+            if meta.get("version_bundle") != VERSION_BUNDLE:
+                return None
+            if huella_resultados is not None and meta.get("huella_resultados") != huella_resultados:
+                return None
+            arrays = {clave: datos[clave] for clave in datos.files}
+
+        resumen = cls.__new__(cls)
+        columnas = meta["columnas"]
+        clusters = arrays["clusters"]
+        indice = pd.Index(clusters, name="Cluster")
+
+        resumen.rfm = None
+        resumen.indices = {}
+        resumen.version = meta["version"]
+        resumen.columnas = columnas
+        resumen.clusters = clusters
+        resumen.conteos = pd.Series(arrays["conteos"], index=indice, name="Clientes")
+        resumen.sumas = pd.DataFrame(arrays["sumas"], index=indice, columns=columnas)
+        resumen.medias = resumen.sumas.div(resumen.conteos, axis=0)
+        resumen.cuantiles = pd.DataFrame(
+            arrays["cuantiles"],
+            index=pd.MultiIndex.from_product([clusters, meta["cuantiles"]], names=["Cluster", None]),
+            columns=columnas,
+        )
+        resumen.total_clientes = meta["total_clientes"]
+        resumen.sumas_globales = pd.Series(arrays["sumas_globales"], index=columnas)
+        resumen.medias_globales = pd.Series(arrays["medias_globales"], index=columnas)
+        resumen.cuantiles_globales = pd.DataFrame(
+            arrays["cuantiles_globales"], index=meta["cuantiles"], columns=columnas
+        )
+        resumen.histogramas_globales = {
+            columna: (arrays[f"histg_{columna}_conteos"], arrays[f"histg_{columna}_bordes"])
+            for columna in columnas
+        }
+        resumen.histogramas = {
+            (cluster, columna): (arrays[f"hist_{cluster}_{columna}_conteos"],
+                                 arrays[f"hist_{cluster}_{columna}_bordes"])
+            for cluster in clusters.tolist() for columna in columnas
+        }
+        resumen.metricas = meta["metricas"]
+        return resumen
+
+    def resumen_ejecutivo(self):
+        """Tabla del resumen ejecutivo (medias, valor total y clientes por clúster)"""
+        return pd.DataFrame({
+            "Recencia Prom": self.medias["Recency"],
+            "Frecuencia Prom": self.medias["Frequency"],
+            "Valor Prom": self.medias["Monetary"],
+            "Valor Total": self.sumas["Monetary"],
+            "Clientes": self.conteos,
+        }).round(2)
@@ -0,0 +1,97 @@
+"""
+Cálculo vectorizado de las variables RFM (Recency, Frequency, Monetary).
+
+Sustituye al groupby con lambdas del notebook: se hace un único ordenamiento
+por (CustomerID, InvoiceNo) y después reducciones segmentadas de NumPy
+sobre los bloques de cada cliente.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNAS_RFM = ["Recency", "Frequency", "Monetary"]
+
+
+def fecha_snapshot(df):
+    """Fecha de referencia del notebook: último InvoiceDate + 1 día"""
+    return df["InvoiceDate"].max() + pd.Timedelta(days=1)
+
+
+def agregar_por_cliente(df):
+    """
+    Agregados por cliente sin depender de la fecha de referencia.
+
+    Devuelve un DataFrame indexado por CustomerID (ordenado) con la fecha de
+    la última compra, el número de facturas distintas y el valor total.
+    """
+    cliente_cod, clientes = pd.factorize(df["CustomerID"], sort=True)
+    factura_cod, facturas = pd.factorize(df["InvoiceNo"])
+
+    # Importe de cada línea precalculado una sola vez
+    totales = (
+        df["Quantity"].to_numpy(dtype=np.float64)
+        * df["UnitPrice"].to_numpy(dtype=np.float64)
+    )
+    fechas = df["InvoiceDate"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    # Único ordenamiento: por cliente y, dentro de cada cliente, por factura
+    clave = cliente_cod.astype(np.int64) * max(len(facturas), 1) + factura_cod
+    orden = np.argsort(clave, kind="stable")
+    clave = clave[orden]
+    cliente_ord = cliente_cod[orden]
+
+    if len(cliente_ord) == 0:
+        return pd.DataFrame(
+            {
+                "UltimaCompra": pd.Series([], dtype="datetime64[ns]"),
+                "Frequency": pd.Series([], dtype=np.int64),
+                "Monetary": pd.Series([], dtype=np.float64),
+            },
+            index=pd.Index(clientes, name="CustomerID"),
+        )
+
+    # Inicio del bloque de cada cliente y de cada factura dentro del orden
+    inicios = np.flatnonzero(np.r_[True, cliente_ord[1:] != cliente_ord[:-1]])
+    factura_nueva = np.r_[True, clave[1:] != clave[:-1]]
+
+    ultima = np.maximum.reduceat(fechas[orden], inicios)
+    frecuencia = np.add.reduceat(factura_nueva.astype(np.int64), inicios)
+    monetario = np.add.reduceat(totales[orden], inicios)
+
+    return pd.DataFrame(
+        {
+            "UltimaCompra": ultima.view("datetime64[ns]"),
+            "Frequency": frecuencia,
+            "Monetary": monetario,
+        },
+        index=pd.Index(clientes[cliente_ord[inicios]], name="CustomerID"),
+    )
+
+
+def rfm_desde_agregados(agregados, snapshot_date):
+    """Convertir los agregados por cliente en la tabla RFM para una fecha dada"""
+    snapshot = np.datetime64(pd.Timestamp(snapshot_date), "ns")
+    ultima = agregados["UltimaCompra"].to_numpy(dtype="datetime64[ns]")
+    recencia = (snapshot - ultima) // np.timedelta64(1, "D")
+
+    return pd.DataFrame(
+        {
+            "Recency": recencia.astype(np.int64),
+            "Frequency": agregados["Frequency"].to_numpy(dtype=np.int64),
+            "Monetary": agregados["Monetary"].to_numpy(dtype=np.float64),
+        },
+        index=agregados.index,
+    )
+
+
+def calcular_rfm(df, snapshot_date=None):
+    """
+    Calcular la tabla RFM a partir de las transacciones limpias.
+
+    Equivalente al groupby del notebook: Recency en días desde la última
+    compra hasta snapshot_date (por defecto último InvoiceDate + 1 día),
+    Frequency como facturas distintas y Monetary como suma de
+    Quantity * UnitPrice.
+    """
+    if snapshot_date is None:
+        snapshot_date = fecha_snapshot(df)
+    return rfm_desde_agregados(agregar_por_cliente(df), snapshot_date)
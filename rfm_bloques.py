@@ -0,0 +1,182 @@
+"""
+Cálculo de RFM por bloques para logs de transacciones que no caben en memoria.
+
+Las transacciones se leen en bloques (CSV, Parquet o Excel en modo solo
+lectura), cada bloque se limpia igual que en el notebook y se reduce a
+agregados parciales por cliente (última compra, número de facturas y valor
+total) que se van fusionando. La memoria máxima depende del número de
+clientes y del tamaño de bloque, no del tamaño del archivo.
+
+Uso:
+    python rfm_bloques.py transacciones.csv --salida resultados_segmentacion.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from rfm import agregar_por_cliente, rfm_desde_agregados
+from segmentacion import RUTA_ARTEFACTO, asignar_segmentos, cargar_artefacto, guardar_resultados
+from transacciones import COLUMNAS, limpiar_transacciones
+
+TAMANO_BLOQUE = 500_000
+
+
+def leer_por_bloques(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """Generar DataFrames de como mucho tamano_bloque filas sin limpiar"""
+    extension = os.path.splitext(ruta)[1].lower()
+
+    if extension == ".csv":
+        yield from pd.read_csv(ruta, chunksize=tamano_bloque)
+
+    elif extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        archivo = pq.ParquetFile(ruta)
+        for lote in archivo.iter_batches(batch_size=tamano_bloque):
+            yield lote.to_pandas()
+
+    elif extension in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezado = [str(c) for c in next(filas)]
+            bloque = []
+            for fila in filas:
+                bloque.append(fila)
+                if len(bloque) == tamano_bloque:
+                    yield pd.DataFrame(bloque, columns=encabezado)
+                    bloque = []
+            if bloque:
+                yield pd.DataFrame(bloque, columns=encabezado)
+        finally:
+            libro.close()
+
+    else:
+        raise ValueError(f"Formato no soportado para lectura por bloques: {ruta}")
+
+
+class AgregadorRFM:
+    """
+    Acumula agregados por cliente bloque a bloque.
+
+    Con facturas_contiguas=True (exportaciones ordenadas por factura, como
+    Online Retail) las líneas de la última factura de cada bloque se pasan al
+    bloque siguiente, de modo que ninguna factura se cuenta dos veces y la
+    memoria solo crece con el número de clientes. Con facturas_contiguas=False
+    se guarda un hash de 64 bits por cada par (cliente, factura) visto, lo que
+    funciona con cualquier orden a costa de memoria proporcional al número de
+    facturas.
+    """
+
+    def __init__(self, facturas_contiguas=True):
+        self.facturas_contiguas = facturas_contiguas
+        self.estado = None
+        self._pendiente = None
+        self._pares_vistos = set()
+
+    def agregar(self, bloque):
+        """Incorporar un bloque de transacciones sin limpiar"""
+        bloque = limpiar_transacciones(bloque[[c for c in COLUMNAS if c in bloque.columns]])
+        # Cada bloque de CSV infiere sus tipos; el Excel completo da CustomerID float
+        bloque["CustomerID"] = bloque["CustomerID"].astype(np.float64)
+
+        if self.facturas_contiguas:
+            if self._pendiente is not None:
+                bloque = pd.concat([self._pendiente, bloque], ignore_index=True)
+                self._pendiente = None
+            if len(bloque) == 0:
+                return
+            # Retener la última factura por si continúa en el siguiente bloque
+            facturas = bloque["InvoiceNo"].to_numpy()
+            ultima = facturas[-1]
+            corte = len(facturas)
+            while corte > 0 and facturas[corte - 1] == ultima:
+                corte -= 1
+            self._pendiente = bloque.iloc[corte:]
+            bloque = bloque.iloc[:corte]
+
+        if len(bloque) > 0:
+            self._fusionar(self._agregar_bloque(bloque))
+
+    def _agregar_bloque(self, bloque):
+        parcial = agregar_por_cliente(bloque)
+        if self.facturas_contiguas:
+            return parcial
+
+        # Contar solo pares (cliente, factura) que no aparecieron antes
+        hashes = pd.util.hash_pandas_object(
+            bloque[["CustomerID", "InvoiceNo"]], index=False
+        ).to_numpy()
+        hashes, primera = np.unique(hashes, return_index=True)
+        nuevos = np.fromiter(
+            (h not in self._pares_vistos for h in hashes.tolist()),
+            dtype=bool, count=len(hashes),
+        )
+        self._pares_vistos.update(hashes[nuevos].tolist())
+        clientes_nuevos = bloque["CustomerID"].to_numpy()[primera[nuevos]]
+        frecuencia = pd.Series(clientes_nuevos).value_counts()
+        parcial["Frequency"] = frecuencia.reindex(parcial.index, fill_value=0).to_numpy()
+        return parcial
+
+    def _fusionar(self, parcial):
+        if self.estado is None:
+            self.estado = parcial
+            return
+        self.estado = pd.concat([self.estado, parcial]).groupby(level=0).agg({
+            "UltimaCompra": "max",
+            "Frequency": "sum",
+            "Monetary": "sum",
+        })
+
+    def resultado(self, snapshot_date=None):
+        """Tabla RFM final (mismas columnas que calcular_rfm)"""
+        if self._pendiente is not None and len(self._pendiente) > 0:
+            self._fusionar(self._agregar_bloque(self._pendiente))
+            self._pendiente = None
+        if self.estado is None:
+            raise ValueError("No se agregó ninguna transacción válida")
+        if snapshot_date is None:
+            snapshot_date = self.estado["UltimaCompra"].max() + pd.Timedelta(days=1)
+        return rfm_desde_agregados(self.estado, snapshot_date)
+
+
+def calcular_rfm_por_bloques(ruta, tamano_bloque=TAMANO_BLOQUE, snapshot_date=None,
+                             facturas_contiguas=True):
+    """Equivalente a calcular_rfm(cargar_transacciones(ruta)) con memoria acotada"""
+    agregador = AgregadorRFM(facturas_contiguas=facturas_contiguas)
+    for bloque in leer_por_bloques(ruta, tamano_bloque):
+        agregador.agregar(bloque)
+    return agregador.resultado(snapshot_date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcular RFM por bloques y asignar segmentos")
+    parser.add_argument("entrada", help="Transacciones en CSV, Parquet o Excel")
+    parser.add_argument("--salida", default="resultados_segmentacion.csv")
+    parser.add_argument("--tamano-bloque", type=int, default=TAMANO_BLOQUE)
+    parser.add_argument("--facturas-desordenadas", action="store_true",
+                        help="El archivo no está agrupado por InvoiceNo")
+    parser.add_argument("--artefacto", default=None,
+                        help="Artefacto de segmentación para añadir la columna Cluster")
+    args = parser.parse_args()
+
+    rfm = calcular_rfm_por_bloques(
+        args.entrada,
+        tamano_bloque=args.tamano_bloque,
+        facturas_contiguas=not args.facturas_desordenadas,
+    )
+
+    ruta_artefacto = args.artefacto or RUTA_ARTEFACTO
+    if os.path.exists(ruta_artefacto):
+        rfm["Cluster"] = asignar_segmentos(cargar_artefacto(ruta_artefacto), rfm)
+
+    guardar_resultados(rfm, args.salida)
+    print(f"✅ {len(rfm):,} clientes guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
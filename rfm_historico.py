@@ -0,0 +1,251 @@
+"""
+RFM y segmentos a cualquier fecha pasada ("time travel").
+
+Se construye una vez, a partir del log de transacciones limpio, un índice con
+las compras de cada cliente ordenadas por fecha y el gasto acumulado hasta
+cada una, más la fecha de la primera línea de cada factura. Calcular el RFM
+a una fecha es entonces una única búsqueda binaria vectorizada (un
+searchsorted para todos los clientes) en lugar de volver a agregar el log:
+
+- Frequency: número de facturas del cliente anteriores a la fecha
+- Monetary: gasto acumulado en la última compra anterior a la fecha
+- Recency: días entre la fecha y esa última compra
+
+Las facturas se cuentan desde la fecha de su primera línea. El resultado
+coincide con calcular_rfm sobre las líneas anteriores a la fecha (y con la
+fecha por defecto, último InvoiceDate + 1 día, con la tabla completa).
+
+Uso:
+    python rfm_historico.py transacciones.csv --fecha 2011-09-01 --salida rfm_2011-09-01.csv
+    python rfm_historico.py transacciones.csv --fecha 2011-12-10 --comparar 2011-09-01
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cache_datos import huella_archivo
+from segmentacion import RUTA_ARTEFACTO, asignar_segmentos, cargar_artefacto
+from transacciones import cargar_transacciones
+
+# Versión del formato del archivo
+VERSION_HISTORIAL = 1
+
+# La clave de búsqueda es (cliente << 32) | segundos desde la primera factura
+_BITS_SEGUNDOS = 32
+_NS_POR_SEGUNDO = 1_000_000_000
+_NS_POR_DIA = 86_400 * _NS_POR_SEGUNDO
+
+# Cluster de los clientes que aún no habían comprado en una fecha
+SIN_COMPRAS = -1
+
+
+class HistorialRFM:
+    """Compras por cliente ordenadas por fecha, con gasto acumulado"""
+
+    def __init__(self, df):
+        cliente_cod, clientes = pd.factorize(df["CustomerID"], sort=True)
+        factura_cod, facturas = pd.factorize(df["InvoiceNo"])
+        cliente_cod = cliente_cod.astype(np.int64)
+        totales = (
+            df["Quantity"].to_numpy(dtype=np.float64)
+            * df["UnitPrice"].to_numpy(dtype=np.float64)
+        )
+        fechas = df["InvoiceDate"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        self.clientes = pd.Index(clientes, name="CustomerID")
+        self.origen = int(fechas.min()) if len(fechas) else 0
+        if len(fechas) and (int(fechas.max()) - self.origen) // _NS_POR_SEGUNDO >= 2 ** _BITS_SEGUNDOS:
+            raise ValueError("El log abarca más de 136 años")
+
+        # Compras: líneas del mismo cliente y misma fecha agrupadas en un evento
+        orden = np.lexsort((fechas, cliente_cod))
+        cliente_ord, fecha_ord = cliente_cod[orden], fechas[orden]
+        nuevo = np.r_[True, (cliente_ord[1:] != cliente_ord[:-1]) | (fecha_ord[1:] != fecha_ord[:-1])]
+        eventos = np.flatnonzero(nuevo[:len(orden)])
+        importes = np.add.reduceat(totales[orden], eventos) if len(eventos) else np.empty(0)
+        self.fechas = fecha_ord[eventos]
+        self.claves = self._clave(cliente_ord[eventos], self.fechas)
+        self.inicios = np.searchsorted(cliente_ord[eventos], np.arange(len(clientes) + 1))
+
+        # Gasto acumulado dentro de cada cliente (el total global se resta por bloques)
+        acumulado = np.cumsum(importes)
+        base = np.r_[0.0, acumulado][self.inicios[:-1]]
+        self.gasto_acumulado = acumulado - np.repeat(base, np.diff(self.inicios))
+
+        # Facturas: cada una cuenta desde la fecha de su primera línea
+        clave = cliente_cod * max(len(facturas), 1) + factura_cod
+        orden = np.argsort(clave, kind="stable")
+        clave = clave[orden]
+        primeras = np.flatnonzero(np.r_[True, clave[1:] != clave[:-1]][:len(orden)])
+        primera_fecha = np.minimum.reduceat(fechas[orden], primeras) if len(primeras) else np.empty(0, dtype=np.int64)
+        self.claves_facturas = np.sort(self._clave(cliente_cod[orden][primeras], primera_fecha))
+        self.inicios_facturas = np.searchsorted(
+            self.claves_facturas, np.arange(len(clientes) + 1, dtype=np.int64) << _BITS_SEGUNDOS
+        )
+        self.meta = {}
+
+    def _clave(self, cliente_cod, fechas):
+        """(cliente << 32) | segundos desde la primera compra: ordena por cliente y fecha"""
+        return (cliente_cod << _BITS_SEGUNDOS) | ((fechas - self.origen) // _NS_POR_SEGUNDO)
+
+    def __len__(self):
+        return len(self.clientes)
+
+    @property
+    def version(self):
+        """Huella del contenido del índice (clave de cachés)"""
+        if "version" not in self.meta:
+            sha1 = hashlib.sha1()
+            for array in (self.claves, self.gasto_acumulado, self.claves_facturas):
+                sha1.update(np.ascontiguousarray(array).tobytes())
+            self.meta["version"] = sha1.hexdigest()[:16]
+        return self.meta["version"]
+
+    @property
+    def fecha_minima(self):
+        return pd.Timestamp(self.origen)
+
+    @property
+    def fecha_maxima(self):
+        return pd.Timestamp(int(self.fechas.max())) if len(self.fechas) else pd.Timestamp(self.origen)
+
+    def rfm_a_fecha(self, fecha, artefacto=None):
+        """
+        Tabla RFM con las líneas anteriores a `fecha` (precisión de un
+        segundo). Solo aparecen los clientes con alguna compra antes de esa
+        fecha; con artefacto se añade su Cluster.
+        """
+        instante = pd.Timestamp(fecha).value
+        segundo = np.clip((instante - self.origen) // _NS_POR_SEGUNDO, 0, 2 ** _BITS_SEGUNDOS - 1)
+        consultas = (np.arange(len(self.clientes), dtype=np.int64) << _BITS_SEGUNDOS) | segundo
+        posiciones = np.searchsorted(self.claves, consultas, side="left")
+        compras = posiciones - self.inicios[:-1]
+        activos = compras > 0
+        ultima = posiciones[activos] - 1
+
+        frecuencia = (np.searchsorted(self.claves_facturas, consultas[activos], side="left")
+                      - self.inicios_facturas[:-1][activos])
+
+        rfm = pd.DataFrame(
+            {
+                "Recency": (instante - self.fechas[ultima]) // _NS_POR_DIA,
+                "Frequency": frecuencia.astype(np.int64),
+                "Monetary": self.gasto_acumulado[ultima],
+            },
+            index=self.clientes[activos],
+        )
+        if artefacto is not None:
+            rfm["Cluster"] = asignar_segmentos(artefacto, rfm)
+        return rfm
+
+    def comparar_fechas(self, fecha_anterior, fecha_posterior, artefacto):
+        """
+        Cluster de cada cliente en las dos fechas (SIN_COMPRAS si aún no
+        había comprado) y la matriz de transiciones entre ambas.
+        """
+        anterior = self.rfm_a_fecha(fecha_anterior, artefacto)["Cluster"]
+        posterior = self.rfm_a_fecha(fecha_posterior, artefacto)["Cluster"]
+        # Ambas tablas siguen el orden de self.clientes: se alinean con un reindex
+        clientes = anterior.index.union(posterior.index)
+        movimientos = pd.DataFrame({
+            "Anterior": anterior.reindex(clientes, fill_value=SIN_COMPRAS).to_numpy(),
+            "Posterior": posterior.reindex(clientes, fill_value=SIN_COMPRAS).to_numpy(),
+        }, index=clientes)
+        transiciones = pd.crosstab(movimientos["Anterior"], movimientos["Posterior"])
+        return movimientos, transiciones
+
+    def guardar(self, ruta, huella_origen=None):
+        """Escribir el índice en un .npz (escritura atómica)"""
+        meta = {**self.meta, "version_historial": VERSION_HISTORIAL,
+                "origen": self.origen, "huella_origen": huella_origen}
+        ruta_tmp = f"{ruta}.tmp"
+        with open(ruta_tmp, "wb") as f:
+            np.savez(
+                f,
+                clientes=self.clientes.to_numpy(),
+                inicios=self.inicios,
+                fechas=self.fechas,
+                claves=self.claves,
+                gasto_acumulado=self.gasto_acumulado,
+                claves_facturas=self.claves_facturas,
+                inicios_facturas=self.inicios_facturas,
+                meta=np.array(json.dumps(meta)),
+            )
+        os.replace(ruta_tmp, ruta)
+        return ruta
+
+    @classmethod
+    def cargar(cls, ruta, huella_origen=None):
+        """Índice guardado, o None si es de otro archivo de origen u otro formato"""
+        with np.load(ruta, allow_pickle=False) as datos:
+            meta = json.loads(str(datos["meta"]))
+            if meta.get("version_historial") != VERSION_HISTORIAL:
+                return None
+            if huella_origen is not None and meta.get("huella_origen") != huella_origen:
+                return None
+            historial = cls.__new__(cls)
+            historial.clientes = pd.Index(datos["clientes"], name="CustomerID")
+            historial.inicios = datos["inicios"]
+            historial.fechas = datos["fechas"]
+            historial.claves = datos["claves"]
+            historial.gasto_acumulado = datos["gasto_acumulado"]
+            historial.claves_facturas = datos["claves_facturas"]
+            historial.inicios_facturas = datos["inicios_facturas"]
+            historial.origen = meta["origen"]
+            historial.meta = meta
+        return historial
+
+
+def cargar_historial(ruta_transacciones, ruta_indice=None):
+    """Historial del log, reutilizando el índice guardado si es del mismo archivo"""
+    huella = huella_archivo(ruta_transacciones)
+    if ruta_indice and os.path.exists(ruta_indice):
+        historial = HistorialRFM.cargar(ruta_indice, huella)
+        if historial is not None:
+            return historial
+    historial = HistorialRFM(cargar_transacciones(ruta_transacciones))
+    if ruta_indice:
+        historial.guardar(ruta_indice, huella)
+    return historial
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RFM y segmentos a una fecha pasada")
+    parser.add_argument("transacciones", help="Log de transacciones (Excel o CSV)")
+    parser.add_argument("--fecha", default=None,
+                        help="Fecha de referencia (por defecto último InvoiceDate + 1 día)")
+    parser.add_argument("--comparar", default=None,
+                        help="Fecha anterior: muestra las transiciones entre segmentos")
+    parser.add_argument("--salida", default=None, help="CSV con el RFM a la fecha")
+    parser.add_argument("--artefacto", default=RUTA_ARTEFACTO)
+    parser.add_argument("--indice", default=None,
+                        help="Archivo .npz donde guardar/reutilizar el índice")
+    args = parser.parse_args()
+
+    historial = cargar_historial(args.transacciones, args.indice)
+    artefacto = cargar_artefacto(args.artefacto) if os.path.exists(args.artefacto) else None
+    fecha = pd.Timestamp(args.fecha) if args.fecha else historial.fecha_maxima + pd.Timedelta(days=1)
+
+    rfm = historial.rfm_a_fecha(fecha, artefacto)
+    print(f"RFM a {fecha:%Y-%m-%d}: {len(rfm):,} clientes con compras")
+    if "Cluster" in rfm.columns:
+        print(rfm.groupby("Cluster").agg(Clientes=("Recency", "size"), Recency=("Recency", "mean"),
+                                         Frequency=("Frequency", "mean"), Monetary=("Monetary", "mean"))
+              .round(1).to_string())
+    if args.salida:
+        rfm.to_csv(args.salida)
+        print(f"✅ Guardado en: {args.salida}")
+
+    if args.comparar:
+        if artefacto is None:
+            parser.error("--comparar necesita el artefacto de segmentación")
+        _, transiciones = historial.comparar_fechas(args.comparar, fecha, artefacto)
+        print(f"\nTransiciones {args.comparar} -> {fecha:%Y-%m-%d} ({SIN_COMPRAS} = sin compras):")
+        print(transiciones.to_string())
+
+
+if __name__ == "__main__":
+    main()
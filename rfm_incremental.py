@@ -0,0 +1,215 @@
+"""
+Actualización incremental de RFM a partir de lotes de transacciones nuevas.
+
+En lugar de guardar Recency en días, el estado guarda la fecha de la última
+compra de cada cliente y una única fecha de referencia (snapshot). Mover el
+snapshot es O(1); un lote nuevo solo modifica a los clientes que aparecen en
+él. Recency es una variable del clustering, así que cuando el lote mueve el
+snapshot se vuelve a asignar segmento a todos los clientes (una pasada
+vectorizada): así los que se quedan sin comprar también pasan a Inactivos.
+
+Uso:
+    python rfm_incremental.py ventas_del_dia.csv --estado estado_rfm.npz
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from almacen_segmentos import AlmacenSegmentos
+from cache_datos import huella_contenido
+from rankings import RankingsRFM
+from rfm import agregar_por_cliente, rfm_desde_agregados
+from segmentacion import RUTA_ARTEFACTO, asignar_segmentos, cargar_artefacto, guardar_resultados
+from transacciones import COLUMNAS, leer_transacciones, limpiar_transacciones
+
+RUTA_ESTADO = "estado_rfm.npz"
+
+
+class EstadoRFM:
+    """
+    Estado por cliente detrás de resultados_segmentacion.csv.
+
+    clientes: DataFrame indexado por CustomerID con UltimaCompra, Frequency,
+    Monetary y Cluster (-1 si no tiene segmento asignado).
+    """
+
+    def __init__(self, clientes, snapshot_date):
+        clientes = clientes.copy()
+        if "Cluster" not in clientes.columns:
+            clientes["Cluster"] = -1
+        self.clientes = clientes[["UltimaCompra", "Frequency", "Monetary", "Cluster"]]
+        self.snapshot_date = pd.Timestamp(snapshot_date)
+
+    @classmethod
+    def desde_rfm(cls, rfm, snapshot_date):
+        """Reconstruir el estado desde una tabla RFM (precisión de un día)"""
+        snapshot_date = pd.Timestamp(snapshot_date)
+        clientes = pd.DataFrame({
+            "UltimaCompra": snapshot_date - pd.to_timedelta(rfm["Recency"].to_numpy(), unit="D"),
+            "Frequency": rfm["Frequency"].to_numpy(dtype=np.int64),
+            "Monetary": rfm["Monetary"].to_numpy(dtype=np.float64),
+            "Cluster": rfm["Cluster"].to_numpy() if "Cluster" in rfm.columns else -1,
+        }, index=rfm.index)
+        return cls(clientes, snapshot_date)
+
+    def rfm(self):
+        """Tabla RFM al snapshot actual, con las columnas del notebook"""
+        tabla = rfm_desde_agregados(self.clientes, self.snapshot_date)
+        tabla["Cluster"] = self.clientes["Cluster"].to_numpy()
+        return tabla
+
+    def avanzar_snapshot(self, snapshot_date):
+        """Mover la fecha de referencia; Recency de todos cambia sin recorrer la tabla"""
+        self.snapshot_date = max(self.snapshot_date, pd.Timestamp(snapshot_date))
+
+    def actualizar(self, lineas, artefacto=None):
+        """
+        Incorporar un lote de transacciones nuevas (sin limpiar).
+
+        Se asume que las facturas del lote no estaban ya en el estado (p. ej.
+        las ventas de un día nuevo). Devuelve el índice de clientes tocados:
+        los del lote y, con artefacto, los que cambian de segmento.
+        """
+        lineas = limpiar_transacciones(lineas[[c for c in COLUMNAS if c in lineas.columns]])
+        if len(lineas) == 0:
+            return self.clientes.index[:0]
+        lineas["CustomerID"] = lineas["CustomerID"].astype(self.clientes.index.dtype)
+        parcial = agregar_por_cliente(lineas)
+
+        posiciones = self.clientes.index.get_indexer(parcial.index)
+        existentes = posiciones >= 0
+
+        # Clientes ya conocidos: solo se tocan sus filas
+        filas = posiciones[existentes]
+        previo = self.clientes.iloc[filas]
+        nuevos_valores = pd.DataFrame({
+            "UltimaCompra": np.maximum(
+                previo["UltimaCompra"].to_numpy(dtype="datetime64[ns]"),
+                parcial["UltimaCompra"].to_numpy(dtype="datetime64[ns]")[existentes],
+            ),
+            "Frequency": previo["Frequency"].to_numpy() + parcial["Frequency"].to_numpy()[existentes],
+            "Monetary": previo["Monetary"].to_numpy() + parcial["Monetary"].to_numpy()[existentes],
+        })
+        for columna in nuevos_valores.columns:
+            self.clientes.iloc[filas, self.clientes.columns.get_loc(columna)] = nuevos_valores[columna].to_numpy()
+
+        # Clientes nuevos: se añaden al final
+        if (~existentes).any():
+            altas = parcial[~existentes].copy()
+            altas["Cluster"] = -1
+            self.clientes = pd.concat([self.clientes, altas])
+
+        snapshot_anterior = self.snapshot_date
+        self.avanzar_snapshot(parcial["UltimaCompra"].max() + pd.Timedelta(days=1))
+
+        tocados = parcial.index
+        if artefacto is not None:
+            if self.snapshot_date != snapshot_anterior:
+                # Recency cambia para todos: se reasignan todos los segmentos
+                tocados = tocados.union(self.reasignar(artefacto), sort=False)
+            else:
+                self.reasignar(artefacto, tocados)
+        return tocados
+
+    def reasignar(self, artefacto, clientes=None):
+        """
+        Volver a asignar segmento a los clientes dados (o a todos). Devuelve
+        el índice de los que cambian de segmento.
+        """
+        if clientes is None:
+            filas = np.arange(len(self.clientes))
+        else:
+            filas = self.clientes.index.get_indexer(clientes)
+        parcial = rfm_desde_agregados(self.clientes.iloc[filas], self.snapshot_date)
+        columna = self.clientes.columns.get_loc("Cluster")
+        anteriores = self.clientes["Cluster"].to_numpy()[filas]
+        nuevos = asignar_segmentos(artefacto, parcial)
+        self.clientes.iloc[filas, columna] = nuevos
+        return self.clientes.index[filas[anteriores != nuevos]]
+
+    def guardar(self, ruta=RUTA_ESTADO):
+        """Guardar el estado en un .npz (escritura atómica)"""
+        meta = {"snapshot_date": self.snapshot_date.isoformat()}
+        ruta_tmp = f"{ruta}.tmp"
+        with open(ruta_tmp, "wb") as f:
+            np.savez(
+                f,
+                customer_id=self.clientes.index.to_numpy(),
+                ultima_compra=self.clientes["UltimaCompra"].to_numpy(dtype="datetime64[ns]"),
+                frequency=self.clientes["Frequency"].to_numpy(dtype=np.int64),
+                monetary=self.clientes["Monetary"].to_numpy(dtype=np.float64),
+                cluster=self.clientes["Cluster"].to_numpy(dtype=np.int64),
+                meta=np.array(json.dumps(meta)),
+            )
+        os.replace(ruta_tmp, ruta)
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_ESTADO):
+        with np.load(ruta, allow_pickle=False) as datos:
+            meta = json.loads(str(datos["meta"]))
+            clientes = pd.DataFrame({
+                "UltimaCompra": datos["ultima_compra"],
+                "Frequency": datos["frequency"],
+                "Monetary": datos["monetary"],
+                "Cluster": datos["cluster"],
+            }, index=pd.Index(datos["customer_id"], name="CustomerID"))
+        return cls(clientes, meta["snapshot_date"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualizar RFM con un lote de transacciones nuevas")
+    parser.add_argument("lote", help="Transacciones nuevas (CSV o Excel)")
+    parser.add_argument("--estado", default=RUTA_ESTADO)
+    parser.add_argument("--resultados", default="resultados_segmentacion.csv",
+                        help="Tabla RFM actual; se sobrescribe con la actualizada")
+    parser.add_argument("--snapshot-inicial", default=None,
+                        help="Snapshot de --resultados si todavía no existe --estado")
+    parser.add_argument("--artefacto", default=RUTA_ARTEFACTO)
+    parser.add_argument("--almacen", default=None,
+                        help="Directorio del histórico de segmentos donde guardar una foto")
+    parser.add_argument("--rankings", default=None,
+                        help="Rankings de clientes (.npz) a actualizar solo con los clientes tocados")
+    args = parser.parse_args()
+
+    if os.path.exists(args.estado):
+        estado = EstadoRFM.cargar(args.estado)
+    elif args.snapshot_inicial:
+        estado = EstadoRFM.desde_rfm(pd.read_csv(args.resultados, index_col=0), args.snapshot_inicial)
+    else:
+        parser.error("No existe el estado; indique --snapshot-inicial para crearlo desde --resultados")
+
+    # Los rankings guardados solo se actualizan si son del CSV que se va a reemplazar
+    rankings = None
+    if args.rankings and os.path.exists(args.rankings) and os.path.exists(args.resultados):
+        rankings = RankingsRFM.cargar(args.rankings, huella_contenido(args.resultados))
+
+    artefacto = cargar_artefacto(args.artefacto) if os.path.exists(args.artefacto) else None
+    tocados = estado.actualizar(leer_transacciones(args.lote), artefacto)
+
+    estado.guardar(args.estado)
+    rfm = estado.rfm()
+    guardar_resultados(rfm, args.resultados)
+    print(f"✅ {len(tocados):,} clientes actualizados o con segmento nuevo; snapshot: {estado.snapshot_date}")
+
+    if args.rankings:
+        if rankings is None:
+            rankings = RankingsRFM(rfm)
+            print("Rankings calculados desde la tabla completa")
+        else:
+            print(f"Rankings actualizados ({rankings.actualizar(rfm, tocados)} recalculados desde la tabla)")
+        rankings.guardar(args.rankings, huella_resultados=huella_contenido(args.resultados))
+        print(f"✅ Rankings guardados en: {args.rankings}")
+
+    if args.almacen:
+        version_modelo = artefacto["version_modelo"] if artefacto is not None else None
+        foto = AlmacenSegmentos(args.almacen).registrar(
+            rfm[rfm["Cluster"] >= 0], fecha=estado.snapshot_date, version_modelo=version_modelo
+        )
+        print(f"✅ Foto {foto['id']} guardada en: {args.almacen}")
+
+
+if __name__ == "__main__":
+    main()
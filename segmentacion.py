@@ -0,0 +1,153 @@
+"""
+Artefacto de segmentación: escalado + K-Means en un solo archivo .npz.
+
+El notebook exporta las medias/escalas del StandardScaler, los centroides
+del K-Means, el orden de las columnas y el segmento de cada centroide. La
+app y los scripts aplican el artefacto con NumPy (estandarizar y buscar el
+centroide más cercano) sin importar scikit-learn ni volver a ajustar el
+escalador.
+
+El segmento de cada centroide es estable entre entrenamientos (ver
+reentrenamiento.py); los artefactos anteriores, sin esa lista, usan el
+número de clúster como segmento.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from rfm import COLUMNAS_RFM
+
+RUTA_ARTEFACTO = "modelo_segmentacion.npz"
+RUTA_RESULTADOS = "resultados_segmentacion.csv"
+
+# Versión del formato del archivo (no del modelo entrenado)
+VERSION_ARTEFACTO = 1
+
+# Nombre de negocio de cada cluster (ver "Recomendaciones Estratégicas" en la app)
+NOMBRES_SEGMENTOS = {
+    0: "Clientes Inactivos",
+    1: "Clientes Leales",
+    2: "Clientes Nuevos/Potenciales",
+    3: "Clientes de Alto Valor",
+}
+# Los nombres se asignan por el perfil RFM de los centroides (ver reentrenamiento.py)
+SEGMENTOS_POR_NOMBRE = {nombre: segmento for segmento, nombre in NOMBRES_SEGMENTOS.items()}
+SEGMENTO_INACTIVOS = SEGMENTOS_POR_NOMBRE["Clientes Inactivos"]
+
+# Filas por bloque al asignar segmentos (acota la memoria intermedia)
+TAMANO_BLOQUE = 1_000_000
+
+
+def exportar_artefacto(scaler, kmeans, ruta=RUTA_ARTEFACTO, columnas=None, version_modelo=None,
+                       segmentos=None, version_anterior=None):
+    """
+    Guardar scaler + centroides + orden de columnas en un único .npz.
+    `segmentos[i]` es el segmento del centroide i (por defecto, i).
+    """
+    if columnas is None:
+        columnas = list(getattr(scaler, "feature_names_in_", COLUMNAS_RFM))
+    if version_modelo is None:
+        version_modelo = pd.Timestamp.now().strftime("%Y%m%d%H%M%S")
+
+    meta = {
+        "version_artefacto": VERSION_ARTEFACTO,
+        "version_modelo": str(version_modelo),
+        "columnas": [str(c) for c in columnas],
+        "n_clusters": int(kmeans.cluster_centers_.shape[0]),
+        "segmentos": [int(s) for s in (segmentos if segmentos is not None
+                                       else range(kmeans.cluster_centers_.shape[0]))],
+        "version_anterior": version_anterior,
+        "iteraciones": int(getattr(kmeans, "n_iter_", 0)) or None,
+    }
+    ruta_tmp = f"{ruta}.tmp"
+    with open(ruta_tmp, "wb") as f:
+        np.savez(
+            f,
+            medias=np.asarray(scaler.mean_, dtype=np.float64),
+            escalas=np.asarray(scaler.scale_, dtype=np.float64),
+            centroides=np.asarray(kmeans.cluster_centers_, dtype=np.float64),
+            meta=np.array(json.dumps(meta)),
+        )
+    os.replace(ruta_tmp, ruta)
+    return ruta
+
+
+def guardar_segmentos(ruta, segmentos):
+    """Reescribir el segmento de cada centroide de un artefacto, sin tocar el modelo (escritura atómica)"""
+    with np.load(ruta, allow_pickle=False) as datos:
+        arrays = {clave: datos[clave] for clave in datos.files}
+    meta = json.loads(str(arrays["meta"]))
+    meta["segmentos"] = [int(s) for s in segmentos]
+    arrays["meta"] = np.array(json.dumps(meta))
+    ruta_tmp = f"{ruta}.tmp"
+    with open(ruta_tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(ruta_tmp, ruta)
+    return ruta
+
+
+def guardar_resultados(rfm, ruta=RUTA_RESULTADOS):
+    """
+    Escribir la tabla RFM con Cluster como CSV (escritura atómica: la app
+    recarga el archivo al cambiar y nunca debe leerlo a medias).
+    """
+    ruta_tmp = f"{ruta}.tmp"
+    rfm.to_csv(ruta_tmp)
+    os.replace(ruta_tmp, ruta)
+    return ruta
+
+
+def cargar_artefacto(ruta=RUTA_ARTEFACTO):
+    """Leer el artefacto y precalcular la forma fusionada del scoring"""
+    with np.load(ruta, allow_pickle=False) as datos:
+        meta = json.loads(str(datos["meta"]))
+        if meta.get("version_artefacto") != VERSION_ARTEFACTO:
+            raise ValueError(
+                f"Versión de artefacto no soportada: {meta.get('version_artefacto')}"
+            )
+        medias = datos["medias"]
+        escalas = datos["escalas"]
+        centroides = datos["centroides"]
+
+    # ||z - c||² con z = (x - medias) / escalas, sin el término ||z||² que no
+    # cambia el argmin: x @ pesos + sesgo
+    inv = 1.0 / escalas
+    pesos = -2.0 * (centroides * inv).T
+    sesgo = 2.0 * (medias * inv) @ centroides.T + (centroides ** 2).sum(axis=1)
+    segmentos = np.asarray(meta.get("segmentos", range(len(centroides))), dtype=np.int32)
+
+    return {
+        **meta,
+        "segmentos": segmentos,
+        "medias": medias,
+        "escalas": escalas,
+        "centroides": centroides,
+        "pesos": pesos,
+        "sesgo": sesgo,
+    }
+
+
+def matriz_caracteristicas(artefacto, datos):
+    """Extraer las columnas en el orden del artefacto como float64"""
+    if isinstance(datos, pd.DataFrame):
+        datos = datos[artefacto["columnas"]]
+    return np.asarray(datos, dtype=np.float64)
+
+
+def escalar(artefacto, datos):
+    """Aplicar la estandarización guardada (equivalente a scaler.transform)"""
+    x = matriz_caracteristicas(artefacto, datos)
+    return (x - artefacto["medias"]) / artefacto["escalas"]
+
+
+def asignar_segmentos(artefacto, datos):
+    """Segmento del centroide más cercano a cada fila (scaler + kmeans.predict)"""
+    x = matriz_caracteristicas(artefacto, datos)
+    etiquetas = np.empty(len(x), dtype=np.int32)
+    for inicio in range(0, len(x), TAMANO_BLOQUE):
+        bloque = x[inicio:inicio + TAMANO_BLOQUE]
+        distancias = bloque @ artefacto["pesos"] + artefacto["sesgo"]
+        etiquetas[inicio:inicio + TAMANO_BLOQUE] = artefacto["segmentos"][distancias.argmin(axis=1)]
+    return etiquetas
@@ -0,0 +1,207 @@
+"""
+Asignación de segmentos por lotes, sin Streamlit ni Jupyter.
+
+Lee una tabla de clientes con Recency, Frequency y Monetary (CSV o Parquet),
+aplica el artefacto de segmentación (scaler + centroides del modelo
+entrenado, ver segmentacion.py) y escribe las mismas filas con la columna
+Cluster añadida (o reemplazada, si la entrada ya la tenía). El archivo se reparte en bloques: cada proceso lee, asigna
+y formatea su bloque y el proceso principal solo escribe los resultados en
+orden, con un número acotado de bloques en vuelo.
+
+Con --transacciones la entrada es un log de transacciones: primero se
+reduce a RFM por cliente con rfm_bloques y después se asignan segmentos.
+
+Los CSV se parten por bytes en saltos de línea, así que no pueden tener
+campos entre comillas con saltos de línea dentro (no es el caso de las
+exportaciones RFM).
+
+Uso:
+    python segmentar_lote.py clientes.csv --salida clientes_segmentados.csv --procesos 4
+    python segmentar_lote.py transacciones.csv --transacciones --salida resultados_segmentacion.csv
+"""
+import argparse
+import io
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import pandas as pd
+
+from segmentacion import RUTA_ARTEFACTO, asignar_segmentos, cargar_artefacto, guardar_resultados
+
+MB_POR_BLOQUE = 32
+
+# Artefacto de cada proceso (se carga una vez en el inicializador)
+_artefacto = None
+
+
+def _inicializar(ruta_artefacto):
+    global _artefacto
+    _artefacto = cargar_artefacto(ruta_artefacto)
+
+
+def rangos_csv(ruta, bytes_por_bloque):
+    """Encabezado y rangos (inicio, fin) de bytes que empiezan y acaban en salto de línea"""
+    rangos = []
+    with open(ruta, "rb") as f:
+        encabezado = f.readline()
+        tamano = os.fstat(f.fileno()).st_size
+        inicio = f.tell()
+        while inicio < tamano:
+            f.seek(min(inicio + bytes_por_bloque, tamano))
+            f.readline()
+            fin = f.tell()
+            rangos.append((inicio, fin))
+            inicio = fin
+    return encabezado, rangos
+
+
+def _segmentar_rango_csv(ruta, encabezado, inicio, fin, reemplazar=False):
+    """Leer un rango del CSV y devolver sus líneas con ',Cluster' añadido (o reemplazado)"""
+    with open(ruta, "rb") as f:
+        f.seek(inicio)
+        datos = f.read(fin - inicio)
+    lineas = [linea for linea in datos.splitlines() if linea.strip()]
+    if not lineas:
+        return 0, b""
+
+    datos = io.BytesIO(encabezado.rstrip(b"\r\n") + b"\n" + b"\n".join(lineas))
+    if reemplazar:
+        # Todas las columnas como texto: se reescriben tal cual salvo Cluster
+        bloque = pd.read_csv(datos, dtype=str, keep_default_na=False)
+        bloque["Cluster"] = asignar_segmentos(_artefacto, bloque)
+        return len(bloque), bloque.to_csv(index=False, header=False, lineterminator="\n").encode()
+
+    bloque = pd.read_csv(datos, usecols=_artefacto["columnas"])
+    etiquetas = asignar_segmentos(_artefacto, bloque)
+    # Se conservan las líneas originales tal cual (IDs y decimales sin reformatear)
+    salida = b"".join(
+        linea + b"," + str(etiqueta).encode() + b"\n"
+        for linea, etiqueta in zip(lineas, etiquetas.tolist())
+    )
+    return len(lineas), salida
+
+
+def _segmentar_grupo_parquet(ruta, grupo):
+    """Leer un row group del Parquet y devolverlo con la columna Cluster"""
+    import pyarrow.parquet as pq
+
+    bloque = pq.ParquetFile(ruta).read_row_group(grupo).to_pandas()
+    bloque["Cluster"] = asignar_segmentos(_artefacto, bloque)
+    return len(bloque), bloque
+
+
+def _en_orden(pool, funcion, tareas, max_pendientes):
+    """Resultados de las tareas en su orden, con como mucho max_pendientes en vuelo"""
+    if pool is None:
+        for tarea in tareas:
+            yield funcion(*tarea)
+        return
+    pendientes = deque()
+    for tarea in tareas:
+        pendientes.append(pool.apply_async(funcion, tarea))
+        if len(pendientes) >= max_pendientes:
+            yield pendientes.popleft().get()
+    while pendientes:
+        yield pendientes.popleft().get()
+
+
+def segmentar_archivo(entrada, salida, ruta_artefacto=RUTA_ARTEFACTO, procesos=None,
+                      mb_por_bloque=MB_POR_BLOQUE):
+    """
+    Escribir `salida` con las filas de `entrada` y su Cluster.
+
+    Entrada CSV -> salida CSV; entrada Parquet -> salida Parquet o CSV.
+    Devuelve el número de filas escritas.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    es_parquet = entrada.lower().endswith(".parquet")
+    salida_parquet = salida.lower().endswith(".parquet")
+    if salida_parquet and not es_parquet:
+        raise ValueError("Para escribir Parquet la entrada también debe ser Parquet")
+
+    if es_parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tareas = [(entrada, grupo) for grupo in range(pq.ParquetFile(entrada).num_row_groups)]
+        funcion = _segmentar_grupo_parquet
+    else:
+        encabezado, rangos = rangos_csv(entrada, mb_por_bloque * 1024 * 1024)
+        # Una entrada ya segmentada (p. ej. resultados_segmentacion.csv) conserva su columna Cluster
+        reemplazar = "Cluster" in pd.read_csv(io.BytesIO(encabezado), nrows=0).columns
+        tareas = [(entrada, encabezado, inicio, fin, reemplazar) for inicio, fin in rangos]
+        funcion = _segmentar_rango_csv
+
+    if procesos > 1 and len(tareas) > 1:
+        pool = Pool(procesos, initializer=_inicializar, initargs=(ruta_artefacto,))
+    else:
+        pool = None
+        _inicializar(ruta_artefacto)
+
+    total = 0
+    ruta_tmp = f"{salida}.tmp"
+    escritor = None
+    try:
+        with open(ruta_tmp, "wb") as f:
+            if not es_parquet:
+                f.write(encabezado.rstrip(b"\r\n") + (b"\n" if reemplazar else b",Cluster\n"))
+            for i, (n, resultado) in enumerate(_en_orden(pool, funcion, tareas, 2 * procesos)):
+                total += n
+                if not es_parquet:
+                    f.write(resultado)
+                elif salida_parquet:
+                    tabla = pa.Table.from_pandas(resultado, preserve_index=False)
+                    if escritor is None:
+                        escritor = pq.ParquetWriter(f, tabla.schema)
+                    escritor.write_table(tabla)
+                else:
+                    f.write(resultado.to_csv(index=False, header=i == 0).encode())
+            if escritor is not None:
+                escritor.close()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    os.replace(ruta_tmp, salida)
+    return total
+
+
+def segmentar_transacciones(entrada, salida, ruta_artefacto=RUTA_ARTEFACTO):
+    """RFM por bloques desde transacciones + Cluster; devuelve el número de clientes"""
+    from rfm_bloques import calcular_rfm_por_bloques
+
+    rfm = calcular_rfm_por_bloques(entrada)
+    rfm["Cluster"] = asignar_segmentos(cargar_artefacto(ruta_artefacto), rfm)
+    guardar_resultados(rfm, salida)
+    return len(rfm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asignar segmentos a clientes por lotes")
+    parser.add_argument("entrada", help="Clientes con Recency, Frequency, Monetary (CSV o Parquet)")
+    parser.add_argument("--salida", required=True, help="CSV o Parquet de salida")
+    parser.add_argument("--artefacto", default=RUTA_ARTEFACTO)
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--mb-por-bloque", type=int, default=MB_POR_BLOQUE,
+                        help="Tamaño de cada bloque de CSV en MB")
+    parser.add_argument("--transacciones", action="store_true",
+                        help="La entrada es un log de transacciones (se calcula el RFM antes)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    if args.transacciones:
+        filas = segmentar_transacciones(args.entrada, args.salida, args.artefacto)
+    else:
+        filas = segmentar_archivo(args.entrada, args.salida, args.artefacto,
+                                  procesos=args.procesos, mb_por_bloque=args.mb_por_bloque)
+    segundos = time.perf_counter() - inicio
+
+    print(f"✅ {filas:,} clientes segmentados en: {args.salida}")
+    print(f"Tiempo: {segundos:.2f} s ({filas / max(segundos, 1e-9):,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
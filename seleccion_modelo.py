@@ -0,0 +1,84 @@
+"""
+Selección del número de clústeres (método del codo + silhouette).
+
+Cada k se ajusta una sola vez y los distintos k se reparten en un pool de
+procesos. El silhouette se calcula sobre una muestra estratificada por
+clúster para evitar el coste O(n²) sobre toda la base de clientes.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Clientes usados para el silhouette (None = todos)
+TAMANO_MUESTRA = 10_000
+
+
+def muestra_estratificada(etiquetas, tamano, random_state=42):
+    """Índices de una muestra con la misma proporción de cada clúster"""
+    n = len(etiquetas)
+    if tamano is None or tamano >= n:
+        return np.arange(n)
+
+    rng = np.random.default_rng(random_state)
+    fraccion = tamano / n
+    indices = []
+    for etiqueta in np.unique(etiquetas):
+        miembros = np.flatnonzero(etiquetas == etiqueta)
+        # Al menos 2 por clúster para que el silhouette esté definido
+        cantidad = min(len(miembros), max(2, int(round(len(miembros) * fraccion))))
+        indices.append(rng.choice(miembros, size=cantidad, replace=False))
+    return np.sort(np.concatenate(indices))
+
+
+def _evaluar_un_k(x, k, tamano_muestra, random_state):
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import calinski_harabasz_score, silhouette_score
+
+    inicio = time.perf_counter()
+    kmeans = KMeans(n_clusters=k, random_state=random_state)
+    etiquetas = kmeans.fit_predict(x)
+    segundos_ajuste = time.perf_counter() - inicio
+
+    muestra = muestra_estratificada(etiquetas, tamano_muestra, random_state)
+    inicio = time.perf_counter()
+    silhouette = silhouette_score(x[muestra], etiquetas[muestra])
+    segundos_silhouette = time.perf_counter() - inicio
+
+    return {
+        "k": k,
+        "Inercia": kmeans.inertia_,
+        "Silhouette": silhouette,
+        "CalinskiHarabasz": calinski_harabasz_score(x, etiquetas),
+        "Iteraciones": kmeans.n_iter_,
+        "SegundosAjuste": segundos_ajuste,
+        "SegundosSilhouette": segundos_silhouette,
+    }
+
+
+def evaluar_k(x, ks=range(2, 10), n_procesos=None, tamano_muestra=TAMANO_MUESTRA,
+              random_state=42):
+    """
+    Ajustar K-Means para cada k y devolver una tabla de métricas.
+
+    x son los datos ya escalados. n_procesos=None usa un proceso por núcleo
+    (hasta len(ks)); n_procesos=1 evalúa en serie en el proceso actual.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    ks = list(ks)
+    if n_procesos is None:
+        n_procesos = min(len(ks), os.cpu_count() or 1)
+
+    if n_procesos <= 1:
+        filas = [_evaluar_un_k(x, k, tamano_muestra, random_state) for k in ks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_procesos) as pool:
+            futuros = [
+                pool.submit(_evaluar_un_k, x, k, tamano_muestra, random_state)
+                for k in ks
+            ]
+            filas = [f.result() for f in futuros]
+
+    return pd.DataFrame(filas).set_index("k")
@@ -0,0 +1,356 @@
+"""
+Servidor HTTP local para consultar segmentos sin pasar por Streamlit.
+
+Carga una vez el artefacto de segmentación (scaler + centroides del modelo
+entrenado) y la tabla resultados_segmentacion.csv con un índice por
+CustomerID. Las peticiones de una sola fila que llegan a la vez se agrupan
+en micro-lotes y se asignan con un único cálculo vectorizado del centroide
+más cercano.
+
+Endpoints:
+    GET  /segmento?customer_id=12346      segmento precalculado del cliente
+    POST /segmento  {"Recency": 10, "Frequency": 3, "Monetary": 250.5}
+                    (o una lista de objetos así)
+    GET  /metricas                         contadores de latencia y rendimiento
+    GET  /salud
+
+Uso:
+    python servidor_segmentos.py --puerto 8502
+    python servidor_segmentos.py --prueba-carga http://127.0.0.1:8502 --solicitudes 5000
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from busqueda import IndiceClientes
+from esquemas import tipar_rfm
+from segmentacion import (RUTA_ARTEFACTO, RUTA_RESULTADOS, asignar_segmentos,
+                          cargar_artefacto)
+
+PUERTO = 8502
+
+# Micro-lotes: como mucho MAX_LOTE filas o ESPERA_MAX_MS desde la primera
+MAX_LOTE = 512
+ESPERA_MAX_MS = 2.0
+
+# Latencias guardadas para los percentiles de /metricas
+VENTANA_LATENCIAS = 10_000
+
+
+def validar_fila(fila, n_columnas):
+    """Fila como vector float64 de n_columnas valores finitos; ValueError si no lo es"""
+    try:
+        x = np.asarray(fila, dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"valores no numéricos: {fila!r}") from e
+    if x.shape != (n_columnas,):
+        raise ValueError(f"se esperaban {n_columnas} valores: {fila!r}")
+    if not np.isfinite(x).all():
+        raise ValueError(f"valores no finitos: {fila!r}")
+    return x
+
+
+class AgrupadorLotes:
+    """Junta filas de peticiones concurrentes y las asigna de una vez"""
+
+    def __init__(self, artefacto, max_lote=MAX_LOTE, espera_max_ms=ESPERA_MAX_MS):
+        self.artefacto = artefacto
+        self.max_lote = max_lote
+        self.espera_max = espera_max_ms / 1000
+        self.lotes = 0
+        self.filas = 0
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._procesar, name="micro-lotes", daemon=True)
+        self._hilo.start()
+
+    def asignar(self, fila):
+        """Segmento de una fila [Recency, Frequency, Monetary] (bloquea hasta tenerlo)"""
+        # Se valida antes de encolar: una fila inválida solo falla su propia petición
+        x = validar_fila(fila, len(self.artefacto["columnas"]))
+        futuro = Future()
+        self._cola.put((x, futuro))
+        return futuro.result()
+
+    def _procesar(self):
+        while True:
+            pendientes = [self._cola.get()]
+            limite = time.perf_counter() + self.espera_max
+            while len(pendientes) < self.max_lote:
+                restante = limite - time.perf_counter()
+                try:
+                    # Pasado el plazo solo se recogen las filas que ya esperan
+                    if restante > 0:
+                        pendientes.append(self._cola.get(timeout=restante))
+                    else:
+                        pendientes.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                x = np.stack([fila for fila, _ in pendientes])
+                etiquetas = asignar_segmentos(self.artefacto, x).tolist()
+            except Exception as e:
+                # Último recurso: las filas ya llegan validadas
+                for _, futuro in pendientes:
+                    futuro.set_exception(e)
+                continue
+            self.lotes += 1
+            self.filas += len(pendientes)
+            for (_, futuro), etiqueta in zip(pendientes, etiquetas):
+                futuro.set_result(etiqueta)
+
+
+class Contadores:
+    """Peticiones, errores y latencias por endpoint"""
+
+    def __init__(self):
+        self.inicio = time.time()
+        self.solicitudes = {}
+        self.errores = 0
+        self._latencias = deque(maxlen=VENTANA_LATENCIAS)
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint, segundos, error=False):
+        with self._lock:
+            self.solicitudes[endpoint] = self.solicitudes.get(endpoint, 0) + 1
+            self.errores += int(error)
+            self._latencias.append(segundos)
+
+    def resumen(self):
+        with self._lock:
+            latencias = np.array(self._latencias)
+            solicitudes = dict(self.solicitudes)
+            errores = self.errores
+        total = sum(solicitudes.values())
+        segundos = time.time() - self.inicio
+        resumen = {
+            "solicitudes": solicitudes,
+            "total_solicitudes": total,
+            "errores": errores,
+            "segundos_activo": round(segundos, 1),
+            "solicitudes_por_segundo": round(total / max(segundos, 1e-9), 1),
+        }
+        if len(latencias):
+            p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+            resumen["latencia_ms"] = {"p50": round(p50, 3), "p95": round(p95, 3),
+                                      "p99": round(p99, 3), "max": round(latencias.max() * 1000, 3)}
+        return resumen
+
+
+class ServicioSegmentos:
+    """Estado compartido por todas las peticiones del servidor"""
+
+    def __init__(self, ruta_artefacto=RUTA_ARTEFACTO, ruta_resultados=RUTA_RESULTADOS,
+                 max_lote=MAX_LOTE, espera_max_ms=ESPERA_MAX_MS):
+        self.artefacto = cargar_artefacto(ruta_artefacto)
+        self.columnas = self.artefacto["columnas"]
+        self.agrupador = AgrupadorLotes(self.artefacto, max_lote, espera_max_ms)
+        self.contadores = Contadores()
+
+        self.rfm = None
+        self.indice = None
+        if ruta_resultados and os.path.exists(ruta_resultados):
+            self.rfm = tipar_rfm(pd.read_csv(ruta_resultados, index_col=0))
+            self.indice = IndiceClientes(self.rfm.index)
+
+    def buscar_cliente(self, customer_id):
+        """Fila precalculada del cliente como dict, o None si no existe"""
+        if self.indice is None:
+            return None
+        posicion = self.indice.posicion(customer_id)
+        if posicion is None:
+            return None
+        fila = self.rfm.iloc[posicion]
+        respuesta = {"CustomerID": int(self.rfm.index[posicion])}
+        for columna, valor in fila.items():
+            respuesta[columna] = int(valor) if columna in ("Recency", "Frequency", "Cluster") else float(valor)
+        return respuesta
+
+    def asignar(self, datos):
+        """Segmento de un objeto RFM, o lista de segmentos para una lista de objetos"""
+        if isinstance(datos, list):
+            # Las listas ya vienen en lote: se asignan directamente
+            filas = [validar_fila([objeto[c] for c in self.columnas], len(self.columnas)) for objeto in datos]
+            x = np.stack(filas) if filas else np.empty((0, len(self.columnas)))
+            return asignar_segmentos(self.artefacto, x).tolist()
+        return self.agrupador.asignar([datos[c] for c in self.columnas])
+
+    def metricas(self):
+        resumen = self.contadores.resumen()
+        resumen["micro_lotes"] = {
+            "lotes": self.agrupador.lotes,
+            "filas": self.agrupador.filas,
+            "filas_por_lote": round(self.agrupador.filas / max(self.agrupador.lotes, 1), 2),
+        }
+        resumen["clientes_indexados"] = 0 if self.indice is None else len(self.indice)
+        return resumen
+
+
+class ManejadorSegmentos(BaseHTTPRequestHandler):
+    # Conexiones persistentes: el cliente puede reutilizar el socket
+    protocol_version = "HTTP/1.1"
+    # Cabeceras y cuerpo van en escrituras separadas: sin Nagle no hay 40 ms de ACK retardado
+    disable_nagle_algorithm = True
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _atender(self, endpoint, manejar):
+        servicio = self.server.servicio
+        inicio = time.perf_counter()
+        try:
+            estado, cuerpo = manejar(servicio)
+        except (KeyError, TypeError, ValueError) as e:
+            estado, cuerpo = 400, {"error": f"Petición no válida: {e}"}
+        self._responder(estado, cuerpo)
+        if endpoint != "/metricas":
+            servicio.contadores.registrar(endpoint, time.perf_counter() - inicio, error=estado >= 400)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/segmento":
+            def manejar(servicio):
+                customer_id = parse_qs(url.query)["customer_id"][0]
+                cliente = servicio.buscar_cliente(customer_id)
+                if cliente is None:
+                    return 404, {"error": f"Cliente no encontrado: {customer_id}"}
+                return 200, cliente
+        elif url.path == "/metricas":
+            def manejar(servicio):
+                return 200, servicio.metricas()
+        elif url.path == "/salud":
+            def manejar(servicio):
+                return 200, {"estado": "ok", "version_modelo": servicio.artefacto.get("version_modelo")}
+        else:
+            def manejar(servicio):
+                return 404, {"error": f"Ruta desconocida: {url.path}"}
+        self._atender(url.path, manejar)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path == "/segmento":
+            def manejar(servicio):
+                datos = json.loads(cuerpo)
+                return 200, {"Cluster": servicio.asignar(datos)}
+        else:
+            def manejar(servicio):
+                return 404, {"error": f"Ruta desconocida: {url.path}"}
+        self._atender(url.path, manejar)
+
+
+class ServidorSegmentos(ThreadingHTTPServer):
+    daemon_threads = True
+    # La cola por defecto (5) rechaza conexiones cuando muchos clientes conectan a la vez
+    request_queue_size = 128
+
+
+def crear_servidor(servicio, host="127.0.0.1", puerto=PUERTO):
+    servidor = ServidorSegmentos((host, puerto), ManejadorSegmentos)
+    servidor.servicio = servicio
+    return servidor
+
+
+def prueba_de_carga(url, solicitudes=5000, concurrencia=32, customer_ids=None, semilla=42):
+    """
+    Cliente local: lanza peticiones POST de una fila (y GET por CustomerID si
+    se pasan IDs) desde `concurrencia` hilos con conexiones persistentes.
+    """
+    destino = urlsplit(url)
+    rng = np.random.default_rng(semilla)
+    vectores = np.column_stack([
+        rng.integers(1, 370, solicitudes),
+        rng.integers(1, 50, solicitudes),
+        np.round(rng.exponential(2000, solicitudes), 2),
+    ])
+    local = threading.local()
+
+    def enviar(i):
+        if not hasattr(local, "conexion"):
+            local.conexion = http.client.HTTPConnection(destino.hostname, destino.port)
+        inicio = time.perf_counter()
+        if customer_ids is not None and i % 2:
+            local.conexion.request("GET", f"/segmento?customer_id={customer_ids[i % len(customer_ids)]}")
+        else:
+            r, f, m = vectores[i]
+            cuerpo = json.dumps({"Recency": int(r), "Frequency": int(f), "Monetary": float(m)})
+            local.conexion.request("POST", "/segmento", body=cuerpo,
+                                   headers={"Content-Type": "application/json"})
+        respuesta = local.conexion.getresponse()
+        respuesta.read()
+        return time.perf_counter() - inicio, respuesta.status
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as ejecutor:
+        resultados = list(ejecutor.map(enviar, range(solicitudes)))
+    segundos = time.perf_counter() - inicio
+
+    latencias = np.array([r[0] for r in resultados]) * 1000
+    return {
+        "solicitudes": solicitudes,
+        "concurrencia": concurrencia,
+        "errores": sum(1 for r in resultados if r[1] >= 400),
+        "segundos": round(segundos, 3),
+        "solicitudes_por_segundo": round(solicitudes / segundos, 1),
+        "latencia_ms_p50": round(float(np.percentile(latencias, 50)), 3),
+        "latencia_ms_p95": round(float(np.percentile(latencias, 95)), 3),
+        "latencia_ms_p99": round(float(np.percentile(latencias, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP local de segmentos RFM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--artefacto", default=RUTA_ARTEFACTO)
+    parser.add_argument("--resultados", default=RUTA_RESULTADOS)
+    parser.add_argument("--max-lote", type=int, default=MAX_LOTE)
+    parser.add_argument("--espera-max-ms", type=float, default=ESPERA_MAX_MS)
+    parser.add_argument("--prueba-carga", metavar="URL",
+                        help="En vez de servir, lanzar una prueba de carga contra URL")
+    parser.add_argument("--solicitudes", type=int, default=5000)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.prueba_carga:
+        ids = None
+        if os.path.exists(args.resultados):
+            ids = pd.read_csv(args.resultados, index_col=0).index.astype(np.int64).tolist()
+        reporte = prueba_de_carga(args.prueba_carga, args.solicitudes, args.concurrencia, ids)
+        print(json.dumps(reporte, indent=2))
+        return
+
+    servicio = ServicioSegmentos(args.artefacto, args.resultados,
+                                 args.max_lote, args.espera_max_ms)
+    servidor = crear_servidor(servicio, args.host, args.puerto)
+    print(f"✅ Sirviendo segmentos en http://{args.host}:{args.puerto} "
+          f"({servicio.metricas()['clientes_indexados']:,} clientes indexados)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
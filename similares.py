@@ -0,0 +1,250 @@
+"""
+Clientes similares: vecinos más cercanos en el espacio RFM escalado.
+
+Se construye un KD-tree sobre las mismas variables estandarizadas que usa el
+K-Means (medias/escalas del artefacto de segmentación) una vez por versión de
+los datos, y se guarda como .npz junto a modelo_kmeans.pkl. El árbol son solo
+arrays de NumPy: los puntos reordenados para que cada nodo ocupe un rango
+contiguo y, por nodo, el plano de corte (dimensión y valor) y sus hijos. Una
+consulta baja primero por el lado del punto y solo cruza un plano si está más
+cerca que el k-ésimo vecino encontrado, así que se miran unas pocas hojas
+aunque haya millones de clientes.
+
+Uso:
+    python similares.py resultados_segmentacion.csv --salida indice_similares.npz
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from esquemas import tipar_rfm
+from rfm import COLUMNAS_RFM
+from segmentacion import RUTA_ARTEFACTO, cargar_artefacto, escalar
+
+RUTA_INDICE_SIMILARES = "indice_similares.npz"
+
+# Versión del formato del archivo
+VERSION_INDICE = 1
+
+# Puntos por hoja: hojas más grandes = menos nodos, más distancias por hoja
+TAMANO_HOJA = 64
+
+K_SIMILARES = 5
+
+
+def version_rfm(rfm):
+    """Huella del contenido de la tabla RFM tipada (clave del índice)"""
+    return format(int(pd.util.hash_pandas_object(rfm).sum()), "x")
+
+
+class IndiceSimilares:
+    """KD-tree en arrays sobre el RFM escalado, con los CustomerID de cada punto"""
+
+    def __init__(self, puntos, ids, tamano_hoja=TAMANO_HOJA, meta=None):
+        puntos = np.ascontiguousarray(puntos, dtype=np.float64)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.tamano_hoja = int(tamano_hoja)
+        self.meta = dict(meta or {})
+        if len(puntos):
+            self._construir(puntos)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _construir(self, puntos):
+        n = len(puntos)
+        orden = np.arange(n)
+        inicios, fines, dimensiones, cortes, izquierdos, derechos = [], [], [], [], [], []
+
+        def nuevo_nodo(inicio, fin):
+            inicios.append(inicio)
+            fines.append(fin)
+            dimensiones.append(0)
+            cortes.append(0.0)
+            izquierdos.append(-1)
+            derechos.append(-1)
+            return len(inicios) - 1
+
+        pila = [(nuevo_nodo(0, n), 0, n)]
+        while pila:
+            nodo, inicio, fin = pila.pop()
+            if fin - inicio <= self.tamano_hoja:
+                continue
+            # Corte por la mediana de la dimensión con más rango
+            bloque = puntos[orden[inicio:fin]]
+            dimension = int(np.argmax(bloque.max(axis=0) - bloque.min(axis=0)))
+            medio = (fin - inicio) // 2
+            particion = np.argpartition(bloque[:, dimension], medio)
+            orden[inicio:fin] = orden[inicio:fin][particion]
+            dimensiones[nodo] = dimension
+            cortes[nodo] = float(bloque[particion[medio], dimension])
+            izquierdos[nodo] = nuevo_nodo(inicio, inicio + medio)
+            derechos[nodo] = nuevo_nodo(inicio + medio, fin)
+            pila.append((izquierdos[nodo], inicio, inicio + medio))
+            pila.append((derechos[nodo], inicio + medio, fin))
+
+        self.posiciones = orden.astype(np.int32 if n < 2**31 else np.int64)
+        self.puntos = puntos[orden]
+        self.inicios = np.array(inicios, dtype=np.int64)
+        self.fines = np.array(fines, dtype=np.int64)
+        self.dimensiones = np.array(dimensiones, dtype=np.int8)
+        self.cortes = np.array(cortes, dtype=np.float64)
+        self.izquierdos = np.array(izquierdos, dtype=np.int32)
+        self.derechos = np.array(derechos, dtype=np.int32)
+        self._preparar_consultas()
+
+    def _preparar_consultas(self):
+        # Recorrer el árbol con listas de Python es más rápido que indexar arrays nodo a nodo
+        self._nodos = list(zip(
+            self.inicios.tolist(), self.fines.tolist(), self.dimensiones.tolist(),
+            self.cortes.tolist(), self.izquierdos.tolist(), self.derechos.tolist(),
+        ))
+        # Fila de la tabla RFM -> lugar del punto en el árbol
+        self._lugares = np.empty_like(self.posiciones)
+        self._lugares[self.posiciones] = np.arange(len(self.posiciones), dtype=self.posiciones.dtype)
+
+    def punto(self, posicion):
+        """Coordenadas escaladas de la fila `posicion` de la tabla RFM"""
+        return self.puntos[self._lugares[posicion]]
+
+    def vecinos_de(self, posicion, k=K_SIMILARES):
+        """Los k clientes más parecidos a la fila `posicion` (sin ella misma)"""
+        return self.consultar(self.punto(posicion), k, excluir=posicion)
+
+    def consultar(self, punto, k=K_SIMILARES, excluir=None):
+        """
+        Posiciones (filas de la tabla RFM) y distancias de los k puntos más
+        cercanos, de menor a mayor distancia. `excluir` es una posición a
+        ignorar (el propio cliente).
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        punto = np.asarray(punto, dtype=np.float64)
+        coordenadas = punto.tolist()
+        pedidos = k + (excluir is not None)
+        mejores_d = np.empty(0)
+        mejores_p = np.empty(0, dtype=np.int64)
+        limite = np.inf
+
+        # (nodo, distancia mínima al cuadrado desde el punto hasta su región)
+        pila = [(0, 0.0)]
+        while pila:
+            nodo, minima = pila.pop()
+            if minima > limite:
+                continue
+            inicio, fin, dimension, corte, izquierdo, derecho = self._nodos[nodo]
+            if izquierdo < 0:
+                diferencias = self.puntos[inicio:fin] - punto
+                distancias = np.einsum("ij,ij->i", diferencias, diferencias)
+                mejores_d = np.concatenate([mejores_d, distancias])
+                mejores_p = np.concatenate([mejores_p, self.posiciones[inicio:fin]])
+                if len(mejores_d) > pedidos:
+                    seleccion = np.argpartition(mejores_d, pedidos - 1)[:pedidos]
+                    mejores_d = mejores_d[seleccion]
+                    mejores_p = mejores_p[seleccion]
+                if len(mejores_d) == pedidos:
+                    limite = float(mejores_d.max())
+                continue
+            # Primero el lado del punto; el otro solo si el plano está más cerca que el límite
+            diferencia = coordenadas[dimension] - corte
+            if diferencia < 0:
+                cerca, lejos = izquierdo, derecho
+            else:
+                cerca, lejos = derecho, izquierdo
+            pila.append((lejos, max(minima, diferencia * diferencia)))
+            pila.append((cerca, minima))
+
+        orden = np.argsort(mejores_d, kind="stable")
+        posiciones, distancias = mejores_p[orden].astype(np.int64), mejores_d[orden]
+        if excluir is not None:
+            conservar = posiciones != excluir
+            posiciones, distancias = posiciones[conservar], distancias[conservar]
+        return posiciones[:k], np.sqrt(distancias[:k])
+
+    def guardar(self, ruta=RUTA_INDICE_SIMILARES):
+        """Escribir el índice en un .npz (escritura atómica)"""
+        meta = {**self.meta, "version_indice": VERSION_INDICE, "tamano_hoja": self.tamano_hoja}
+        arrays = {"ids": self.ids}
+        if len(self):
+            arrays.update(
+                puntos=self.puntos, posiciones=self.posiciones,
+                inicios=self.inicios, fines=self.fines,
+                dimensiones=self.dimensiones, cortes=self.cortes,
+                izquierdos=self.izquierdos, derechos=self.derechos,
+            )
+        ruta_tmp = f"{ruta}.tmp"
+        with open(ruta_tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(ruta_tmp, ruta)
+        return ruta
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_INDICE_SIMILARES, version_datos=None, version_modelo=None):
+        """Índice guardado, o None si es de otros datos, otro modelo u otro formato"""
+        with np.load(ruta, allow_pickle=False) as datos:
+            meta = json.loads(str(datos["meta"]))
+            if meta.get("version_indice") != VERSION_INDICE:
+                return None
+            if version_datos is not None and meta.get("version_datos") != version_datos:
+                return None
+            if version_modelo is not None and meta.get("version_modelo") != version_modelo:
+                return None
+            indice = cls.__new__(cls)
+            indice.ids = datos["ids"]
+            indice.tamano_hoja = meta["tamano_hoja"]
+            indice.meta = meta
+            if len(indice.ids):
+                for nombre in ("puntos", "posiciones", "inicios", "fines",
+                               "dimensiones", "cortes", "izquierdos", "derechos"):
+                    setattr(indice, nombre, datos[nombre])
+                indice._preparar_consultas()
+        return indice
+
+
+def escalar_rfm(rfm, artefacto=None):
+    """RFM estandarizado como en el K-Means (artefacto) o con sus propias medias"""
+    if artefacto is not None:
+        return escalar(artefacto, rfm)
+    columnas = [c for c in COLUMNAS_RFM if c in rfm.columns]
+    x = rfm[columnas].to_numpy(dtype=np.float64)
+    escalas = x.std(axis=0)
+    escalas[escalas == 0] = 1.0
+    return (x - x.mean(axis=0)) / escalas
+
+
+def construir_indice(rfm, artefacto=None, version_datos=None, tamano_hoja=TAMANO_HOJA):
+    """Índice de similares de la tabla RFM (index = CustomerID)"""
+    meta = {
+        "version_datos": version_datos or version_rfm(rfm),
+        "version_modelo": artefacto["version_modelo"] if artefacto is not None else None,
+        "columnas": artefacto["columnas"] if artefacto is not None
+                    else [c for c in COLUMNAS_RFM if c in rfm.columns],
+    }
+    return IndiceSimilares(escalar_rfm(rfm, artefacto), rfm.index, tamano_hoja, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construir el índice de clientes similares")
+    parser.add_argument("entrada", help="CSV con CustomerID, Recency, Frequency, Monetary")
+    parser.add_argument("--salida", default=RUTA_INDICE_SIMILARES)
+    parser.add_argument("--artefacto", default=RUTA_ARTEFACTO)
+    parser.add_argument("--tamano-hoja", type=int, default=TAMANO_HOJA)
+    args = parser.parse_args()
+
+    # Tipada como en la app para que la huella de los datos coincida
+    rfm = tipar_rfm(pd.read_csv(args.entrada, index_col=0))
+    artefacto = cargar_artefacto(args.artefacto) if os.path.exists(args.artefacto) else None
+
+    inicio = time.perf_counter()
+    indice = construir_indice(rfm, artefacto, tamano_hoja=args.tamano_hoja)
+    segundos = time.perf_counter() - inicio
+    indice.guardar(args.salida)
+    print(f"✅ Índice de {len(indice):,} clientes guardado en: {args.salida} ({segundos:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Carga y limpieza del log de transacciones (Online Retail).
+
+La primera lectura del Excel se limpia y se guarda en una caché columnar
+(ver cache_datos.py); las siguientes cargas leen la caché mientras el
+archivo de origen no cambie. El resultado usa el esquema compacto de
+esquemas.py (IDs int32, textos categóricos).
+"""
+import os
+
+import pandas as pd
+
+from cache_datos import guardar_cache, huella_archivo, leer_cache
+from esquemas import tipar_transacciones
+
+RUTA_EXCEL = "Online Retail.xlsx"
+
+COLUMNAS = [
+    "InvoiceNo", "StockCode", "Description", "Quantity",
+    "InvoiceDate", "UnitPrice", "CustomerID", "Country",
+]
+
+
+def ruta_cache_para(ruta_origen):
+    """Ruta del archivo de caché asociado a un archivo de origen"""
+    base, _ = os.path.splitext(ruta_origen)
+    return f"{base}.cache.npz"
+
+
+def limpiar_transacciones(df):
+    """Misma limpieza que el notebook: fechas, CustomerID nulos y devoluciones"""
+    df = df.copy()
+    df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], errors="coerce")
+    df = df.dropna(subset=["CustomerID"])
+    df = df[df["Quantity"] > 0]
+
+    # Los códigos vienen mezclados (int y str) desde Excel; se normalizan a texto
+    for columna in ("InvoiceNo", "StockCode"):
+        if columna in df.columns:
+            df[columna] = df[columna].astype(str)
+    return df.reset_index(drop=True)
+
+
+def leer_transacciones(ruta):
+    """Leer el archivo de origen sin limpiar (Excel o CSV)"""
+    if ruta.lower().endswith(".csv"):
+        return pd.read_csv(ruta)
+    return pd.read_excel(ruta)
+
+
+def cargar_transacciones(ruta=RUTA_EXCEL, usar_cache=True, con_hash=False):
+    """
+    Cargar las transacciones limpias, usando la caché columnar si está al día.
+
+    La caché se identifica por la huella del archivo de origen (tamaño y
+    mtime; con con_hash=True también el SHA-1 del contenido).
+    """
+    if not usar_cache:
+        return tipar_transacciones(limpiar_transacciones(leer_transacciones(ruta)))
+
+    ruta_cache = ruta_cache_para(ruta)
+    huella = huella_archivo(ruta, con_hash=con_hash)
+
+    df = leer_cache(ruta_cache, huella)
+    if df is not None:
+        return tipar_transacciones(df)
+
+    df = tipar_transacciones(limpiar_transacciones(leer_transacciones(ruta)))
+    try:
+        guardar_cache(df, ruta_cache, huella)
+    except OSError:
+        # Sin permisos de escritura (p. ej. en Streamlit Cloud): seguir sin caché
+        pass
+    return df